@@ -2,17 +2,68 @@
 # -*- coding: utf-8 -*-
 
 import json
-from typing import Dict, List, Any, Optional
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Iterator
 import google.generativeai as genai
 import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+try:
+    from .deadline import Deadline, stage_timeout
+    from .quota_manager import get_quota_manager
+    from .circuit_breaker import get_circuit_breaker, CircuitOpen
+    from .llm_cache import get_llm_cache
+    from .model_output import parse_model_json, StreamingJSONParser, ModelOutputError, NonEmpty
+    from .prompt_builder import compact_resources, compact_analysis, BARRIER_RESOURCE_FIELDS
+    from .token_usage import get_token_usage
+except ImportError:
+    from deadline import Deadline, stage_timeout
+    from quota_manager import get_quota_manager
+    from circuit_breaker import get_circuit_breaker, CircuitOpen
+    from llm_cache import get_llm_cache
+    from model_output import parse_model_json, StreamingJSONParser, ModelOutputError, NonEmpty
+    from prompt_builder import compact_resources, compact_analysis, BARRIER_RESOURCE_FIELDS
+    from token_usage import get_token_usage
+
 ENV_FILE = os.getenv('AIDLINK_ENV_FILE', 'aidlink.env')
 env_path = Path(ENV_FILE)
 if env_path.exists():
     load_dotenv(env_path)
 
+# Schemas the model's JSON answers are parsed against (see model_output.py)
+ANALYSIS_SCHEMA = {
+    'situation_summary': str,
+    'likely_eligible_programs': list,
+    'key_factors?': list,
+    'program_details?': [dict],
+    'priority_order?': list,
+    'barriers_identified?': list,
+    'barrier_solutions?': list
+}
+URGENT_ACTIONS_SCHEMA = NonEmpty([{'action': NonEmpty(str)}])
+ACTION_PLAN_SCHEMA = {'urgent_actions': URGENT_ACTIONS_SCHEMA}
+CHECKLIST_SCHEMA = NonEmpty([str])
+QUESTIONS_SCHEMA = [str]
+BARRIERS_SCHEMA = {'barriers': [dict]}
+COMBINED_SCHEMA = {
+    'analysis': ANALYSIS_SCHEMA,
+    'action_plan': ACTION_PLAN_SCHEMA,
+    'document_checklist': CHECKLIST_SCHEMA
+}
+
+# Sections of the combined response sent by analyze_stream as soon as each is complete: (key, parent key, schema)
+STREAM_SECTIONS = (
+    ('situation_summary', 'analysis', str),
+    ('likely_eligible_programs', 'analysis', list),
+    ('program_details', 'analysis', [dict]),
+    ('urgent_actions', 'action_plan', URGENT_ACTIONS_SCHEMA),
+    ('document_checklist', None, CHECKLIST_SCHEMA)
+)
+
 class AIEligibilityAssistant:
     """
     AI-Powered Eligibility Navigator
@@ -21,6 +72,13 @@ class AIEligibilityAssistant:
     
     def __init__(self):
         self.api_key = os.getenv('GEMINI_API_KEY')
+        # generate_content has no timeout of its own, so calls run on a pool and are waited on with one
+        self.timeout_seconds = float(os.getenv('GEMINI_TIMEOUT_SECONDS', 30))
+        self._executor = ThreadPoolExecutor(max_workers=int(os.getenv('GEMINI_MAX_WORKERS', 8)), thread_name_prefix='gemini')
+        # One Gemini call for analysis + plan + checklist instead of three in a row
+        self.combined_mode = os.getenv('GEMINI_COMBINED_MODE', 'True').lower() == 'true'
+        # Answers to the same (or nearly the same) situation are reused instead of asking again
+        self.llm_cache = get_llm_cache()
         # Check if API key is set and not a placeholder
         if self.api_key and self.api_key != 'replace_with_gemini_key' and not self.api_key.startswith('replace_with'):
             try:
@@ -36,7 +94,306 @@ class AIEligibilityAssistant:
             print("⚠️ Gemini API key not configured - using fallback mode")
             print("   Get a free API key at: https://aistudio.google.com/app/apikey")
     
-    def analyze_user_situation(self, user_input: str, context: Dict = None, location: str = None) -> Dict[str, Any]:
+    def _generate_content(self, prompt: str, deadline: Deadline = None, method: str = 'gemini'):
+        """
+        Call Gemini, giving up after GEMINI_TIMEOUT_SECONDS or when the request deadline runs out
+        
+        Tokens are counted under method. Raises DeadlineExceeded / TimeoutError /
+        QuotaExceeded / CircuitOpen so callers fall back like on any other error.
+        """
+        timeout = stage_timeout(deadline, self.timeout_seconds)
+        breaker = get_circuit_breaker('gemini')
+        if breaker.is_open():
+            raise CircuitOpen('gemini circuit is open')
+        get_quota_manager().check('gemini', deadline)
+        response = breaker.call(lambda: self._executor.submit(self.model.generate_content, prompt).result(timeout=timeout),
+                                capped_by_deadline=timeout < self.timeout_seconds)
+        try:
+            output_text = response.text
+        except Exception:
+            output_text = ''  # Blocked or empty - the caller deals with it
+        get_token_usage().record(method, prompt, output_text, getattr(response, 'usage_metadata', None))
+        return response
+    
+    def _stream_content(self, prompt: str, deadline: Deadline = None, method: str = 'gemini') -> Iterator[str]:
+        """
+        Call Gemini with stream=True, yielding the response text chunk by chunk
+        
+        The same GEMINI_TIMEOUT_SECONDS / deadline limit as _generate_content applies to
+        the whole response; raises TimeoutError once it is used up.
+        """
+        give_up_at = time.monotonic() + stage_timeout(deadline, self.timeout_seconds)
+        breaker = get_circuit_breaker('gemini')
+        if breaker.is_open():
+            raise CircuitOpen('gemini circuit is open')
+        get_quota_manager().check('gemini', deadline)
+        
+        chunks = queue.Queue()
+        cancelled = threading.Event()
+        done = object()
+        
+        def consume():
+            texts = []
+            usage_metadata = None
+            try:
+                for chunk in self.model.generate_content(prompt, stream=True):
+                    if cancelled.is_set():
+                        return  # The caller gave up - stop reading
+                    texts.append(chunk.text)
+                    usage_metadata = getattr(chunk, 'usage_metadata', None) or usage_metadata
+                    chunks.put(chunk.text)
+            finally:
+                get_token_usage().record(method, prompt, ''.join(texts), usage_metadata)
+        
+        def run():
+            try:
+                breaker.call(consume)
+                chunks.put(done)
+            except Exception as e:
+                chunks.put(e)
+        
+        self._executor.submit(run)
+        try:
+            while True:
+                try:
+                    item = chunks.get(timeout=max(0.0, give_up_at - time.monotonic()))
+                except queue.Empty:
+                    raise TimeoutError('Gemini stream timed out')
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+    
+    def analyze_and_plan(self, user_input: str, resources: List[Dict] = None, location: str = None, deadline: Deadline = None) -> Dict[str, Any]:
+        """
+        Analysis, action plan and document checklist for /api/analyze-eligibility
+        
+        With GEMINI_COMBINED_MODE (the default) all three come from one structured
+        prompt and response. If that response doesn't validate, the three-step flow
+        (analyze_user_situation -> create_action_plan[_from_resources] ->
+        generate_document_checklist) runs instead; if the call itself fails (timeout,
+        quota, open circuit) the rule-based answers are used right away.
+        
+        Returns:
+            {'analysis', 'action_plan', 'document_checklist', 'ai_model', 'mode'}
+        """
+        if self.available and self.combined_mode:
+            try:
+                result = self._combined_analysis(user_input, resources, location, deadline)
+                if result:
+                    return result
+                print("⚠️ Combined Gemini response failed validation - using the three-step flow")
+            except Exception as e:
+                print(f"Combined analysis error: {e}")
+                return self._fallback_plan(user_input, location)
+        
+        result = None
+        for result in self._three_step(user_input, resources, location, deadline):
+            pass
+        return result
+    
+    def analyze_stream(self, user_input: str, resources: List[Dict] = None, location: str = None, deadline: Deadline = None) -> Iterator[Dict[str, Any]]:
+        """
+        analyze_and_plan as a series of events, for /api/analyze-eligibility/stream
+        
+        Events (each a dict with a 'type'):
+            provisional - the rule-based answer, sent right away
+            section     - one part of the model's answer as soon as it is complete:
+                          'section' is a STREAM_SECTIONS key, 'path' where it belongs in
+                          the final answer (e.g. ['analysis', 'situation_summary']), 'value'
+            final       - the same dict analyze_and_plan returns; clients should
+                          replace what they have shown with it
+        
+        In combined mode the sections are parsed out of Gemini's streamed response;
+        otherwise they are sent after each step of the three-step flow.
+        """
+        fallback = self._fallback_plan(user_input, location)
+        yield dict(fallback, type='provisional')
+        if not self.available:
+            yield dict(fallback, type='final')
+            return
+        
+        if not self.combined_mode:
+            result = None
+            sent = set()
+            for result in self._three_step(user_input, resources, location, deadline):
+                for section, parent, _ in STREAM_SECTIONS:
+                    container = result.get(parent) if parent else result
+                    value = container.get(section) if isinstance(container, dict) else None
+                    if value and section not in sent:
+                        sent.add(section)
+                        yield self._section_event(section, parent, value)
+            yield dict(result, type='final')
+            return
+        
+        user_location = location or 'Sacramento, CA'
+        scope = self._combined_scope(user_location, resources)
+        cached = self.llm_cache.get('combined_analysis', user_input, scope, near=False)
+        if cached is not None:
+            yield dict(cached, type='final')
+            return
+        
+        parser = StreamingJSONParser()
+        sent = set()
+        try:
+            for chunk in self._stream_content(self._combined_prompt(user_input, resources, user_location), deadline, 'combined_analysis'):
+                parser.feed(chunk)
+                for section, parent, schema in STREAM_SECTIONS:
+                    if section in sent:
+                        continue
+                    value = parser.value(section, schema)
+                    if value is not None:
+                        sent.add(section)
+                        yield self._section_event(section, parent, self._clean_section(section, value, resources))
+        except Exception as e:
+            print(f"Streamed analysis error: {e}")
+            yield dict(fallback, type='final')
+            return
+        
+        result = self._finish_combined(user_input, parser.text, resources, scope)
+        if result is None:
+            print("⚠️ Streamed Gemini response failed validation - using the three-step flow")
+            for result in self._three_step(user_input, resources, location, deadline):
+                pass
+        yield dict(result, type='final')
+    
+    def _three_step(self, user_input: str, resources: List[Dict] = None, location: str = None, deadline: Deadline = None) -> Iterator[Dict[str, Any]]:
+        """analyze_user_situation -> action plan -> checklist, yielding the result so far after each step"""
+        result = {
+            'analysis': {},
+            'action_plan': {},
+            'document_checklist': [],
+            'ai_model': 'gemini-pro' if self.available else 'simple_fallback',
+            'mode': 'three_step'
+        }
+        analysis = self.analyze_user_situation(user_input, location=location, deadline=deadline)
+        result['analysis'] = analysis.get('analysis', {})
+        yield result
+        if resources:
+            plan = self.create_action_plan_from_resources(analysis, resources, location, deadline=deadline)
+        else:
+            plan = self.create_action_plan(analysis, location, deadline=deadline)
+        result['action_plan'] = plan.get('action_plan', {})
+        yield result
+        result['document_checklist'] = self.generate_document_checklist(analysis, plan, deadline=deadline)
+        yield result
+    
+    def _fallback_plan(self, user_input: str, location: str = None) -> Dict[str, Any]:
+        """Rule-based analysis, plan and checklist (no Gemini call)"""
+        analysis = self._fallback_analysis(user_input)
+        return {
+            'analysis': analysis.get('analysis', {}),
+            'action_plan': self._get_immediate_action_plan(analysis, location).get('action_plan', {}),
+            'document_checklist': self._basic_document_checklist(analysis),
+            'ai_model': 'simple_fallback',
+            'mode': 'fallback'
+        }
+    
+    def _section_event(self, section: str, parent: Optional[str], value: Any) -> Dict[str, Any]:
+        return {'type': 'section', 'section': section, 'path': [parent, section] if parent else [section], 'value': value}
+    
+    def _combined_analysis(self, user_input: str, resources: List[Dict] = None, location: str = None, deadline: Deadline = None) -> Optional[Dict[str, Any]]:
+        """One Gemini call for analysis + plan + checklist; None if the response doesn't validate"""
+        user_location = location or 'Sacramento, CA'
+        scope = self._combined_scope(user_location, resources)
+        cached = self.llm_cache.get('combined_analysis', user_input, scope, near=False)
+        if cached is not None:
+            return cached
+        
+        response = self._generate_content(self._combined_prompt(user_input, resources, user_location), deadline, 'combined_analysis')
+        return self._finish_combined(user_input, response.text, resources, scope)
+    
+    def _combined_scope(self, user_location: str, resources: List[Dict] = None) -> Dict[str, Any]:
+        """Inputs besides the situation that a cached combined answer must match"""
+        return {
+            'location': user_location,
+            'resources': [[r.get('name'), r.get('address')] for r in (resources or [])[:3]]
+        }
+    
+    def _combined_prompt(self, user_input: str, resources: List[Dict], user_location: str) -> str:
+        """Prompt asking for analysis, action plan and checklist as one JSON object"""
+        if resources:
+            resource_section = f"""
+Actual Resources Found (these are REAL resources in the user's area):
+{compact_resources(resources[:3])}
+
+The action plan MUST use these resources: their EXACT names, addresses and phone numbers. Do not make up resources. 2-3 steps max, prioritizing resources with transportation assistance or shorter distances.
+"""
+        else:
+            resource_section = f"""
+The action plan MUST use real, specific resources, addresses and phone numbers in or near {user_location} - no generic examples. Max 5 steps, covering today, this week and this month.
+"""
+        return f"""
+You are an expert social services eligibility navigator. Analyze this person's situation, create an action plan and list the documents they will need - all in ONE JSON response.
+
+User Situation: "{user_input}"
+User Location: {user_location}
+{resource_section}
+Return this JSON object:
+{{
+  "analysis": {{
+    "situation_summary": "Brief summary of their situation",
+    "key_factors": ["homeless", "unemployed", "has_children", ...],
+    "likely_eligible_programs": ["Program name", ...],
+    "program_details": [{{"name": "", "category": "food|housing|employment|...", "confidence": 0.0, "why_they_qualify": "", "what_they_need": "", "how_to_apply": ""}}],
+    "urgency_score": 1-10,
+    "priority_order": ["Need to address first", ...],
+    "barriers_identified": ["..."],
+    "barrier_solutions": ["..."]
+  }},
+  "action_plan": {{
+    "urgent_actions": [{{"action": "Specific step", "why": "Why it helps them", "phone_number": "", "address": "", "timeframe": "today|this week|this month", "documents_needed": ""}}],
+    "timeline": "Overall expected timeline",
+    "priority_order": "What to do first, second, third",
+    "encouragement": "A supportive message"
+  }},
+  "document_checklist": ["Document 1", "Document 2"]
+}}
+
+RULES:
+- Focus on programs and resources in {user_location}
+- The checklist only lists documents actually needed for their situation (max 10)
+- Be specific, actionable and encouraging, not overwhelming
+
+Respond with ONLY valid JSON. Start with {{ and end with }}.
+"""
+    
+    def _finish_combined(self, user_input: str, response_text: str, resources: List[Dict], scope: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Parse and validate a combined response and cache the result; None if it doesn't validate"""
+        try:
+            result = parse_model_json(response_text, COMBINED_SCHEMA)
+        except ModelOutputError as e:
+            print(f"Combined response error: {e}")
+            return None
+        
+        action_plan = result['action_plan']
+        action_plan['urgent_actions'] = self._clean_section('urgent_actions', action_plan['urgent_actions'], resources)
+        combined = {
+            'analysis': result['analysis'],
+            'action_plan': action_plan,
+            'document_checklist': self._clean_section('document_checklist', result['document_checklist'], resources),
+            'ai_model': 'gemini-pro',
+            'mode': 'combined'
+        }
+        self.llm_cache.set('combined_analysis', user_input, combined, scope)
+        return combined
+    
+    def _clean_section(self, section: str, value: Any, resources: List[Dict] = None) -> Any:
+        """Apply the combined-response limits to one section"""
+        if section == 'urgent_actions' and isinstance(value, list):
+            return value[:3 if resources else 5]
+        if section == 'document_checklist' and isinstance(value, list):
+            documents = [str(doc) for doc in value]
+            basic_id = 'Government-issued ID (driver\'s license or state ID)'
+            if basic_id not in documents:
+                documents.insert(0, basic_id)
+            return documents[:10]
+        return value
+    
+    def analyze_user_situation(self, user_input: str, context: Dict = None, location: str = None, deadline: Deadline = None) -> Dict[str, Any]:
         """
         Analyze user's situation and determine what programs they likely qualify for
         
@@ -44,6 +401,7 @@ class AIEligibilityAssistant:
             user_input: Natural language description of user's situation
             context: Optional context (previous responses, location, etc.)
             location: User's location for location-specific recommendations
+            deadline: Optional request deadline for the Gemini call
         
         Returns:
             Comprehensive analysis with eligibility assessment
@@ -51,6 +409,11 @@ class AIEligibilityAssistant:
         if not self.available:
             return self._fallback_analysis(user_input)
         
+        scope = {'location': location, 'context': context}
+        cached = self.llm_cache.get('analyze_user_situation', user_input, scope)
+        if cached is not None:
+            return cached
+        
         try:
             # Build comprehensive prompt
             location_context = f"\n\nUser Location: {location}" if location else ""
@@ -83,29 +446,23 @@ IMPORTANT: Respond with ONLY valid JSON. Start with {{ and end with }}.
             if context:
                 prompt += f"\n\nAdditional Context: {json.dumps(context)}"
             
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            # Extract JSON
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}')
-            if start_idx != -1 and end_idx != -1:
-                response_text = response_text[start_idx:end_idx+1]
+            response = self._generate_content(prompt, deadline, 'analyze_user_situation')
+            result = parse_model_json(response.text, ANALYSIS_SCHEMA)
             
-            result = json.loads(response_text)
-            
-            return {
+            analysis = {
                 'success': True,
                 'analysis': result,
                 'ai_model': 'gemini-pro',
                 'confidence': result.get('confidence', 0.85)
             }
+            self.llm_cache.set('analyze_user_situation', user_input, analysis, scope)
+            return analysis
             
         except Exception as e:
             print(f"AI analysis error: {e}")
             return self._fallback_analysis(user_input)
     
-    def create_action_plan_from_resources(self, analysis: Dict[str, Any], resources: List[Dict], location: str = None) -> Dict[str, Any]:
+    def create_action_plan_from_resources(self, analysis: Dict[str, Any], resources: List[Dict], location: str = None, deadline: Deadline = None) -> Dict[str, Any]:
 
         if not self.available or not resources:
             return self._get_immediate_action_plan(analysis, location)
@@ -120,51 +477,20 @@ User needs help, you found these resources. Create a DETAILED action plan.
 
 User situation: {analysis.get('analysis', {}).get('situation_summary', 'Need assistance')}{location_context}
 
-Actual Resources Found (these are REAL resources in the user's area):
-{json.dumps(best_resources, indent=2)}
-
-IMPORTANT: These resources are location-specific. Use the EXACT names, addresses, and phone numbers from the resources above. The user is in {location or 'their local area'}.
-
-Create action plan with 2-3 detailed steps using THESE EXACT resources.
+Actual Resources Found (these are REAL resources in the user's area, distance in miles):
+{compact_resources(best_resources)}
 
-Return this JSON format:
-{{
-  "urgent_actions": [
-    {{
-      "action": "What to do with this specific resource (use exact resource name)",
-      "why": "Why this resource helps their situation",
-      "phone_number": "exact phone from resource above",
-      "address": "exact address from resource above",
-      "timeframe": "When to do this (today/this week)"
-    }}
-  ]
-}}
+Create an action plan with 2-3 steps using ONLY these resources, with their EXACT names, addresses and phone numbers - do not make up resources. Prioritize resources with transport_help or shorter distances.
 
-RULES:
-- Use ACTUAL resource names, phones, addresses from the resources list above
-- Include context (why it helps)
-- Add timeframe for each action
-- Be specific to their situation
-- 2-3 steps max
-- Prioritize resources with transportation assistance or shorter distances
-- All resources must be from the list above - do not make up resources
-
-Return JSON only.
+Return JSON only:
+{{"urgent_actions": [{{"action": "What to do (exact resource name)", "why": "Why it helps their situation", "phone_number": "", "address": "", "timeframe": "today|this week"}}]}}
 """
             
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}')
-            if start_idx != -1 and end_idx != -1:
-                response_text = response_text[start_idx:end_idx+1]
-            
-            action_plan = json.loads(response_text)
+            response = self._generate_content(prompt, deadline, 'create_action_plan_from_resources')
+            action_plan = parse_model_json(response.text, ACTION_PLAN_SCHEMA)
             
             # Ensure we only have 2-3 actions max
-            if 'urgent_actions' in action_plan:
-                action_plan['urgent_actions'] = action_plan['urgent_actions'][:3]
+            action_plan['urgent_actions'] = action_plan['urgent_actions'][:3]
             
             return {
                 'success': True,
@@ -176,13 +502,14 @@ Return JSON only.
             print(f"Action plan from resources error: {e}")
             return self._get_immediate_action_plan(analysis, location)
     
-    def create_action_plan(self, analysis: Dict[str, Any], location: str = None) -> Dict[str, Any]:
+    def create_action_plan(self, analysis: Dict[str, Any], location: str = None, deadline: Deadline = None) -> Dict[str, Any]:
         """
         Generate intelligent action plan based on eligibility analysis
         
         Args:
             analysis: Output from analyze_user_situation
             location: User's location for local recommendations
+            deadline: Optional request deadline for the Gemini call
         
         Returns:
             Step-by-step action plan prioritized by urgency with SPECIFIC actionable items
@@ -194,71 +521,29 @@ Return JSON only.
             # Create comprehensive action plan
             user_location = location or 'Sacramento, CA'
             prompt = f"""
-Based on this eligibility analysis, create a COMPREHENSIVE action plan that helps someone take real steps.
+Based on this eligibility analysis, create an action plan that helps someone take real steps.
 
-Analysis:
-{json.dumps(analysis.get('analysis', {}), indent=2)}
+Analysis: {compact_analysis(analysis.get('analysis', {}))}
 
 User Location: {user_location}
 
-CRITICAL: The user is located in {user_location}. You MUST provide location-specific resources, addresses, phone numbers, and organizations that are actually in or near {user_location}. Do NOT use generic examples - use real, specific resources for {user_location}.
-
-Generate a detailed action plan with:
-1. Immediate actions (today)
-2. This week actions
-3. This month actions
+CRITICAL: Use real, specific resources, addresses and phone numbers in or near {user_location} (211, food banks, benefit offices...) - no generic examples.
 
 Return JSON with:
 {{
-  "urgent_actions": [
-    {{
-      "action": "Specific, actionable step with location-specific details (what to do)",
-      "why": "Why this matters for them",
-      "phone_number": "actual phone number for {user_location} area",
-      "address": "specific address in {user_location}",
-      "timeframe": "When to do this (today, this week, this month)",
-      "documents_needed": "What they need to bring/prepare"
-    }}
-  ],
+  "urgent_actions": [{{"action": "Specific step (what to do)", "why": "Why this matters for them", "phone_number": "", "address": "", "timeframe": "today|this week|this month", "documents_needed": "What to bring"}}],
   "timeline": "Overall expected timeline",
   "priority_order": "What to do first, second, third",
-  "encouragement": "A supportive message to motivate them"
+  "encouragement": "A supportive message"
 }}
 
-RULES:
-- Be specific and actionable
-- Include real phone numbers for {user_location} area when possible
-- Provide specific addresses in {user_location}
-- Focus on resources actually available in {user_location}
-- Provide context (why each step matters)
-- Make it encouraging, not overwhelming
-- Max 5 actions total
-- IMPORTANT: All resources must be location-specific to {user_location}
-
-Example structure for {user_location}:
-{{
-  "urgent_actions": [
-    {{"action": "Call 211 today to speak with a resource specialist in {user_location}", "why": "211 connects you to local assistance programs in your area", "phone_number": "211", "address": "Dial 2-1-1 from any phone - available in {user_location}", "timeframe": "today", "documents_needed": "None - just your situation"}},
-    {{"action": "Contact local food assistance programs in {user_location}", "why": "You mentioned food insecurity - local programs provide immediate help", "phone_number": "Check 211 or local food bank", "address": "Search for food banks in {user_location}", "timeframe": "today", "documents_needed": "None required"}}
-  ],
-  "timeline": "You should see progress within 24-48 hours",
-  "priority_order": "1. Call 211 first (they connect you to everything in {user_location}), 2. Contact local food assistance if hungry today, 3. Apply for benefits this week",
-  "encouragement": "You're taking the right steps! Help is available in {user_location} and you're not alone."
-}}
+RULES: max 5 actions covering today, this week and this month; be specific, actionable and encouraging, not overwhelming.
 
 Respond with ONLY valid JSON.
 """
             
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            # Extract JSON
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}')
-            if start_idx != -1 and end_idx != -1:
-                response_text = response_text[start_idx:end_idx+1]
-            
-            action_plan = json.loads(response_text)
+            response = self._generate_content(prompt, deadline, 'create_action_plan')
+            action_plan = parse_model_json(response.text, ACTION_PLAN_SCHEMA)
             
             # Enhance with real Sacramento resources if available
             try:
@@ -328,7 +613,7 @@ Respond with ONLY valid JSON.
             'ai_model': 'simple_fallback'
         }
     
-    def suggest_followup_questions(self, current_situation: str) -> List[str]:
+    def suggest_followup_questions(self, current_situation: str, deadline: Deadline = None) -> List[str]:
         """
         Generate intelligent follow-up questions to better understand user's situation
         
@@ -345,6 +630,10 @@ Respond with ONLY valid JSON.
                 "Are there children in your household?"
             ]
         
+        cached = self.llm_cache.get('suggest_followup_questions', current_situation)
+        if cached is not None:
+            return cached
+        
         try:
             prompt = f"""
 User's current situation: "{current_situation}"
@@ -363,30 +652,28 @@ Return as JSON array of questions: ["question 1", "question 2", etc.]
 Respond with ONLY valid JSON array.
 """
             
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            # Extract JSON array
-            start_idx = response_text.find('[')
-            end_idx = response_text.rfind(']')
-            if start_idx != -1 and end_idx != -1:
-                response_text = response_text[start_idx:end_idx+1]
+            response = self._generate_content(prompt, deadline, 'suggest_followup_questions')
+            questions = parse_model_json(response.text, QUESTIONS_SCHEMA)
             
-            questions = json.loads(response_text)
-            
-            return questions if isinstance(questions, list) else []
+            self.llm_cache.set('suggest_followup_questions', current_situation, questions)
+            return questions
             
         except Exception as e:
             print(f"Question generation error: {e}")
             return ["Tell me more about your situation"]
     
-    def translate_government_jargon(self, text: str) -> str:
+    def translate_government_jargon(self, text: str, deadline: Deadline = None) -> str:
         """
         Translate complex government eligibility requirements into plain English
         """
         if not self.available:
             return text
         
+        # Exact matches only - a small wording change in a requirement can change its meaning
+        cached = self.llm_cache.get('translate_government_jargon', text, near=False)
+        if cached is not None:
+            return cached
+        
         try:
             prompt = f"""
 Translate this government eligibility requirement into simple, clear language that anyone can understand:
@@ -401,13 +688,15 @@ Provide a translation that:
 Respond with ONLY the translated text, no explanations.
 """
             
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            response = self._generate_content(prompt, deadline, 'translate_government_jargon')
+            translation = response.text.strip()
+            self.llm_cache.set('translate_government_jargon', text, translation)
+            return translation
             
         except Exception as e:
             return text
     
-    def identify_barriers(self, situation: str, resources: List[Dict]) -> Dict[str, Any]:
+    def identify_barriers(self, situation: str, resources: List[Dict], deadline: Deadline = None) -> Dict[str, Any]:
         """
         Identify potential barriers to accessing resources and suggest solutions
         """
@@ -415,52 +704,33 @@ Respond with ONLY the translated text, no explanations.
             return {'barriers': [], 'solutions': []}
         
         try:
-            # Summarize resources
-            resource_summary = "\n".join([
-                f"- {r.get('name', 'Unknown')}: {r.get('eligibility', 'No requirements')}"
-                for r in resources[:5]
-            ])
-            
             prompt = f"""
 User Situation: "{situation}"
 
-Available Resources:
-{resource_summary}
+Available Resources (distance in miles):
+{compact_resources(resources[:5], BARRIER_RESOURCE_FIELDS)}
 
-Identify potential barriers to accessing these resources (transportation, documentation, language, time, etc.) and suggest solutions.
+Identify barriers to accessing these resources (transportation, documentation, language, time, etc.) and solutions.
 
-Return JSON with:
-{{
-  "barriers": [
-    {{"issue": "problem", "impact": "how it affects them", "solutions": ["solution 1", "solution 2"]}}
-  ]
-}}
-
-Respond with ONLY valid JSON.
+Respond with ONLY valid JSON:
+{{"barriers": [{{"issue": "problem", "impact": "how it affects them", "solutions": ["solution 1", "solution 2"]}}]}}
 """
             
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}')
-            if start_idx != -1 and end_idx != -1:
-                response_text = response_text[start_idx:end_idx+1]
-            
-            result = json.loads(response_text)
-            return result
+            response = self._generate_content(prompt, deadline, 'identify_barriers')
+            return parse_model_json(response.text, BARRIERS_SCHEMA)
             
         except Exception as e:
             print(f"Barrier identification error: {e}")
             return {'barriers': [], 'solutions': []}
     
-    def generate_document_checklist(self, analysis: Dict[str, Any], action_plan: Dict[str, Any] = None) -> List[str]:
+    def generate_document_checklist(self, analysis: Dict[str, Any], action_plan: Dict[str, Any] = None, deadline: Deadline = None) -> List[str]:
         """
         Generate personalized document checklist based on user's situation and planned actions
         
         Args:
             analysis: Output from analyze_user_situation
             action_plan: Optional action plan to tailor documents needed
+            deadline: Optional request deadline for the Gemini call
         
         Returns:
             List of documents the user will likely need
@@ -472,6 +742,13 @@ Respond with ONLY valid JSON.
             situation = analysis.get('analysis', {}).get('situation_summary', '')
             key_factors = analysis.get('analysis', {}).get('key_factors', [])
             eligible_programs = analysis.get('analysis', {}).get('likely_eligible_programs', [])
+            scope = {
+                'key_factors': [str(f) for f in key_factors[:5]],
+                'programs': [str(p) for p in eligible_programs[:5]]
+            }
+            cached = self.llm_cache.get('generate_document_checklist', str(situation), scope)
+            if cached is not None:
+                return cached
             
             prompt = f"""
 Based on this person's situation, create a personalized checklist of documents they will need to apply for assistance programs.
@@ -500,23 +777,16 @@ Return as JSON array of document names:
 Be specific and personalized to their situation. Return ONLY the JSON array.
 """
             
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            # Extract JSON array
-            start_idx = response_text.find('[')
-            end_idx = response_text.rfind(']')
-            if start_idx != -1 and end_idx != -1:
-                response_text = response_text[start_idx:end_idx+1]
-                documents = json.loads(response_text)
-                # Ensure basic documents are always included
-                basic_docs = ['Government-issued ID (driver\'s license or state ID)']
-                for doc in basic_docs:
-                    if doc not in documents:
-                        documents.insert(0, doc)
-                return documents[:10]  # Limit to 10 documents
-            
-            return self._basic_document_checklist(analysis)
+            response = self._generate_content(prompt, deadline, 'generate_document_checklist')
+            documents = parse_model_json(response.text, CHECKLIST_SCHEMA)
+            # Ensure basic documents are always included
+            basic_docs = ['Government-issued ID (driver\'s license or state ID)']
+            for doc in basic_docs:
+                if doc not in documents:
+                    documents.insert(0, doc)
+            documents = documents[:10]  # Limit to 10 documents
+            self.llm_cache.set('generate_document_checklist', str(situation), documents, scope)
+            return documents
             
         except Exception as e:
             print(f"Document checklist generation error: {e}")
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Circuit breakers for upstream provider calls
+
+Each upstream (Google Geocoding, Text Search, Place Details, Nominatim,
+Overpass, Gemini) has a breaker that watches the outcome of its last
+CIRCUIT_WINDOW_SIZE calls. Once at least CIRCUIT_MIN_CALLS have been made and
+the failure rate reaches CIRCUIT_FAILURE_RATE, the breaker opens: calls fail
+immediately with CircuitOpen, so callers go straight to their fallback
+instead of waiting out a timeout. After CIRCUIT_OPEN_SECONDS the breaker is
+half-open and lets CIRCUIT_HALF_OPEN_PROBES calls through; a successful probe
+closes it again, a failed one re-opens it.
+
+Every setting can be overridden per breaker, e.g. CIRCUIT_OVERPASS_OPEN_SECONDS.
+
+Only outages count as failures: transport errors (connection errors and
+timeouts), HTTP errors raised by raise_for_outage (5xx, 429) and SDK errors
+carrying a 5xx/429 code. Anything else fn raises (a JSON decode error on a
+proxy's error page, a blocked Gemini prompt, ...) is re-raised uncounted.
+
+Running out of the request's own budget is not a provider failure either:
+callers pass capped_by_deadline=True when the call's timeout was cut short by
+the request deadline, and a timeout of such a call is raised as
+DeadlineExceeded without being counted (clients choose deadline_ms, so tiny
+budgets must not open a breaker for everyone).
+"""
+
+import concurrent.futures
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+import requests
+import urllib3
+
+try:
+    from .deadline import DeadlineExceeded
+except ImportError:
+    from deadline import DeadlineExceeded
+
+TIMEOUT_ERRORS = (requests.Timeout, TimeoutError, concurrent.futures.TimeoutError)
+TRANSPORT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.HTTPError, ConnectionError,
+                    TimeoutError, concurrent.futures.TimeoutError)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a provider whose breaker is open"""
+
+
+def raise_for_outage(response: requests.Response) -> requests.Response:
+    """Treat 5xx and 429 responses as failures (other statuses are the caller's business)"""
+    if response.status_code >= 500 or response.status_code == 429:
+        raise requests.HTTPError(f"{response.status_code} from {response.url}", response=response)
+    return response
+
+
+def is_timeout(error: BaseException) -> bool:
+    """
+    Whether error is a timeout, including a read/connect timeout that requests
+    wrapped in a ConnectionError (urllib3 MaxRetryError with a timeout reason)
+    """
+    if isinstance(error, TIMEOUT_ERRORS):
+        return True
+    if isinstance(error, requests.ConnectionError):
+        reason = error.args[0] if error.args else None
+        reason = getattr(reason, 'reason', reason)
+        return isinstance(reason, urllib3.exceptions.TimeoutError)
+    return False
+
+
+def is_outage(error: BaseException) -> bool:
+    """Whether error says the provider is failing (transport error, 5xx or 429), not just this call"""
+    if isinstance(error, requests.JSONDecodeError):
+        return False  # A RequestException, but the provider did answer
+    if isinstance(error, TRANSPORT_ERRORS):
+        return True
+    code = getattr(error, 'code', None)  # google.api_core errors carry the HTTP status
+    return isinstance(code, int) and (code >= 500 or code == 429)
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker with half-open probing"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.window_size = max(1, int(self._setting('WINDOW_SIZE', 20)))
+        self.min_calls = max(1, int(self._setting('MIN_CALLS', 5)))
+        self.failure_rate = float(self._setting('FAILURE_RATE', 0.5))
+        self.open_seconds = float(self._setting('OPEN_SECONDS', 30))
+        self.half_open_probes = max(1, int(self._setting('HALF_OPEN_PROBES', 1)))
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_error = None
+        self._outcomes = deque(maxlen=self.window_size)  # True = failure
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def call(self, fn: Callable[[], Any], capped_by_deadline: bool = False) -> Any:
+        """
+        Run fn through the breaker
+
+        Outages raised by fn (see is_outage) count as failures; every exception is
+        re-raised. Raises CircuitOpen without calling fn while the breaker is open.
+
+        Args:
+            capped_by_deadline: fn's timeout is shorter than its usual cap because of the
+                request deadline; a timeout is then raised as DeadlineExceeded, uncounted
+        """
+        if not self._before_call():
+            raise CircuitOpen(f"{self.name} circuit is open")
+        try:
+            result = fn()
+        except DeadlineExceeded:
+            # Our own budget ran out before the call - says nothing about the provider
+            self._release_probe()
+            raise
+        except Exception as e:
+            if capped_by_deadline and is_timeout(e):
+                self._release_probe()
+                raise DeadlineExceeded(f"{self.name} call ran out of request budget: {e}") from e
+            if not is_outage(e):
+                self._release_probe()
+                raise
+            self._record(failed=True, error=e)
+            raise
+        self._record(failed=False)
+        return result
+
+    def is_open(self) -> bool:
+        """Whether calls are currently being rejected (checked before spending quota on a call)"""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at < self.open_seconds
+            return self.state == HALF_OPEN and self._probes >= self.half_open_probes
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            failures = sum(self._outcomes)
+            stats = {
+                'state': self.state,
+                'failure_rate': round(failures / len(self._outcomes), 3) if self._outcomes else 0.0,
+                'window_calls': len(self._outcomes),
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+                'last_error': self.last_error
+            }
+            if self.state == OPEN:
+                stats['retry_in_seconds'] = round(max(0.0, self.opened_at + self.open_seconds - time.monotonic()), 1)
+            return stats
+
+    def _setting(self, setting: str, default):
+        return os.getenv(f"CIRCUIT_{self.name.upper()}_{setting}", os.getenv(f"CIRCUIT_{setting}", default))
+
+    def _before_call(self) -> bool:
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes = 0
+                print(f"🔌 {self.name} circuit half-open, probing")
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.rejected += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def _release_probe(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def _record(self, failed: bool, error: Exception = None):
+        with self._lock:
+            if failed:
+                self.last_error = f"{type(error).__name__}: {error}"[:200]
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    print(f"✅ {self.name} circuit closed")
+                return
+            if self.state == OPEN:
+                return  # A call that started before the breaker opened
+            self._outcomes.append(failed)
+            if failed and len(self._outcomes) >= self.min_calls and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._outcomes.clear()
+        print(f"⚠️ {self.name} circuit open for {self.open_seconds:g}s ({self.last_error})")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for an upstream (e.g. 'overpass', 'google_place_details')"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def get_circuit_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """State of every breaker created so far"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.get_stats() for name, breaker in sorted(breakers.items())}
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+SQLite helpers shared by AidLink caches and the local resource catalog
+
+The database is a local runtime file (data/aidlink.db by default, not kept in
+git): every table is created on first use, so a fresh SQLITE_DB_PATH works.
+"""
+
+import os
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+CATALOG_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS resources (
+           id TEXT PRIMARY KEY,
+           name TEXT NOT NULL,
+           description TEXT,
+           category TEXT,
+           address TEXT,
+           phone TEXT,
+           email TEXT,
+           website TEXT,
+           hours TEXT,
+           services TEXT,
+           eligibility TEXT,
+           latitude REAL,
+           longitude REAL,
+           distance REAL DEFAULT 0.0,
+           rating REAL DEFAULT 4.0,
+           reviews INTEGER DEFAULT 0,
+           verified BOOLEAN DEFAULT TRUE,
+           data_source TEXT,
+           last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+           created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+       )''',
+    'CREATE INDEX IF NOT EXISTS idx_resources_category ON resources(category)',
+    'CREATE INDEX IF NOT EXISTS idx_resources_location ON resources(latitude, longitude)',
+    'CREATE INDEX IF NOT EXISTS idx_resources_verified ON resources(verified)',
+]
+
+
+def get_db_path() -> Path:
+    """Resolve SQLITE_DB_PATH (relative paths are relative to the AIDLINK/ folder)"""
+    db_path = Path(os.getenv('SQLITE_DB_PATH', './data/aidlink.db'))
+    if not db_path.is_absolute():
+        db_path = BASE_DIR / db_path
+    return db_path
+
+
+@contextmanager
+def get_connection():
+    """Open a short-lived connection to aidlink.db, committing on success"""
+    db_path = get_db_path()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=5)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def ensure_catalog_schema(conn):
+    """Create the resources catalog table and its indexes if this database doesn't have them yet"""
+    for statement in CATALOG_SCHEMA:
+        conn.execute(statement)
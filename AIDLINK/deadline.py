@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+End-to-end request deadlines
+
+A Deadline is created once per request and passed down through geocoding,
+provider searches, place details and Gemini calls. Each stage asks it for a
+timeout, which is the stage's own cap limited to whatever budget is left.
+"""
+
+import os
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage is started after the request budget has run out"""
+
+
+class Deadline:
+    """Latency budget for a single request"""
+
+    # Below this many seconds there is no point starting another network call
+    MIN_STAGE_SECONDS = 0.05
+
+    def __init__(self, budget_seconds: float):
+        self.budget_seconds = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds
+
+    @classmethod
+    def from_request(cls, deadline_ms=None, env_var: str = 'REQUEST_DEADLINE_MS', default_ms: int = 8000) -> 'Deadline':
+        """
+        Build a deadline from a client-supplied budget (ms), capped by config
+
+        The client may ask for a shorter budget than the configured one, never a longer one.
+        """
+        configured_ms = float(os.getenv(env_var, default_ms))
+        try:
+            requested_ms = float(deadline_ms) if deadline_ms else configured_ms
+        except (TypeError, ValueError):
+            requested_ms = configured_ms
+        return cls(max(0.0, min(requested_ms, configured_ms)) / 1000)
+
+    def remaining(self) -> float:
+        """Seconds left in the budget (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() < self.MIN_STAGE_SECONDS
+
+    def timeout(self, cap: float) -> float:
+        """Timeout for the next stage: its own cap, limited to the remaining budget"""
+        remaining = self.remaining()
+        if remaining < self.MIN_STAGE_SECONDS:
+            raise DeadlineExceeded(f"request deadline of {self.budget_seconds:.1f}s exceeded")
+        return min(cap, remaining)
+
+
+def stage_timeout(deadline: Optional[Deadline], cap: float) -> float:
+    """Timeout for a stage when a deadline may or may not be in effect"""
+    return deadline.timeout(cap) if deadline else cap
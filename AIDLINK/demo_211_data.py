@@ -1,5 +1,10 @@
 #!/usr/bin/env python3
 
+try:
+    from .text_index import rank_by_relevance
+except ImportError:
+    from text_index import rank_by_relevance
+
 
 def get_demo_211_data(query, location, category, max_results=10):
     
@@ -272,8 +277,8 @@ def get_demo_211_data(query, location, category, max_results=10):
         if filtered_resources:
             category_resources = filtered_resources
     
-    # Return limited results
-    return category_resources[:max_results]
+    # Return limited results, most relevant to the query first
+    return rank_by_relevance(category_resources, query)[:max_results]
 
 if __name__ == "__main__":
     # Test the demo data
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Shared geocoding service for all AidLink providers
+
+Location strings are geocoded once and cached in two tiers:
+an in-process LRU (with TTL) and the geocode_cache table in aidlink.db.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Any
+
+try:
+    from .database import get_connection
+    from .ttl_cache import TTLCache
+    from .http_session import build_session
+    from .deadline import Deadline, stage_timeout
+    from .single_flight import get_single_flight
+    from .quota_manager import get_quota_manager
+    from .circuit_breaker import get_circuit_breaker, raise_for_outage
+except ImportError:
+    from database import get_connection
+    from ttl_cache import TTLCache
+    from http_session import build_session
+    from deadline import Deadline, stage_timeout
+    from single_flight import get_single_flight
+    from quota_manager import get_quota_manager
+    from circuit_breaker import get_circuit_breaker, raise_for_outage
+
+_MISSING = object()
+
+
+class GeocodingService:
+    """Geocode location strings with Google (if configured) or Nominatim, with caching"""
+
+    def __init__(self, google_api_key: str = None):
+        self.google_api_key = google_api_key or os.getenv('GOOGLE_PLACES_API_KEY')
+        if self.google_api_key and (self.google_api_key == 'your_google_maps_api_key_here' or self.google_api_key.startswith('replace_with')):
+            self.google_api_key = None
+
+        self.ttl_seconds = float(os.getenv('GEOCODE_CACHE_TTL_HOURS', 720)) * 3600
+        # Failed lookups are remembered briefly so a fallback provider doesn't retry them
+        self.negative_ttl_seconds = float(os.getenv('GEOCODE_NEGATIVE_TTL_SECONDS', 300))
+        self.cache = TTLCache(maxsize=int(os.getenv('GEOCODE_CACHE_SIZE', 1024)), ttl_seconds=self.ttl_seconds)
+
+        self.session = build_session(headers={'User-Agent': 'AidLink'})  # User-Agent is required by Nominatim
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        self._db_ready = False
+
+    def geocode(self, location: str, deadline: Deadline = None) -> Optional[Dict[str, float]]:
+        """
+        Get coordinates for a location string
+
+        Args:
+            location: Location string (e.g., "Sacramento, CA")
+            deadline: Optional request deadline bounding the network lookup
+
+        Returns:
+            {'lat': ..., 'lng': ...} or None if the location could not be found
+        """
+        key = self._normalize(location)
+        if not key:
+            return None
+
+        cached = self.cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            self._count('memory_hits')
+            return dict(cached) if cached else None
+
+        coords = self._db_get(key)
+        if coords:
+            self._count('db_hits')
+            self.cache.set(key, coords)
+            return dict(coords)
+
+        self._count('misses')
+        # Concurrent lookups of the same location share one remote call
+        coords = get_single_flight('geocode').do(
+            key,
+            lambda: self._geocode_and_store(key, location, deadline),
+            timeout=deadline.remaining() if deadline else None,
+            lookup=lambda: self._db_get(key)
+        )
+        return dict(coords) if coords else None
+
+    def _geocode_and_store(self, key: str, location: str, deadline: Deadline = None) -> Optional[Dict[str, float]]:
+        coords, provider = self._geocode_remote(location, deadline)
+        if coords:
+            self.cache.set(key, coords)
+            self._db_set(key, location, coords, provider)
+            return coords
+
+        # A lookup cut short by the deadline or an outage says nothing about the location itself
+        if not (deadline and deadline.expired()) and not get_circuit_breaker('nominatim').is_open():
+            self.cache.set(key, None, ttl_seconds=self.negative_ttl_seconds)
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache hit/miss counters"""
+        with self._stats_lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.memory_hits + self.db_hits) / lookups, 3) if lookups else 0.0,
+                'cached_locations': len(self.cache)
+            }
+
+    def _normalize(self, location: str) -> str:
+        return ' '.join((location or '').lower().split())
+
+    def _count(self, counter: str):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _geocode_remote(self, location: str, deadline: Deadline = None):
+        """Try Google Geocoding first (if configured), then Nominatim"""
+        if self.google_api_key:
+            coords = self._geocode_google(location, deadline)
+            if coords:
+                return coords, 'google'
+
+        coords = self._geocode_nominatim(location, deadline)
+        if coords:
+            return coords, 'nominatim'
+
+        return None, None
+
+    def _geocode_google(self, location: str, deadline: Deadline = None) -> Optional[Dict[str, float]]:
+        """Get coordinates using Google Geocoding API"""
+        breaker = get_circuit_breaker('google_geocode')
+        if breaker.is_open() or not get_quota_manager().acquire('geocode', deadline):
+            return None  # Down or over quota - Nominatim takes it
+        try:
+            timeout = stage_timeout(deadline, 5)
+            response = breaker.call(lambda: raise_for_outage(self.session.get(
+                "https://maps.googleapis.com/maps/api/geocode/json",
+                params={
+                    'address': location,
+                    'key': self.google_api_key
+                },
+                timeout=timeout
+            )), capped_by_deadline=timeout < 5)
+
+            if response.status_code == 200:
+                data = response.json()
+                if data['status'] == 'OK' and data['results']:
+                    location_data = data['results'][0]['geometry']['location']
+                    return {'lat': location_data['lat'], 'lng': location_data['lng']}
+
+            return None
+        except Exception as e:
+            print(f"Geocoding error: {e}")
+            return None
+
+    def _geocode_nominatim(self, location: str, deadline: Deadline = None) -> Optional[Dict[str, float]]:
+        """Get coordinates using OSM Nominatim (free)"""
+        try:
+            timeout = stage_timeout(deadline, 5)
+            response = get_circuit_breaker('nominatim').call(lambda: raise_for_outage(self.session.get(
+                'https://nominatim.openstreetmap.org/search',
+                params={
+                    'q': location,
+                    'format': 'json',
+                    'limit': 1
+                },
+                timeout=timeout
+            )), capped_by_deadline=timeout < 5)
+
+            if response.status_code == 200:
+                data = response.json()
+                if data and len(data) > 0:
+                    return {
+                        'lat': float(data[0]['lat']),
+                        'lng': float(data[0]['lon'])
+                    }
+
+            return None
+        except Exception as e:
+            print(f"Nominatim geocoding error: {e}")
+            return None
+
+    def _ensure_table(self, conn):
+        if self._db_ready:
+            return
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                location_key TEXT PRIMARY KEY,
+                location TEXT,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                provider TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_geocode_expires ON geocode_cache(expires_at)')
+        self._db_ready = True
+
+    def _db_get(self, key: str) -> Optional[Dict[str, float]]:
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                row = conn.execute(
+                    'SELECT latitude, longitude FROM geocode_cache WHERE location_key = ? AND expires_at > ?',
+                    (key, datetime.now().isoformat())
+                ).fetchone()
+            if row:
+                return {'lat': row['latitude'], 'lng': row['longitude']}
+        except Exception as e:
+            print(f"Geocode cache read error: {e}")
+        return None
+
+    def _db_set(self, key: str, location: str, coords: Dict[str, float], provider: str):
+        try:
+            expires_at = datetime.now() + timedelta(seconds=self.ttl_seconds)
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                conn.execute(
+                    'INSERT OR REPLACE INTO geocode_cache (location_key, location, latitude, longitude, provider, expires_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, location, coords['lat'], coords['lng'], provider, expires_at.isoformat())
+                )
+        except Exception as e:
+            print(f"Geocode cache write error: {e}")
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_geocoding_service() -> GeocodingService:
+    """Process-wide geocoding service (shared by every provider client)"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = GeocodingService()
+    return _service
@@ -1,9 +1,28 @@
-import requests
 import os
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from dotenv import load_dotenv
 
+try:
+    from .geocoding_service import get_geocoding_service
+    from .place_details_cache import get_place_details_cache
+    from .http_session import build_session
+    from .deadline import Deadline, stage_timeout
+    from .ranking import rank_resources, haversine_miles
+    from .quota_manager import get_quota_manager, EXHAUSTED
+    from .circuit_breaker import get_circuit_breaker, raise_for_outage
+except ImportError:
+    from geocoding_service import get_geocoding_service
+    from place_details_cache import get_place_details_cache
+    from http_session import build_session
+    from deadline import Deadline, stage_timeout
+    from ranking import rank_resources, haversine_miles
+    from quota_manager import get_quota_manager, EXHAUSTED
+    from circuit_breaker import get_circuit_breaker, raise_for_outage
+
 ENV_FILE = os.getenv('AIDLINK_ENV_FILE', 'aidlink.env')
 env_path = Path(ENV_FILE)
 if env_path.exists():
@@ -16,6 +35,12 @@ class GooglePlacesClient:
         """Initialize Google Places client"""
         self.api_key = api_key or os.getenv('GOOGLE_PLACES_API_KEY')
         self.base_url = "https://maps.googleapis.com/maps/api/place"
+        # Max number of Place Details requests in flight at once
+        self.details_concurrency = max(1, int(os.getenv('GOOGLE_PLACES_DETAILS_CONCURRENCY', 8)))
+        # Google needs a moment before a next_page_token can be used
+        self.page_token_delay_seconds = float(os.getenv('GOOGLE_PLACES_PAGE_TOKEN_DELAY_SECONDS', 2))
+        # One pooled keep-alive session for the client's lifetime
+        self.session = build_session(host_pool_sizes={'https://maps.googleapis.com': self.details_concurrency})
         
         if not self.api_key or self.api_key == 'your_google_maps_api_key_here':
             print("⚠️ Google Places API key not configured. Get one at: https://console.cloud.google.com/")
@@ -25,7 +50,7 @@ class GooglePlacesClient:
             self.available = True
             print("✅ Google Places client initialized")
     
-    def search_places(self, query: str, location: str = None, category: str = None, max_results: int = 10, radius_miles: int = 10) -> Dict[str, Any]:
+    def search_places(self, query: str, location: str = None, category: str = None, max_results: int = 10, radius_miles: int = 10, location_coords: Dict[str, float] = None, deadline: Deadline = None, on_result: Callable[[Dict], None] = None) -> Dict[str, Any]:
         """
         Search for community resources using Google Places API
         
@@ -34,6 +59,9 @@ class GooglePlacesClient:
             location: Location to search in (e.g., "Sacramento, CA")
             category: Place category filter
             max_results: Maximum number of results
+            location_coords: Already-geocoded {'lat', 'lng'} for location (skips geocoding)
+            deadline: Optional request deadline; every API call gets only the time left
+            on_result: Called with each in-radius resource as its details arrive (for streaming)
         
         Returns:
             Dictionary with real place data
@@ -41,9 +69,17 @@ class GooglePlacesClient:
         if not self.available:
             return self._fallback_search(query, location, category, max_results)
         
+        # Declined calls return a non-success result, so the caller's own fallbacks (OSM, local data) run
+        if get_quota_manager().level() == EXHAUSTED:
+            print("⚠️ Google API budget exhausted - skipping Google Places")
+            return self._skipped('budget_exhausted')
+        if get_circuit_breaker('google_text_search').is_open():
+            return self._skipped('circuit_open')
+        
         try:
             # Get location coordinates
-            location_coords = self._geocode_location(location or "Sacramento, CA")
+            if not location_coords:
+                location_coords = self._geocode_location(location or "Sacramento, CA", deadline)
             
             if not location_coords:
                 return self._fallback_search(query, location, category, max_results)
@@ -59,48 +95,25 @@ class GooglePlacesClient:
                 location_coords['lng'],
                 enhanced_query,
                 max_results,
-                radius_meters
+                radius_meters,
+                deadline
             )
             
             if not places_result or 'results' not in places_result:
-                return self._fallback_search(query, location, category, max_results)
+                # Throttled, breaker tripped or no results - let the next provider try
+                return self._skipped('no_text_search_results')
             
-            # Get detailed info for each place
-            resources = []
-            user_lat = location_coords['lat']
-            user_lng = location_coords['lng']
+            place_ids = [place['place_id'] for place in places_result['results'] if place.get('place_id')]
+            page_token = places_result.get('next_page_token')
+            # A page holds at most 20 places; follow next_page_token now only when more results were asked for
+            if max_results > len(places_result['results']) and page_token and self._wait_for_page_token(deadline):
+                place_ids, page_token = self._more_place_ids(place_ids, page_token, max_results * 2, set(), deadline)
             
-            for place in places_result['results'][:max_results * 2]:  # Get more to filter
-                details = self._get_place_details(place['place_id'])
-                if details:
-                    # Calculate REAL distance BEFORE formatting
-                    distance = 999
-                    place_location = details.get('geometry', {}).get('location', {})
-                    if place_location.get('lat') and place_location.get('lng'):
-                        distance = self._calculate_distance(
-                            user_lat, user_lng,
-                            place_location.get('lat'), place_location.get('lng')
-                        )
-                    
-                    resource = self._format_resource(details, distance_miles=distance)
-                    resources.append(resource)
-            
-            # RANK RESOURCES by: rating + relevance + distance
-            ranked_resources = self._rank_resources(resources, query, max_results)
-            
-            # Filter out resources that are too far (use user's selected radius)
-            nearby_resources = [r for r in ranked_resources if r.get('distance', 999) <= radius_miles]
-            
-            if nearby_resources:
-                print(f"✅ Found {len(nearby_resources)} best-ranked resources within {radius_miles} miles")
-                return {
-                    'success': True,
-                    'recommendations': nearby_resources,
-                    'total_results': len(nearby_resources),
-                    'source': 'google_places',
-                    'confidence': 0.95,
-                    'verified': True
-                }
+            res = self._page_response(query, place_ids, page_token, set(), location_coords['lat'], location_coords['lng'],
+                                      max_results, radius_miles, deadline, on_result)
+            if res:
+                print(f"✅ Found {res['total_results']} best-ranked resources within {radius_miles} miles")
+                return res
             
             return self._fallback_search(query, location, category, max_results)
                 
@@ -125,85 +138,310 @@ class GooglePlacesClient:
         
         return enhanced
     
-    def _geocode_location(self, location: str) -> Optional[Dict[str, float]]:
-        """Get coordinates for a location using Geocoding API"""
-        try:
-            url = f"https://maps.googleapis.com/maps/api/geocode/json"
-            response = requests.get(
-                url,
-                params={
-                    'address': location,
-                    'key': self.api_key
-                },
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data['status'] == 'OK' and data['results']:
-                    location_data = data['results'][0]['geometry']['location']
-                    return {'lat': location_data['lat'], 'lng': location_data['lng']}
-            
-            return None
-        except Exception as e:
-            print(f"Geocoding error: {e}")
-            return None
+    def _geocode_location(self, location: str, deadline: Deadline = None) -> Optional[Dict[str, float]]:
+        """Get coordinates for a location (cached by the shared geocoding service)"""
+        return get_geocoding_service().geocode(location, deadline)
     
-    def _search_nearby_places(self, lat: float, lng: float, query: str, max_results: int, radius_meters: int = 16093) -> Optional[Dict]:
+    def _search_nearby_places(self, lat: float, lng: float, query: str, max_results: int, radius_meters: int = 16093, deadline: Deadline = None) -> Optional[Dict]:
         """Search for nearby places using Places API Text Search"""
-        try:
-            # Use text search for better keyword matching
-            params = {
-                'query': query,
-                'location': f"{lat},{lng}",
-                'radius': radius_meters,  # Uses user-selected radius
-                'key': self.api_key
-            }
-            
-            # Try Text Search first (better for keywords)
-            url = f"{self.base_url}/textsearch/json"
-            response = requests.get(
-                url,
-                params=params,
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('status') == 'OK':
-                    return data
-            
+        # Use text search for better keyword matching
+        data = self._text_search({
+            'query': query,
+            'location': f"{lat},{lng}",
+            'radius': radius_meters,  # Uses user-selected radius
+            'key': self.api_key
+        }, deadline)
+        return data if data and data.get('status') == 'OK' else None
+    
+    def _next_page(self, page_token: str, deadline: Deadline = None) -> Optional[Dict]:
+        """
+        Following page of a Text Search
+        
+        A next_page_token only becomes valid a moment after it is issued; if it is
+        used too early (INVALID_REQUEST) this waits and retries once, deadline permitting.
+        """
+        params = {'pagetoken': page_token, 'key': self.api_key}
+        data = self._text_search(params, deadline)
+        if data and data.get('status') == 'INVALID_REQUEST' and self._wait_for_page_token(deadline):
+            data = self._text_search(params, deadline)
+        return data if data and data.get('status') == 'OK' else None
+    
+    def _wait_for_page_token(self, deadline: Deadline = None) -> bool:
+        """Sleep until a fresh next_page_token is usable; False if the deadline doesn't allow it"""
+        if deadline and deadline.remaining() < self.page_token_delay_seconds + 1:
+            return False
+        time.sleep(self.page_token_delay_seconds)
+        return True
+    
+    def _text_search(self, params: Dict, deadline: Deadline = None) -> Optional[Dict]:
+        """One Text Search request (first page or pagetoken) through the breaker and quota"""
+        breaker = get_circuit_breaker('google_text_search')
+        if breaker.is_open():
+            return None
+        if not get_quota_manager().acquire('text_search', deadline):
+            print("⚠️ Places text search over quota")
             return None
+        try:
+            timeout = stage_timeout(deadline, 5)
+            return breaker.call(lambda: self._checked_get(f"{self.base_url}/textsearch/json", params, timeout),
+                                capped_by_deadline=timeout < 5)
         except Exception as e:
             print(f"Places search error: {e}")
             return None
     
-    def _get_place_details(self, place_id: str) -> Optional[Dict]:
+    def search_more(self, state: Dict[str, Any], deadline: Deadline = None) -> Dict[str, Any]:
+        """
+        Next page of a search, from the page_state of the previous page
+        
+        Places left over from earlier pages come first (their details are usually
+        cached already); further Text Search pages are fetched only when those run
+        out. Places already returned are never fetched or returned again.
+        """
+        returned = set(state.get('returned', []))
+        place_ids, page_token = state.get('place_ids', []), state.get('page_token')
+        # Only go back to Text Search when the leftovers can't fill a page
+        # (same target as the first page: _page_response fetches details for up to max_results * 2)
+        want = state['max_results'] * 2
+        if len(place_ids) < want and page_token and self.available and get_quota_manager().level() != EXHAUSTED:
+            place_ids, page_token = self._more_place_ids(place_ids, page_token, want, returned, deadline)
+        res = self._page_response(state['query'], place_ids, page_token, returned, state['lat'], state['lng'],
+                                  state['max_results'], state['radius_miles'], deadline)
+        return res or {
+            'success': True,
+            'recommendations': [],
+            'total_results': 0,
+            'source': 'google_places',
+            'verified': True
+        }
+    
+    def _more_place_ids(self, place_ids: List[str], page_token: str, want: int, returned: set,
+                        deadline: Deadline = None) -> tuple:
+        """Append place ids from following Text Search pages until there are want of them; returns (place_ids, page_token)"""
+        place_ids = list(place_ids)
+        known = returned.union(place_ids)
+        while page_token and len(place_ids) < want and not (deadline and deadline.expired()):
+            page = self._next_page(page_token, deadline)
+            if not page:
+                return place_ids, None
+            for place in page.get('results', []):
+                place_id = place.get('place_id')
+                if place_id and place_id not in known:
+                    known.add(place_id)
+                    place_ids.append(place_id)
+            page_token = page.get('next_page_token')
+            if page_token and len(place_ids) < want and not self._wait_for_page_token(deadline):
+                break
+        return place_ids, page_token
+    
+    def _page_response(self, query: str, place_ids: List[str], page_token: Optional[str], returned: set,
+                       user_lat: float, user_lng: float, max_results: int, radius_miles: float,
+                       deadline: Deadline = None, on_result: Callable[[Dict], None] = None) -> Optional[Dict[str, Any]]:
+        """
+        Ranked in-radius resources for the next places in place_ids (None if there are none)
+        
+        The response carries a 'page_state' when more results may follow: the
+        places not shown yet (fetched-but-unshown ones first), the Text Search
+        next_page_token and every place id returned so far.
+        """
+        # Get detailed info for each place (fetched concurrently, stops once enough are in radius)
+        resources, consumed = self._fetch_place_resources(
+            place_ids[:max_results * 2],  # Get more to filter
+            user_lat,
+            user_lng,
+            max_results,
+            radius_miles,
+            deadline,
+            on_result
+        )
+        
+        # RANK RESOURCES by: rating + relevance + distance
+        ranked_resources = self._rank_resources(resources, query, max_results)
+        
+        # Filter out resources that are too far (use user's selected radius)
+        nearby_resources = [r for r in ranked_resources if r.get('distance', 999) <= radius_miles]
+        if not nearby_resources:
+            return None
+        
+        returned = returned.union(r['id'] for r in nearby_resources)
+        res = {
+            'success': True,
+            'recommendations': nearby_resources,
+            'total_results': len(nearby_resources),
+            'source': 'google_places',
+            'confidence': 0.95,
+            'verified': True
+        }
+        # In-radius places that were fetched but didn't make this page come first next time
+        remaining = [r['id'] for r in resources if r['id'] not in returned and r.get('distance', 999) <= radius_miles]
+        remaining += [place_id for place_id in place_ids[consumed:] if place_id not in returned]
+        if remaining or page_token:
+            res['page_state'] = {
+                'query': query,
+                'lat': user_lat,
+                'lng': user_lng,
+                'radius_miles': radius_miles,
+                'max_results': max_results,
+                'place_ids': remaining,
+                'page_token': page_token,
+                'returned': sorted(returned)
+            }
+        return res
+    
+    def _get_place_details(self, place_id: str, deadline: Deadline = None) -> Optional[Dict]:
         """Get detailed information about a place"""
         if not place_id:
             return None
+        breaker = get_circuit_breaker('google_place_details')
+        if breaker.is_open() or not get_quota_manager().acquire('place_details', deadline):
+            return None
         
         try:
-            response = requests.get(
-                f"{self.base_url}/details/json",
-                params={
-                    'place_id': place_id,
-                    'fields': 'name,formatted_address,formatted_phone_number,website,opening_hours,geometry,types,rating,user_ratings_total',
-                    'key': self.api_key
-                },
-                timeout=5
-            )
+            params = {
+                'place_id': place_id,
+                'fields': 'name,formatted_address,formatted_phone_number,website,opening_hours,geometry,types,rating,user_ratings_total',
+                'key': self.api_key
+            }
+            timeout = stage_timeout(deadline, 5)
+            data = breaker.call(lambda: self._checked_get(f"{self.base_url}/details/json", params, timeout),
+                                capped_by_deadline=timeout < 5)
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('status') == 'OK':
-                    return data.get('result')
+            if data and data.get('status') == 'OK':
+                details = data.get('result') or {}
+                details.setdefault('place_id', place_id)
+                get_place_details_cache().set(place_id, details)
+                return details
             
             return None
         except Exception as e:
             print(f"Place details error: {e}")
             return None
     
+    def _checked_get(self, url: str, params: Dict, timeout: float) -> Optional[Dict]:
+        """
+        GET a Places endpoint and return its JSON (None for other non-200 responses)
+        
+        Outages (5xx, 429, OVER_QUERY_LIMIT, UNKNOWN_ERROR) raise so circuit breakers count them.
+        """
+        response = raise_for_outage(self.session.get(url, params=params, timeout=timeout))
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        if data.get('status') in ('OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'):
+            raise requests.HTTPError(f"Places API status {data['status']}", response=response)
+        return data
+    
+    def _fetch_place_resources(self, place_ids: List[str], user_lat: float, user_lng: float, max_results: int, radius_miles: float, deadline: Deadline = None,
+                               on_result: Callable[[Dict], None] = None) -> Tuple[List[Dict], int]:
+        """
+        Join text-search results with cached details, fetch the missing ones concurrently
+        
+        Results keep the text-search order. At most details_concurrency requests are
+        in flight, and no more than could still be needed to reach max_results
+        in-radius resources plus details_concurrency // 2 spare (places often turn
+        out to be outside the radius). Fetching stops as soon as the completed prefix of the
+        text-search order holds max_results resources inside the radius, or when
+        the request deadline runs out (whatever has completed so far is returned).
+        Near the spend budget the quota manager caps how many details calls are
+        made (down to none, i.e. cached details only). on_result sees each in-radius
+        resource as soon as it is known, cached ones first.
+        
+        Returns:
+            (resources, consumed): the resources in text-search order and how many
+            of place_ids they account for (the rest were not looked at)
+        """
+        if not place_ids:
+            return [], 0
+        
+        resources_by_index: Dict[int, Optional[Dict]] = {}
+        cached_details = get_place_details_cache().get_many(place_ids)
+        for i, place_id in enumerate(place_ids):
+            if not place_id:
+                resources_by_index[i] = None
+            elif place_id in cached_details:
+                resources_by_index[i] = self._details_to_resource(cached_details[place_id], user_lat, user_lng)
+        
+        def emit(resource):
+            if on_result and resource and resource.get('distance', 999) <= radius_miles:
+                on_result(resource)
+        
+        for resource in resources_by_index.values():
+            emit(resource)
+        
+        next_index = 0  # first index not yet part of the completed prefix
+        in_radius = 0
+        
+        def advance_prefix():
+            nonlocal next_index, in_radius
+            while next_index in resources_by_index and in_radius < max_results:
+                resource = resources_by_index[next_index]
+                if resource and resource.get('distance', 999) <= radius_miles:
+                    in_radius += 1
+                next_index += 1
+        
+        advance_prefix()
+        missing = [i for i in range(next_index, len(place_ids)) if i not in resources_by_index]
+        allowance = get_quota_manager().details_allowance(max_results)
+        if allowance is not None:
+            # Places we won't fetch details for drop out of the results
+            for i in missing[allowance:]:
+                resources_by_index[i] = None
+            missing = missing[:allowance]
+            advance_prefix()
+        missing = iter(missing)
+        pending = {}
+        # Some places turn out to be outside the radius or to have no details; a bounded
+        # over-fetch keeps the tail of the search concurrent instead of one round trip at a time
+        in_flight_target = max_results + self.details_concurrency // 2
+        executor = ThreadPoolExecutor(max_workers=self.details_concurrency)
+        try:
+            while in_radius < max_results:
+                # Only keep (about) as many requests in flight as could still be needed
+                likely = in_radius + len(pending) + sum(
+                    1 for i, r in resources_by_index.items()
+                    if i >= next_index and r and r.get('distance', 999) <= radius_miles
+                )
+                while len(pending) < self.details_concurrency and likely < in_flight_target:
+                    i = next(missing, None)
+                    if i is None:
+                        break
+                    pending[executor.submit(self._get_place_details, place_ids[i], deadline)] = i
+                    likely += 1
+                
+                if not pending:
+                    break
+                
+                done, _ = wait(pending, timeout=deadline.remaining() if deadline else None, return_when=FIRST_COMPLETED)
+                if not done:
+                    print("⚠️ Request deadline reached while fetching place details")
+                    break
+                for future in done:
+                    i = pending.pop(future)
+                    try:
+                        details = future.result()
+                    except Exception as e:
+                        print(f"Place details error: {e}")
+                        details = None
+                    resources_by_index[i] = self._details_to_resource(details, user_lat, user_lng) if details else None
+                    emit(resources_by_index[i])
+                advance_prefix()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return [resources_by_index[i] for i in range(next_index) if resources_by_index[i]], next_index
+    
+    def _details_to_resource(self, details: Dict, user_lat: float, user_lng: float) -> Dict[str, Any]:
+        """Format place details as a resource with its REAL distance from the user"""
+        # Calculate REAL distance BEFORE formatting
+        distance = 999
+        place_location = details.get('geometry', {}).get('location', {})
+        if place_location.get('lat') and place_location.get('lng'):
+            distance = self._calculate_distance(
+                user_lat, user_lng,
+                place_location.get('lat'), place_location.get('lng')
+            )
+        
+        return self._format_resource(details, distance_miles=distance)
+    
     def _format_resource(self, place_data: Dict, distance_miles: float = None) -> Dict[str, Any]:
         """Format Google Places data into AidLink resource format"""
         location = place_data.get('geometry', {}).get('location', {})
@@ -291,68 +529,22 @@ class GooglePlacesClient:
     
     def _calculate_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
         """Calculate distance in miles using Haversine formula"""
-        from math import radians, sin, cos, sqrt, atan2
-        
-        R = 3959  # Earth radius in miles
-        
-        lat1, lng1, lat2, lng2 = map(radians, [lat1, lng1, lat2, lng2])
-        
-        dlat = lat2 - lat1
-        dlng = lng2 - lng1
-        
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlng/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        
-        return round(R * c, 1)
+        return round(haversine_miles(lat1, lng1, lat2, lng2), 1)
     
     def _rank_resources(self, resources: List[Dict], query: str, max_results: int) -> List[Dict]:
-        """Intelligently rank resources by rating, relevance, and distance"""
-        query_lower = query.lower()
-        
-        for resource in resources:
-            score = 0
-            
-            # Rating score (0-60 points) - INCREASED WEIGHT to favor quality
-            if resource.get('rating'):
-                score += resource['rating'] * 12  # 5.0 rating = 60 points (was 50)
-            else:
-                score += 20  # Default if no rating (was 25)
-            
-            # Distance score (0-25 points, closer is better) - REDUCED WEIGHT
-            distance = resource.get('distance', 999)
-            if distance <= 1:
-                score += 25
-            elif distance <= 3:
-                score += 15
-            elif distance <= 5:
-                score += 8
-            else:
-                score += 3
-            
-            # Relevance score (0-15 points, keyword matching) - REDUCED WEIGHT
-            name = str(resource.get('name', '')).lower()
-            services = str(resource.get('services', '')).lower()
-            description = str(resource.get('description', '')).lower()
-            
-            # Count keyword matches
-            query_words = query_lower.split()
-            matches = sum(1 for word in query_words if word in name or word in services or word in description)
-            score += matches * 7  # 7 points per keyword match (was 10)
-            
-            resource['_rank_score'] = score
-        
-        # Sort by rating FIRST (highest rated), then by score, then by distance
-        ranked = sorted(resources, key=lambda x: (
-            -x.get('rating', 0) if x.get('rating') else 0,  # Rating first!
-            -x.get('_rank_score', 0),
-            x.get('distance', 999)
-        ))
-        
-        # Remove the internal ranking score before returning
-        for resource in ranked:
-            resource.pop('_rank_score', None)
-        
-        return ranked[:max_results]
+        """Intelligently rank resources by rating, relevance, and distance (see ranking.py)"""
+        return rank_resources(resources, query, max_results)
+    
+    def _skipped(self, reason: str) -> Dict[str, Any]:
+        """Result for a search Google Places declined to run (no demo data, so other providers get a turn)"""
+        return {
+            'success': False,
+            'recommendations': [],
+            'total_results': 0,
+            'source': 'skipped',
+            'skipped': reason,
+            'verified': False
+        }
     
     def _fallback_search(self, query: str, location: str, category: str, max_results: int) -> Dict[str, Any]:
         """Fallback when Google Places is not available"""
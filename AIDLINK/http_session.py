@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Pooled HTTP sessions for provider clients
+
+Each client keeps one requests.Session for its lifetime, so connections
+(and TLS sessions) are reused across searches instead of being set up
+again for every call.
+
+Failed connects and 502/503/504 responses are retried; read timeouts are
+not. A read timeout has already used the call's whole (possibly
+deadline-capped) timeout, so retrying it would overrun the request budget,
+and it is raised as requests.ReadTimeout rather than a ConnectionError.
+"""
+
+import os
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def build_session(host_pool_sizes: Dict[str, int] = None, headers: Dict[str, str] = None) -> requests.Session:
+    """
+    Create a keep-alive session with connection pooling and retries
+    
+    Args:
+        host_pool_sizes: {'https://host': max pooled connections} for hosts that
+            need a bigger (or smaller) pool than HTTP_POOL_SIZE
+        headers: Default headers sent with every request
+    """
+    default_pool_size = int(os.getenv('HTTP_POOL_SIZE', 10))
+    retries = Retry(
+        total=int(os.getenv('HTTP_RETRIES', 2)),
+        read=False,  # Re-raise read timeouts as-is instead of retrying them
+        backoff_factor=float(os.getenv('HTTP_RETRY_BACKOFF', 0.3)),
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False
+    )
+    
+    session = requests.Session()
+    if headers:
+        session.headers.update(headers)
+    
+    session.mount('https://', HTTPAdapter(pool_connections=default_pool_size, pool_maxsize=default_pool_size, max_retries=retries))
+    session.mount('http://', HTTPAdapter(pool_connections=default_pool_size, pool_maxsize=default_pool_size, max_retries=retries))
+    for host, pool_size in (host_pool_sizes or {}).items():
+        session.mount(host, HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size), max_retries=retries))
+    
+    return session
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Bulk OpenStreetMap ingestion into the resources table
+
+Loads community resources for a whole region ahead of time so searches are
+answered from the local catalog instead of a live Overpass call per search.
+
+Usage:
+    python ingest_osm.py sacramento.json                  # Overpass JSON dump
+    python ingest_osm.py --bbox 38.3,-121.7,38.9,-121.0   # download from Overpass
+
+Elements are stream-parsed (memory stays bounded by the batch size, not the
+dump size), mapped with the same tag logic as OSMCommunityClient and upserted
+in batches, so scheduled re-runs are idempotent.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Any
+
+try:
+    from .database import get_connection, ensure_catalog_schema
+    from .openstreetmap_community_client import OSMCommunityClient, OSM_CATEGORY_TAGS
+except ImportError:
+    from database import get_connection, ensure_catalog_schema
+    from openstreetmap_community_client import OSMCommunityClient, OSM_CATEGORY_TAGS
+
+CHUNK_SIZE = 1 << 16
+# No real element (or Overpass header) comes close to this; more undecodable text is a malformed dump
+MAX_ELEMENT_CHARS = 4 << 20
+BATCH_SIZE = int(os.getenv('OSM_INGEST_BATCH_SIZE', 500))
+
+RESOURCE_FIELDS = [
+    'id', 'name', 'description', 'category', 'address', 'phone', 'email', 'website', 'hours',
+    'services', 'eligibility', 'latitude', 'longitude', 'distance', 'rating', 'reviews', 'verified',
+    'data_source', 'last_updated'
+]
+UPDATE_FIELDS = [field for field in RESOURCE_FIELDS if field not in ('id', 'last_updated')]
+
+# Unchanged rows are left alone, so re-runs don't rewrite (or re-index) the catalog
+UPSERT_SQL = (
+    f"INSERT INTO resources ({', '.join(RESOURCE_FIELDS)}) VALUES ({', '.join('?' * len(RESOURCE_FIELDS))}) "
+    f"ON CONFLICT(id) DO UPDATE SET {', '.join(f'{field} = excluded.{field}' for field in RESOURCE_FIELDS[1:])} "
+    f"WHERE {' OR '.join(f'{field} IS NOT excluded.{field}' for field in UPDATE_FIELDS)}"
+)
+
+_SEPARATOR = re.compile(r'[\s,]*')
+
+
+def iter_overpass_elements(chunks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the entries of an Overpass JSON "elements" array one at a time
+
+    Args:
+        chunks: Text chunks of the JSON document (file reads or HTTP body chunks)
+
+    Raises:
+        ValueError: The input isn't an Overpass JSON dump (no "elements" array within
+            MAX_ELEMENT_CHARS, or an element that doesn't decode within MAX_ELEMENT_CHARS)
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer = ''
+    header_chars = 0
+
+    # Skip the header ("version", "osm3s", ...) up to the start of the elements array
+    while True:
+        match = re.search(r'"elements"\s*:\s*\[', buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        if header_chars > MAX_ELEMENT_CHARS:
+            raise ValueError('Not an Overpass JSON dump: no "elements" array found')
+        chunk = next(chunks, None)
+        if chunk is None:
+            return
+        header_chars += len(chunk)
+        buffer = buffer[-64:] + chunk
+
+    pos = 0
+    while True:
+        pos = _SEPARATOR.match(buffer, pos).end()
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            element, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Element split across chunks - read more and retry
+            if len(buffer) - pos > MAX_ELEMENT_CHARS:
+                raise ValueError(f"Malformed Overpass JSON: no decodable element in {MAX_ELEMENT_CHARS} characters")
+            chunk = next(chunks, None)
+            if chunk is None:
+                if buffer[pos:].strip():
+                    raise ValueError('Truncated Overpass JSON: elements array is not closed')
+                return
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield element
+        if pos > CHUNK_SIZE:
+            buffer, pos = buffer[pos:], 0
+
+
+def iter_file_chunks(path: str) -> Iterator[str]:
+    """Read a dump in fixed-size text chunks ('-' reads stdin)"""
+    stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), ''):
+            yield chunk
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def iter_overpass_chunks(client: OSMCommunityClient, bbox: List[float], timeout: int = 180) -> Iterator[str]:
+    """Stream every community-resource element in a bounding box from Overpass"""
+    query = client._build_overpass_query(list(all_osm_tags()), [tuple(bbox)], server_timeout=timeout)
+    response = client.session.post(client.overpass_url, data={'data': query}, timeout=timeout + 30, stream=True)
+    response.raise_for_status()
+    response.encoding = response.encoding or 'utf-8'
+    try:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE, decode_unicode=True):
+            yield chunk
+    finally:
+        response.close()
+
+
+def all_osm_tags() -> set:
+    """Every OSM tag AidLink searches for, across all categories"""
+    return set().union(*OSM_CATEGORY_TAGS.values())
+
+
+def ingest_elements(elements: Iterable[Dict], client: OSMCommunityClient, batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """
+    Map elements to resources and upsert them in batches
+
+    Returns:
+        Counters: seen, skipped and upserted (inserted or changed) elements
+    """
+    with get_connection() as conn:
+        ensure_catalog_schema(conn)
+    osm_tags = list(all_osm_tags())
+    now = datetime.now().isoformat()
+    stats = {'seen': 0, 'skipped': 0, 'upserted': 0}
+    batch = []
+
+    for element in elements:
+        stats['seen'] += 1
+        tags = element.get('tags') or {}
+        resource = client._element_to_resource(element) if client._matches_osm_tags(tags, osm_tags) else None
+        if not resource:
+            stats['skipped'] += 1
+            continue
+        batch.append(_resource_row(resource, now))
+        if len(batch) >= batch_size:
+            stats['upserted'] += _upsert(batch)
+            batch = []
+
+    if batch:
+        stats['upserted'] += _upsert(batch)
+    return stats
+
+
+def _resource_row(resource: Dict[str, Any], now: str) -> tuple:
+    row = dict(resource, data_source=resource.get('source', 'openstreetmap'), last_updated=now)
+    row['verified'] = 1 if row.get('verified') else 0
+    return tuple(row.get(field) for field in RESOURCE_FIELDS)
+
+
+def _upsert(rows: List[tuple]) -> int:
+    with get_connection() as conn:
+        # rowcount counts the upserted rows only; total_changes would also count
+        # the writes of the FTS and R-tree sync triggers
+        return conn.executemany(UPSERT_SQL, rows).rowcount
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Ingest OpenStreetMap community resources into aidlink.db')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('dump', nargs='?', help="Overpass JSON dump ('-' for stdin)")
+    source.add_argument('--bbox', help='Download from Overpass instead: south,west,north,east')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per upsert transaction')
+    args = parser.parse_args(argv)
+
+    client = OSMCommunityClient()
+    if args.bbox:
+        try:
+            bbox = [float(part) for part in args.bbox.split(',')]
+        except ValueError:
+            bbox = []
+        if len(bbox) != 4:
+            parser.error('--bbox must be south,west,north,east')
+        chunks = iter_overpass_chunks(client, bbox)
+    else:
+        chunks = iter_file_chunks(args.dump)
+
+    started = time.perf_counter()
+    stats = ingest_elements(iter_overpass_elements(chunks), client, args.batch_size)
+    print(f"✅ OSM ingestion done in {time.perf_counter() - started:.1f}s: "
+          f"{stats['seen']} elements, {stats['upserted']} upserted, {stats['skipped']} skipped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
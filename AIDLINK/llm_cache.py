@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Cache of Gemini answers keyed on normalized input text
+
+Answers are cached in memory and in the llm_cache table of aidlink.db,
+under a SHA-256 of the method, its exact-match scope (location, context,
+...) and the normalized text, so situations (which can carry personal
+details) never appear in keys.
+
+With LLM_CACHE_NEAR_DUPLICATES (off by default), rewordings of a situation
+("lost my job, need food, 2 kids" vs "Lost my job and need food - 2 kids")
+can also be matched: the word shingles of the text are MinHashed and LSH
+band keys are stored in llm_cache_bands. A candidate is a hit when its
+estimated Jaccard similarity reaches LLM_CACHE_NEAR_DUP_THRESHOLD. Only word
+order, punctuation and stopwords may differ: texts with different content
+words ("..., I am a veteran" added), numbers or negations ("citizen" vs
+"not a citizen") never match, since any such fact can change the answer.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    from .database import get_connection
+    from .ttl_cache import TTLCache
+    from .text_index import TOKEN_RE, STOPWORDS, tokenize
+except ImportError:
+    from database import get_connection
+    from ttl_cache import TTLCache
+    from text_index import TOKEN_RE, STOPWORDS, tokenize
+
+NUM_PERM = 64
+BANDS = 16  # 4 rows per band: pairs at ~0.85 similarity share a band ~99% of the time
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_rng = np.random.default_rng(20240601)  # fixed seed: every worker must compute the same signatures
+_A = _rng.integers(1, 2 ** 31, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2 ** 31, NUM_PERM, dtype=np.uint64)
+NEGATIONS = frozenset('no not never without nor none neither nobody nothing cannot dont cant wont isnt arent '
+                      'doesnt didnt hasnt havent hadnt wasnt werent couldnt shouldnt wouldnt aint'.split())
+
+
+def normalize_text(text: str) -> str:
+    """Lowercased words without punctuation or extra whitespace"""
+    return ' '.join(TOKEN_RE.findall(str(text or '').lower()))
+
+
+def negated_phrases(normalized: str) -> List[str]:
+    """Each negation with the two words after it ("not us citizen", "no insurance"), sorted"""
+    words = normalized.split()
+    phrases = []
+    for i, word in enumerate(words):
+        # TOKEN_RE splits "isn't" / "don't" into "isn t" / "don t"
+        if word in NEGATIONS or (word == 't' and i and words[i - 1].endswith('n')):
+            following = [w for w in words[i + 1:i + 5] if w not in STOPWORDS][:2]
+            phrases.append(' '.join(['not'] + following))
+    return sorted(phrases)
+
+
+def shingles(normalized: str) -> set:
+    """Stemmed words and word pairs of normalized text, without stopwords"""
+    words = tokenize(normalized)
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def minhash(items: set) -> np.ndarray:
+    """MinHash signature (NUM_PERM values) of a set of strings"""
+    if not items:
+        return np.zeros(NUM_PERM, dtype=np.uint64)
+    hashes = np.fromiter((zlib.crc32(item.encode('utf-8')) for item in items), dtype=np.uint64, count=len(items))
+    return ((np.outer(hashes, _A) + _B) % _PRIME).min(axis=0)
+
+
+class LLMCache:
+    """Memory + SQLite cache of model answers with exact and near-duplicate lookup"""
+
+    def __init__(self):
+        self.enabled = os.getenv('LLM_CACHE_ENABLED', 'True').lower() == 'true'
+        self.ttl_seconds = float(os.getenv('LLM_CACHE_TTL_HOURS', 24)) * 3600
+        self.max_db_rows = int(os.getenv('LLM_CACHE_DB_MAX_ROWS', 20000))
+        self.near_duplicates = os.getenv('LLM_CACHE_NEAR_DUPLICATES', 'False').lower() == 'true'
+        self.threshold = float(os.getenv('LLM_CACHE_NEAR_DUP_THRESHOLD', 0.85))
+        self.memory = TTLCache(maxsize=int(os.getenv('LLM_CACHE_SIZE', 1024)), ttl_seconds=self.ttl_seconds)
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._db_ready = False
+        self._lock = threading.Lock()
+
+    def get(self, method: str, text: str, scope: Any = None, near: bool = True) -> Optional[Any]:
+        """
+        Cached answer for method(text) within scope, or None
+
+        Args:
+            scope: Other inputs that must match exactly (location, context, ...)
+            near: Also accept a near-duplicate text (for free-form situations)
+        """
+        if not self.enabled:
+            return None
+        normalized = normalize_text(text)
+        key = self._key(method, scope, normalized)
+
+        value = self.memory.get(key)
+        if value is not None:
+            self._count('memory_hits')
+            return json.loads(value)
+
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                row = conn.execute('SELECT value FROM llm_cache WHERE cache_key = ? AND expires_at > ?',
+                                   (key, datetime.now().isoformat())).fetchone()
+                if row is not None:
+                    self.memory.set(key, row['value'])
+                    self._count('db_hits')
+                    return json.loads(row['value'])
+                if near and self.near_duplicates:
+                    value = self._near_lookup(conn, method, scope, normalized)
+                    if value is not None:
+                        # The same text will be asked again - remember it under its own key
+                        self.memory.set(key, value)
+                        self._count('near_hits')
+                        return json.loads(value)
+        except Exception as e:
+            print(f"LLM cache read error: {e}")
+
+        self._count('misses')
+        return None
+
+    def set(self, method: str, text: str, value: Any, scope: Any = None):
+        """Cache an answer (must be JSON-serializable)"""
+        if not self.enabled or value is None:
+            return
+        normalized = normalize_text(text)
+        key = self._key(method, scope, normalized)
+        encoded = json.dumps(value, separators=(',', ':'))
+        self.memory.set(key, encoded)
+
+        signature = minhash(shingles(normalized))
+        now = datetime.now()
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                conn.execute(
+                    'INSERT OR REPLACE INTO llm_cache (cache_key, method, value, signature, created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, method, encoded, signature.tobytes(), now.isoformat(), (now + timedelta(seconds=self.ttl_seconds)).isoformat())
+                )
+                conn.executemany(
+                    'INSERT OR IGNORE INTO llm_cache_bands (band_key, cache_key) VALUES (?, ?)',
+                    [(band_key, key) for band_key in self._band_keys(method, scope, normalized, signature)]
+                )
+                with self._lock:
+                    self._writes += 1
+                    check_size = self._writes % 100 == 1
+                if check_size:
+                    self._evict(conn)
+        except Exception as e:
+            print(f"LLM cache write error: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.near_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'near_duplicate_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': round((lookups - self.misses) / lookups, 3) if lookups else 0.0,
+                'cached_answers': len(self.memory)
+            }
+
+    def _near_lookup(self, conn, method: str, scope: Any, normalized: str) -> Optional[str]:
+        """Best cached answer whose text is similar enough to normalized"""
+        signature = minhash(shingles(normalized))
+        band_keys = self._band_keys(method, scope, normalized, signature)
+        placeholders = ','.join('?' for _ in band_keys)
+        rows = conn.execute(
+            f'''SELECT c.value, c.signature FROM llm_cache c
+                WHERE c.cache_key IN (SELECT cache_key FROM llm_cache_bands WHERE band_key IN ({placeholders}))
+                  AND c.expires_at > ?''',
+            (*band_keys, datetime.now().isoformat())
+        ).fetchall()
+        best, best_similarity = None, self.threshold
+        for row in rows:
+            similarity = float(np.mean(np.frombuffer(row['signature'], dtype=np.uint64) == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = row['value'], similarity
+        return best
+
+    def _key(self, method: str, scope: Any, normalized: str) -> str:
+        return hashlib.sha256(f"{method}\0{self._scope(scope)}\0{normalized}".encode('utf-8')).hexdigest()
+
+    def _scope(self, scope: Any) -> str:
+        return json.dumps(scope, sort_keys=True, default=str) if scope is not None else ''
+
+    def _band_keys(self, method: str, scope: Any, normalized: str, signature: np.ndarray) -> List[str]:
+        # The content words, numbers and negations are part of the band prefix: an added fact
+        # ("I am a veteran") must never match, nor "2 kids" match "5 kids", nor "a US citizen"
+        # match "not a US citizen"
+        content_words = ' '.join(sorted(set(tokenize(normalized))))
+        numbers = ' '.join(sorted(word for word in normalized.split() if word.isdigit()))
+        negations = '|'.join(negated_phrases(normalized))
+        prefix = f"{method}\0{self._scope(scope)}\0{content_words}\0{numbers}\0{negations}"
+        rows = NUM_PERM // BANDS
+        return [
+            hashlib.sha256(f"{prefix}\0{band}\0".encode('utf-8') + signature[band * rows:(band + 1) * rows].tobytes()).hexdigest()[:32]
+            for band in range(BANDS)
+        ]
+
+    def _evict(self, conn):
+        """Drop expired answers, then the oldest above the size cap, then their band entries"""
+        conn.execute('DELETE FROM llm_cache WHERE expires_at <= ?', (datetime.now().isoformat(),))
+        count = conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+        if count > self.max_db_rows:
+            conn.execute(
+                'DELETE FROM llm_cache WHERE cache_key IN (SELECT cache_key FROM llm_cache ORDER BY expires_at LIMIT ?)',
+                (count - self.max_db_rows,)
+            )
+        conn.execute('DELETE FROM llm_cache_bands WHERE cache_key NOT IN (SELECT cache_key FROM llm_cache)')
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _ensure_table(self, conn):
+        if self._db_ready:
+            return
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,  -- sha256(method, scope, normalized text)
+                method TEXT NOT NULL,
+                value TEXT NOT NULL,  -- JSON answer
+                signature BLOB,  -- MinHash of the normalized text
+                created_at TIMESTAMP,
+                expires_at TIMESTAMP
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache_bands (
+                band_key TEXT NOT NULL,
+                cache_key TEXT NOT NULL,
+                PRIMARY KEY (band_key, cache_key)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at)')
+        self._db_ready = True
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Process-wide LLM answer cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
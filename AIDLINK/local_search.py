@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Local-first search over the resources table in aidlink.db
+
+Radius queries go through an R-tree virtual table (resources_rtree) that is
+kept in sync with resources by triggers. If this SQLite build has no R-tree
+module, the bounding box is answered by idx_resources_location instead.
+Free-text queries are first matched against an FTS5 index (resources_fts,
+also trigger-synced) in the same query as the radius and category filters.
+External providers are only needed when local coverage is too thin.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from math import cos, radians
+from typing import Dict, List, Any, Optional
+
+try:
+    from .database import get_connection, ensure_catalog_schema
+    from .ranking import CandidateSet, rank_resources, np
+    from .text_index import TextIndex, resource_text, TOKEN_RE, STOPWORDS
+except ImportError:
+    from database import get_connection, ensure_catalog_schema
+    from ranking import CandidateSet, rank_resources, np
+    from text_index import TextIndex, resource_text, TOKEN_RE, STOPWORDS
+
+MILES_PER_DEGREE_LAT = 69.0
+
+RTREE_SCHEMA = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS resources_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)',
+    '''CREATE TRIGGER IF NOT EXISTS resources_rtree_insert AFTER INSERT ON resources
+       WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+       BEGIN
+           INSERT OR REPLACE INTO resources_rtree VALUES (new.rowid, new.latitude, new.latitude, new.longitude, new.longitude);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS resources_rtree_update AFTER UPDATE OF latitude, longitude ON resources
+       BEGIN
+           DELETE FROM resources_rtree WHERE id = old.rowid;
+           INSERT INTO resources_rtree
+               SELECT new.rowid, new.latitude, new.latitude, new.longitude, new.longitude
+               WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS resources_rtree_delete AFTER DELETE ON resources
+       BEGIN
+           DELETE FROM resources_rtree WHERE id = old.rowid;
+       END''',
+    # Backfill rows that existed before the index did
+    '''INSERT INTO resources_rtree
+       SELECT rowid, latitude, latitude, longitude, longitude FROM resources
+       WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+         AND rowid NOT IN (SELECT id FROM resources_rtree)''',
+]
+
+FTS_COLUMNS = 'name, description, services, eligibility'
+
+FTS_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS resources_fts USING fts5(
+           {FTS_COLUMNS}, content='resources', content_rowid='rowid', tokenize='porter unicode61'
+       )""",
+    f"""CREATE TRIGGER IF NOT EXISTS resources_fts_insert AFTER INSERT ON resources
+       BEGIN
+           INSERT INTO resources_fts(rowid, {FTS_COLUMNS})
+               VALUES (new.rowid, new.name, new.description, new.services, new.eligibility);
+       END""",
+    f"""CREATE TRIGGER IF NOT EXISTS resources_fts_update AFTER UPDATE OF {FTS_COLUMNS} ON resources
+       BEGIN
+           INSERT INTO resources_fts(resources_fts, rowid, {FTS_COLUMNS})
+               VALUES ('delete', old.rowid, old.name, old.description, old.services, old.eligibility);
+           INSERT INTO resources_fts(rowid, {FTS_COLUMNS})
+               VALUES (new.rowid, new.name, new.description, new.services, new.eligibility);
+       END""",
+    f"""CREATE TRIGGER IF NOT EXISTS resources_fts_delete AFTER DELETE ON resources
+       BEGIN
+           INSERT INTO resources_fts(resources_fts, rowid, {FTS_COLUMNS})
+               VALUES ('delete', old.rowid, old.name, old.description, old.services, old.eligibility);
+       END""",
+]
+
+# bm25() column weights: name, description, services, eligibility
+FTS_WEIGHTS = '10.0, 2.0, 5.0, 1.0'
+
+RESOURCE_COLUMNS = (
+    'r.id, r.name, r.description, r.category, r.address, r.phone, r.email, r.website, r.hours, '
+    'r.services, r.eligibility, r.latitude, r.longitude, r.rating, r.reviews, r.verified, r.data_source, r.last_updated'
+)
+
+
+class LocalResourceIndex:
+    """Radius + category search over the local resources catalog"""
+
+    def __init__(self):
+        self.enabled = os.getenv('LOCAL_SEARCH_ENABLED', 'True').lower() == 'true'
+        # Fewer local results than this (within the radius) means coverage is too thin
+        self.min_results = int(os.getenv('LOCAL_SEARCH_MIN_RESULTS', 5))
+        # Text matches fetched (best bm25 first) before ranking
+        self.text_candidates = int(os.getenv('LOCAL_SEARCH_TEXT_CANDIDATES', 200))
+        # Above this many catalog matches the FTS query costs more than it filters out
+        self.fts_max_matches = int(os.getenv('LOCAL_SEARCH_FTS_MAX_MATCHES', 2000))
+        self.has_rtree = None
+        self.has_fts = None
+        self._schema_lock = threading.Lock()
+
+        # BM25 index and ranking columns over the whole catalog, rebuilt when the catalog changes
+        self.text_index_refresh_seconds = float(os.getenv('LOCAL_TEXT_INDEX_REFRESH_SECONDS', 300))
+        self._text_index = None
+        self._candidates = None
+        self._text_index_signature = None
+        self._text_index_checked = 0.0
+        self._text_index_lock = threading.Lock()
+
+    def search(self, query: str, lat: float, lng: float, radius_miles: float, category: str = None,
+               max_results: int = 10) -> List[Dict[str, Any]]:
+        """
+        Ranked resources within radius_miles of (lat, lng)
+
+        A free-text search (no category) only returns resources matching the
+        query text. With a category, text matches come first and the rest of
+        the category within the radius fills up the results.
+        """
+        if not self.enabled:
+            return []
+
+        terms = fts_terms(query)
+        free_text = bool(terms) and not (category and category != 'general')
+        text_results = []
+        try:
+            with get_connection() as conn:
+                self._ensure_schema(conn)
+                text_index = self._catalog_text_index(conn)
+                # Terms matching most of the catalog make a poor filter; rank the radius instead
+                if terms and self.has_fts and text_index.match_count(query) <= self.fts_max_matches:
+                    text_rows = self._query_text(conn, terms, lat, lng, radius_miles, category)
+                    text_results = self._rank_rows(text_rows, query, lat, lng, radius_miles, max_results, text_index)
+                    if free_text or self.has_enough(text_results, max_results):
+                        return text_results
+                rows = self._query_bbox(conn, lat, lng, radius_miles, category)
+        except Exception as e:
+            print(f"Local search error: {e}")
+            return []
+
+        if free_text:
+            matching = text_index.scores(query, [row['id'] for row in rows])
+            rows = [row for row in rows if row['id'] in matching]
+        ranked = self._rank_rows(rows, query, lat, lng, radius_miles, max_results, text_index)
+        if not text_results:
+            return ranked
+        seen = {r['id'] for r in text_results}
+        return (text_results + [r for r in ranked if r['id'] not in seen])[:max_results]
+
+    def _rank_rows(self, rows, query: str, lat: float, lng: float, radius_miles: float, max_results: int,
+                   text_index: TextIndex) -> List[Dict[str, Any]]:
+        if not rows:
+            return []
+        candidates = self._candidates
+        positions = None
+        if candidates is not None and candidates.text_index is text_index:
+            positions = candidates.positions([row['id'] for row in rows])
+        if positions is not None:
+            # Rank the rows as a subset of the kept catalog candidate set
+            return candidates.rank(query, max_results, lat, lng, indices=positions, max_distance=radius_miles)
+        # Rows newer than the kept candidate set (or no NumPy): rank them on their own
+        ranked = rank_resources([self._row_to_resource(row) for row in rows], query, len(rows), lat, lng, text_index)
+        return [r for r in ranked if r.get('distance', 999) <= radius_miles][:max_results]
+
+    def has_enough(self, results: List[Dict], max_results: int) -> bool:
+        """Whether local results cover the request without calling external providers"""
+        return bool(results) and len(results) >= min(self.min_results, max_results)
+
+    def _query_bbox(self, conn, lat: float, lng: float, radius_miles: float, category: Optional[str]):
+        tables, where, params = self._spatial_filter(lat, lng, radius_miles, category)
+        return conn.execute(f'SELECT {RESOURCE_COLUMNS} FROM {tables} WHERE {where}', params).fetchall()
+
+    def _query_text(self, conn, terms: List[str], lat: float, lng: float, radius_miles: float, category: Optional[str]):
+        """Best text matches (by bm25) inside the radius and category, in one query"""
+        tables, where, params = self._spatial_filter(lat, lng, radius_miles, category)
+        sql = (f'SELECT {RESOURCE_COLUMNS} FROM resources_fts f JOIN {tables} '
+               f'WHERE resources_fts MATCH ? AND r.rowid = f.rowid AND {where} '
+               f'ORDER BY bm25(resources_fts, {FTS_WEIGHTS}) LIMIT ?')
+        match = ' OR '.join(f'"{term}"' for term in terms)
+        return conn.execute(sql, [match, *params, self.text_candidates]).fetchall()
+
+    def _spatial_filter(self, lat: float, lng: float, radius_miles: float, category: Optional[str]):
+        """(tables, WHERE clause, params) selecting resources r inside the radius's bounding box"""
+        dlat = radius_miles / MILES_PER_DEGREE_LAT
+        dlng = radius_miles / (MILES_PER_DEGREE_LAT * max(cos(radians(lat)), 0.01))
+        params = [lat - dlat, lat + dlat, lng - dlng, lng + dlng]
+
+        if self.has_rtree:
+            tables = 'resources_rtree t JOIN resources r ON r.rowid = t.id'
+            where = 't.min_lat >= ? AND t.max_lat <= ? AND t.min_lng >= ? AND t.max_lng <= ?'
+        else:
+            tables = 'resources r'
+            where = 'r.latitude BETWEEN ? AND ? AND r.longitude BETWEEN ? AND ?'
+
+        if category and category != 'general':
+            # Unary + keeps the planner on the spatial index instead of idx_resources_category
+            where += ' AND +r.category = ?'
+            params.append(category)
+
+        return tables, where, params
+
+    def _catalog_text_index(self, conn) -> TextIndex:
+        """
+        Catalog-wide text index (catalog-wide IDF), checked for changes every text_index_refresh_seconds
+
+        The catalog's CandidateSet (self._candidates) is rebuilt along with it.
+        """
+        if self._text_index is not None and time.monotonic() - self._text_index_checked < self.text_index_refresh_seconds:
+            return self._text_index
+        with self._text_index_lock:
+            if self._text_index is not None and time.monotonic() - self._text_index_checked < self.text_index_refresh_seconds:
+                return self._text_index
+            signature = tuple(conn.execute('SELECT COUNT(*), MAX(last_updated) FROM resources').fetchone())
+            if signature != self._text_index_signature:
+                rows = conn.execute('SELECT id, name, services, description, category FROM resources')
+                text_index = TextIndex((row['id'], resource_text(dict(row))) for row in rows)
+                if np is not None:
+                    rows = conn.execute(f'SELECT {RESOURCE_COLUMNS} FROM resources r')
+                    self._candidates = CandidateSet([self._row_to_resource(row) for row in rows], text_index)
+                self._text_index = text_index
+                self._text_index_signature = signature
+            self._text_index_checked = time.monotonic()
+            return self._text_index
+
+    def _ensure_schema(self, conn):
+        if self.has_rtree is not None:
+            return
+        with self._schema_lock:
+            if self.has_rtree is not None:
+                return
+            ensure_catalog_schema(conn)
+            self.has_fts = self._create(conn, FTS_SCHEMA, 'FTS5 index unavailable, ranking every resource in the radius')
+            if self.has_fts and conn.execute('SELECT COUNT(*) FROM resources_fts_docsize').fetchone()[0] == 0:
+                # New index over an existing catalog
+                conn.execute("INSERT INTO resources_fts(resources_fts) VALUES ('rebuild')")
+            self.has_rtree = self._create(conn, RTREE_SCHEMA, 'R-tree index unavailable, using idx_resources_location')
+
+    def _create(self, conn, statements: List[str], unavailable: str) -> bool:
+        """Run schema statements; False if this SQLite build lacks the module"""
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            conn.commit()
+            return True
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ {unavailable}: {e}")
+            conn.rollback()
+            return False
+
+    def _row_to_resource(self, row) -> Dict[str, Any]:
+        """Format a resources row into AidLink resource format"""
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'] or '',
+            'category': row['category'] or 'general',
+            'address': row['address'] or 'Address not available',
+            'phone': row['phone'] or 'Contact for phone number',
+            'email': row['email'] or '',
+            'website': row['website'] or '',
+            'hours': row['hours'] or 'Contact for hours',
+            'services': row['services'] or row['name'],
+            'eligibility': row['eligibility'] or 'Contact for eligibility requirements',
+            'latitude': row['latitude'],
+            'longitude': row['longitude'],
+            'distance': 999,
+            'rating': row['rating'],
+            'reviews': row['reviews'],
+            'verified': bool(row['verified']),
+            'source': row['data_source'] or 'local_catalog',
+            'last_updated': row['last_updated']
+        }
+
+
+def fts_terms(query: str) -> List[str]:
+    """Query words for an FTS5 MATCH (quoted, so user input can't inject FTS syntax)"""
+    return [token for token in dict.fromkeys(TOKEN_RE.findall((query or '').lower())) if token not in STOPWORDS]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_local_index() -> LocalResourceIndex:
+    """Process-wide local resource index"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LocalResourceIndex()
+    return _index
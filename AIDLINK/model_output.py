@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Parsing of JSON answers from Gemini
+
+Model output is often almost-JSON: wrapped in ```json fences or prose, with
+trailing commas, raw control characters inside strings, or cut off mid-array
+when the response hits its length limit. parse_model_json repairs those locally and
+conforms the result to a per-method schema, so one stray character no longer
+throws away a whole (paid for) generation. StreamingJSONParser does the same
+for a response that is still arriving, handing out values as soon as each
+one is complete.
+
+Schemas are plain Python values:
+    str, list, dict, (int, float), ...  - isinstance check
+    {'key': schema, 'other?': schema}    - object with these keys ('?' = optional;
+                                           an optional key that doesn't conform is dropped)
+    [schema]                             - array; items that don't conform are dropped
+    NonEmpty(schema)                     - like schema, but an empty value fails
+"""
+
+import json
+import re
+from typing import Any, Optional
+
+_decoder = json.JSONDecoder()
+_FENCE_RE = re.compile(r'```[a-zA-Z]*')
+_SCALAR_RE = re.compile(r'[^,}\]\s]+(?=[,}\]\s])')
+MAX_JSON_STARTS = 20
+
+
+class ModelOutputError(ValueError):
+    """The model output has no usable JSON, or it doesn't match the schema"""
+
+
+class NonEmpty:
+    """Schema wrapper: the value must also be non-empty"""
+
+    def __init__(self, schema: Any):
+        self.schema = schema
+
+
+def parse_model_json(text: str, schema: Any = None) -> Any:
+    """
+    First usable JSON value in a model response, repaired if needed and conformed to schema
+
+    Prose before the JSON may contain brackets of its own ("Here is the JSON
+    {note}: {...}"), so if the value at the first bracket can't be used, later
+    ones are tried (up to MAX_JSON_STARTS). Raises ModelOutputError if nothing
+    usable can be recovered.
+    """
+    text = strip_fences(text or '')
+    if schema is None:
+        starts = [match.start() for match in re.finditer(r'[{\[]', text)]
+    else:
+        opener = '[' if isinstance(_unwrap(schema), list) else '{'
+        starts = [match.start() for match in re.finditer(re.escape(opener), text)]
+    if not starts:
+        raise ModelOutputError('No JSON in model output')
+
+    first_error = None
+    for start in starts[:MAX_JSON_STARTS]:
+        try:
+            try:
+                value, _ = _decoder.raw_decode(text, start)  # Well-formed output - the usual case
+            except ValueError:
+                value = loads_repaired(text[start:])
+            return conform(value, schema) if schema is not None else value
+        except ModelOutputError as e:
+            first_error = first_error or e
+    raise first_error
+
+
+def strip_fences(text: str) -> str:
+    """Remove markdown code fences (```json ... ```)"""
+    return _FENCE_RE.sub('', text)
+
+
+def loads_repaired(text: str) -> Any:
+    """json.loads after repair_json"""
+    try:
+        return json.loads(repair_json(text))
+    except ValueError as e:
+        raise ModelOutputError(f"Unrepairable JSON in model output: {e}")
+
+
+def repair_json(text: str) -> str:
+    """
+    The JSON array/object at the start of text with common defects fixed
+
+    Drops trailing commas, escapes raw control characters (newlines, tabs,
+    carriage returns, ...) inside strings and, if the value is cut off,
+    closes it after the last complete item. Anything after the value is
+    ignored.
+    """
+    out = []
+    stack = []  # Closers still expected
+    safe = None  # (len(out), stack) of the last point where the value can be closed
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            elif ch == '\n':
+                ch = '\\n'
+            elif ch == '\t':
+                ch = '\\t'
+            elif ch == '\r':
+                ch = '\\r'
+            elif ch < ' ':
+                ch = '\\u%04x' % ord(ch)  # Any other raw control character
+            out.append(ch)
+            if not in_string and stack and stack[-1] == ']':
+                safe = (len(out), list(stack))  # A string in an array is a complete item
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+            out.append(ch)
+            safe = (len(out), list(stack))
+            continue
+        elif ch in '}]':
+            if not stack or ch != stack[-1]:
+                break  # Mismatched bracket - keep what was complete before it
+            _drop_trailing_comma(out)
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                return ''.join(out)
+            safe = (len(out), list(stack))
+            continue
+        elif ch == ',' and stack:
+            safe = (len(out), list(stack))
+        elif not stack and not ch.isspace():
+            raise ModelOutputError('JSON must start with an array or object')
+        out.append(ch)
+
+    if safe is None:
+        raise ModelOutputError('No complete JSON value in model output')
+    # Truncated: close everything still open after the last complete item
+    length, open_closers = safe
+    out = out[:length]
+    _drop_trailing_comma(out)
+    return ''.join(out) + ''.join(reversed(open_closers))
+
+
+def conform(value: Any, schema: Any, path: str = '$') -> Any:
+    """value checked against schema (see module docstring); raises ModelOutputError"""
+    if isinstance(schema, NonEmpty):
+        value = conform(value, schema.schema, path)
+        if not value:
+            raise ModelOutputError(f"{path} is empty")
+        return value
+
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            raise ModelOutputError(f"{path} should be an object")
+        result = dict(value)
+        for key, sub_schema in schema.items():
+            optional = key.endswith('?')
+            name = key.rstrip('?')
+            if name not in value:
+                if optional:
+                    continue
+                raise ModelOutputError(f"{path}.{name} is missing")
+            try:
+                result[name] = conform(value[name], sub_schema, f"{path}.{name}")
+            except ModelOutputError:
+                if not optional:
+                    raise
+                del result[name]
+        return result
+
+    if isinstance(schema, list):
+        if not isinstance(value, list):
+            raise ModelOutputError(f"{path} should be an array")
+        items = []
+        for i, item in enumerate(value):
+            try:
+                items.append(conform(item, schema[0], f"{path}[{i}]"))
+            except ModelOutputError:
+                pass  # Keep the rest of the array
+        return items
+
+    if not isinstance(value, schema):
+        raise ModelOutputError(f"{path} has the wrong type ({type(value).__name__})")
+    return value
+
+
+class StreamingJSONParser:
+    """Incremental parser for a JSON response that arrives in chunks"""
+
+    def __init__(self):
+        self.text = ''
+
+    def feed(self, chunk: str):
+        self.text += chunk
+
+    def value(self, key: str, schema: Any = None) -> Optional[Any]:
+        """
+        Value of the first "key" in the response once it has arrived in full
+        (and conforms to schema), else None
+        """
+        match = re.search(r'"%s"\s*:\s*' % re.escape(key), self.text)
+        if not match:
+            return None
+        end = _value_end(self.text, match.end())
+        if end is None:
+            return None  # Not complete yet
+        raw = self.text[match.start():end]
+        try:
+            value = loads_repaired('{' + raw + '}')[key]
+            return conform(value, schema, key) if schema is not None else value
+        except ModelOutputError:
+            return None
+
+    def result(self, schema: Any = None) -> Any:
+        """The whole response (see parse_model_json)"""
+        return parse_model_json(self.text, schema)
+
+
+def _value_end(text: str, start: int) -> Optional[int]:
+    """End of the JSON value starting at text[start], or None if it isn't complete yet"""
+    if start >= len(text):
+        return None
+    if text[start] not in '"{[':
+        match = _SCALAR_RE.match(text, start)
+        return match.end() if match else None
+
+    depth = 0
+    in_string = escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if depth == 0:
+                    return i + 1
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            depth += 1
+        elif ch in '}]':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
+
+
+def _drop_trailing_comma(out: list):
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ',':
+        del out[i:]
+
+
+def _unwrap(schema: Any) -> Any:
+    return schema.schema if isinstance(schema, NonEmpty) else schema
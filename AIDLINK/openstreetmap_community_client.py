@@ -4,9 +4,43 @@ OpenStreetMap Community Resources API
 100% Free, unlimited requests - BEST for community resources!
 """
 
-import requests
 from typing import Dict, List, Any
+from math import cos, radians
 import json
+import os
+
+try:
+    from .geocoding_service import get_geocoding_service
+    from .http_session import build_session
+    from .deadline import Deadline, stage_timeout
+    from .overpass_tile_cache import get_overpass_tile_cache, element_coords
+    from .ranking import haversine_miles
+    from .text_index import TextIndex, resource_text
+    from .circuit_breaker import get_circuit_breaker, raise_for_outage
+    from .single_flight import get_single_flight
+except ImportError:
+    from geocoding_service import get_geocoding_service
+    from http_session import build_session
+    from deadline import Deadline, stage_timeout
+    from overpass_tile_cache import get_overpass_tile_cache, element_coords
+    from ranking import haversine_miles
+    from text_index import TextIndex, resource_text
+    from circuit_breaker import get_circuit_breaker, raise_for_outage
+    from single_flight import get_single_flight
+
+# OSM tags for community resources
+OSM_CATEGORY_TAGS = {
+    'food': ['amenity=food_bank', 'amenity=community_kitchen', 'social_facility=food'],
+    'housing': ['amenity=shelter', 'social_facility=shelter', 'amenity=hostel'],
+    'healthcare': ['amenity=clinic', 'amenity=hospital', 'healthcare=*'],
+    'employment': ['office=employment', 'office=job_centre'],
+    'general': ['amenity=community_centre', 'social_facility=*']
+}
+
+
+class OverpassIncomplete(RuntimeError):
+    """Overpass answered 200 but reported a runtime error (timeout, out of memory): elements are partial"""
+
 
 class OSMCommunityClient:
     """Client for OpenStreetMap Overpass API - perfect for community resources"""
@@ -14,10 +48,14 @@ class OSMCommunityClient:
     def __init__(self):
         """Initialize OSM Community client"""
         self.overpass_url = "https://overpass-api.de/api/interpreter"
+        self.session = build_session(headers={'User-Agent': 'AidLink'})
         self.available = True
+        # Searches start with a small box and widen (doubling) up to the requested radius
+        self.initial_radius_miles = float(os.getenv('OSM_INITIAL_RADIUS_MILES', 2))
+        self.default_radius_miles = 15.5  # ~25km, when no radius is requested
         print("✅ OpenStreetMap Community client initialized (100% free, unlimited!)")
     
-    def search_places(self, query: str, location: str = None, category: str = None, max_results: int = 10) -> Dict[str, Any]:
+    def search_places(self, query: str, location: str = None, category: str = None, max_results: int = 10, location_coords: Dict[str, float] = None, deadline: Deadline = None, radius_miles: float = None) -> Dict[str, Any]:
         """
         Search for community resources using OpenStreetMap Overpass API
         
@@ -26,6 +64,9 @@ class OSMCommunityClient:
             location: Location to search (e.g., "Sacramento, CA")
             category: Resource category
             max_results: Maximum number of results
+            location_coords: Already-geocoded {'lat', 'lng'} for location (skips geocoding)
+            deadline: Optional request deadline bounding the geocode and Overpass calls
+            radius_miles: Search radius; results are the nearest ones within it
         
         Returns:
             Dictionary with real community resource data
@@ -35,35 +76,43 @@ class OSMCommunityClient:
             osm_tags = self._get_osm_tags(category, query)
             
             # Get location coordinates if provided
-            location_coords = self._geocode_location(location or "Sacramento, CA")
+            if location_coords:
+                location_coords = {'lat': location_coords['lat'], 'lon': location_coords.get('lon', location_coords.get('lng'))}
+            else:
+                location_coords = self._geocode_location(location or "Sacramento, CA", deadline)
             
             if not location_coords:
                 return self._fallback_search(query, location, category, max_results)
             
-            # Build Overpass query
-            overpass_query = self._build_overpass_query(osm_tags, location_coords, max_results)
-            
-            # Make request
-            response = requests.get(
-                self.overpass_url,
-                params={'data': overpass_query},
-                timeout=15
-            )
+            lat, lon = location_coords['lat'], location_coords['lon']
+            radius_miles = radius_miles or self.default_radius_miles
+            search_radius = min(self.initial_radius_miles, radius_miles)
+            # One tile zoom for every widening step, so tiles fetched for a smaller box are reused
+            zoom = get_overpass_tile_cache().zoom_for(*self._radius_bbox(lat, lon, radius_miles))
+            resources = []
+            while True:
+                try:
+                    elements = self._get_elements(osm_tags, self._radius_bbox(lat, lon, search_radius), deadline, zoom)
+                except Exception:
+                    if not resources:
+                        raise
+                    break  # Keep what the smaller box found
+                resources = self._process_osm_results({'elements': elements}, max_results, lat, lon, search_radius, query)
+                if len(resources) >= max_results or search_radius >= radius_miles or (deadline and deadline.expired()):
+                    break
+                # Not enough nearby - widen the box (tiles already fetched are reused)
+                search_radius = min(search_radius * 2, radius_miles)
             
-            if response.status_code == 200:
-                data = response.json()
-                resources = self._process_osm_results(data, max_results)
-                
-                if resources:
-                    print(f"✅ Found {len(resources)} community resources via OpenStreetMap")
-                    return {
-                        'success': True,
-                        'recommendations': resources,
-                        'total_results': len(resources),
-                        'source': 'openstreetmap',
-                        'confidence': 0.95,
-                        'verified': True
-                    }
+            if resources:
+                print(f"✅ Found {len(resources)} community resources via OpenStreetMap within {search_radius:g} miles")
+                return {
+                    'success': True,
+                    'recommendations': resources,
+                    'total_results': len(resources),
+                    'source': 'openstreetmap',
+                    'confidence': 0.95,
+                    'verified': True
+                }
             
             return self._fallback_search(query, location, category, max_results)
                 
@@ -73,17 +122,7 @@ class OSMCommunityClient:
     
     def _get_osm_tags(self, category: str, query: str) -> List[str]:
         """Map category to OSM tags"""
-        
-        # OSM tags for community resources
-        tags = {
-            'food': ['amenity=food_bank', 'amenity=community_kitchen', 'social_facility=food'],
-            'housing': ['amenity=shelter', 'social_facility=shelter', 'amenity=hostel'],
-            'healthcare': ['amenity=clinic', 'amenity=hospital', 'healthcare=*'],
-            'employment': ['office=employment', 'office=job_centre'],
-            'general': ['amenity=community_centre', 'social_facility=*']
-        }
-        
-        category_tags = tags.get(category or 'general', [])
+        category_tags = list(OSM_CATEGORY_TAGS.get(category or 'general', []))
         
         # Add query-specific tags
         if 'food' in query.lower():
@@ -93,128 +132,222 @@ class OSMCommunityClient:
         
         return list(set(category_tags))  # Remove duplicates
     
-    def _build_overpass_query(self, osm_tags: List[str], location: Dict, max_results: int) -> str:
-        """Build Overpass QL query"""
+    def _matches_osm_tags(self, tags: Dict, osm_tags: List[str]) -> bool:
+        """Whether an element's tags match any of the key=value (or key=*) OSM tags"""
+        for osm_tag in osm_tags:
+            key, value = osm_tag.split('=', 1)
+            if key in tags and (value == '*' or tags[key] == value):
+                return True
+        return False
+    
+    def _radius_bbox(self, lat: float, lon: float, radius_miles: float) -> tuple:
+        """(south, west, north, east) box enclosing a radius around a point"""
+        dlat = radius_miles / 69.0
+        dlon = radius_miles / (69.0 * max(cos(radians(lat)), 0.01))
+        return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+    
+    def _get_elements(self, osm_tags: List[str], bbox: tuple, deadline: Deadline = None, zoom: int = None) -> List[Dict]:
+        """
+        Overpass elements inside bbox, answered from the tile cache where possible
         
-        # Create bounding box around location (25km radius)
-        lat = location['lat']
-        lon = location['lon']
-        radius = 0.25  # degrees (~25km)
+        Uncached tiles (at zoom, default the tile cache's choice for bbox) are
+        fetched with one query over the union of their boxes, never re-fetching
+        cached tiles. Elements come back nearest tile first.
+        """
+        tile_cache = get_overpass_tile_cache()
+        tiles = tile_cache.tiles_covering(*bbox, zoom=zoom)
+        tile_elements = tile_cache.get_many(tiles, osm_tags)
         
-        south = lat - radius
-        north = lat + radius
-        west = lon - radius
-        east = lon + radius
+        missing = [tile for tile in tiles if tile not in tile_elements]
+        if missing:
+            def fetch():
+                fetched = tile_cache.bucket(self._fetch_overpass(osm_tags, tile_cache.tiles_bboxes(missing), deadline), missing)
+                tile_cache.set_many(fetched, osm_tags)
+                return fetched
+            
+            try:
+                # Concurrent searches missing the same tiles (e.g. a batch of searches around one place) share one fetch
+                fetched = get_single_flight('overpass').do(
+                    f"{','.join(sorted(set(osm_tags)))}|{sorted(missing)}",
+                    fetch,
+                    timeout=deadline.remaining() if deadline else None
+                )
+                tile_elements.update(fetched)
+            except Exception as e:
+                if not tile_elements:
+                    raise
+                print(f"⚠️ Overpass fetch failed, using {len(tile_elements)} cached tiles: {e}")
+        
+        south, west, north, east = bbox
+        elements = []
+        seen = set()
+        for tile in tiles:
+            for element in tile_elements.get(tile, []):
+                key = (element.get('type'), element.get('id'))
+                coords = element_coords(element)
+                if key in seen or not coords or not (south <= coords[0] <= north and west <= coords[1] <= east):
+                    continue
+                seen.add(key)
+                elements.append(element)
+        return elements
+    
+    def _fetch_overpass(self, osm_tags: List[str], bboxes: List[tuple], deadline: Deadline = None) -> List[Dict]:
+        """
+        Every element matching osm_tags inside any of bboxes (server-side timeout follows the client-side one)
         
-        # Build tag conditions
-        tag_conditions = '|'.join(osm_tags)
+        Raises CircuitOpen without calling Overpass while it is failing, and
+        OverpassIncomplete when the result was cut short (it must not be cached).
+        """
+        timeout = stage_timeout(deadline, 15)
+        response = get_circuit_breaker('overpass').call(lambda: raise_for_outage(self.session.get(
+            self.overpass_url,
+            params={'data': self._build_overpass_query(osm_tags, bboxes, server_timeout=max(1, int(timeout)))},
+            timeout=timeout
+        )), capped_by_deadline=timeout < 15)
+        response.raise_for_status()
+        data = response.json()
+        # A query that hits [timeout:] or [maxsize:] still returns 200, with whatever was found so far
+        remark = data.get('remark') or ''
+        if 'runtime error' in remark.lower():
+            raise OverpassIncomplete(remark)
+        return data.get('elements', [])
+    
+    def _build_overpass_query(self, osm_tags: List[str], bboxes: List[tuple], server_timeout: int = 25) -> str:
+        """Build Overpass QL query for every element matching any of osm_tags inside any of bboxes"""
+        # One selector per tag and box (key=* matches any value); the union drops duplicates
+        selectors = []
+        for osm_tag in sorted(set(osm_tags)):
+            key, value = osm_tag.split('=', 1)
+            condition = f'["{key}"]' if value == '*' else f'["{key}"="{value}"]'
+            for south, west, north, east in bboxes:
+                selectors.append(f"  nwr{condition}({south},{west},{north},{east});")
         
         query = f"""
-[out:json][timeout:25];
+[out:json][timeout:{server_timeout}];
 (
-  node[{tag_conditions}]({south},{west},{north},{east});
-  way[{tag_conditions}]({south},{west},{north},{east});
-  relation[{tag_conditions}]({south},{west},{north},{east});
+{chr(10).join(selectors)}
 );
-out center {max_results};
+out center;
 """
         return query
     
-    def _geocode_location(self, location: str) -> Dict[str, float]:
-        """Simple geocoding using OSM Nominatim (also free)"""
-        try:
-            response = requests.get(
-                'https://nominatim.openstreetmap.org/search',
-                params={
-                    'q': location,
-                    'format': 'json',
-                    'limit': 1
-                },
-                headers={'User-Agent': 'AidLink'},  # Required by Nominatim
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data and len(data) > 0:
-                    return {
-                        'lat': float(data[0]['lat']),
-                        'lon': float(data[0]['lon'])
-                    }
-            
-            return None
-        except:
+    def _geocode_location(self, location: str, deadline: Deadline = None) -> Dict[str, float]:
+        """Geocode via the shared (cached) geocoding service"""
+        coords = get_geocoding_service().geocode(location, deadline)
+        if not coords:
             return None
+        return {'lat': coords['lat'], 'lon': coords['lng']}
     
-    def _process_osm_results(self, data: Dict, max_results: int) -> List[Dict]:
-        """Process OpenStreetMap API response"""
-        resources = []
+    def _process_osm_results(self, data: Dict, max_results: int, user_lat: float = None, user_lng: float = None,
+                             radius_miles: float = None, query: str = '') -> List[Dict]:
+        """
+        Process OpenStreetMap API response
         
+        With user coordinates, results get real distances and are the nearest
+        max_results within radius_miles, closest first (places at the same
+        displayed distance are ordered by relevance to the query).
+        """
         elements = data.get('elements', [])
         
-        for element in elements[:max_results]:
-            if element.get('type') == 'relation':
-                continue  # Skip relations for now
-            
-            tags = element.get('tags', {})
-            name = tags.get('name', f"Community Resource")
-            
-            # Get coordinates
-            if element.get('type') == 'node':
-                lat = element.get('lat')
-                lon = element.get('lon')
-            elif element.get('center'):
-                lat = element['center'].get('lat')
-                lon = element['center'].get('lon')
-            else:
-                continue
+        if user_lat is not None and user_lng is not None:
+            nearby = []
+            for element in elements:
+                coords = element_coords(element)
+                if not coords or element.get('type') == 'relation':
+                    continue
+                distance = haversine_miles(user_lat, user_lng, coords[0], coords[1])
+                if radius_miles is None or distance <= radius_miles:
+                    nearby.append((distance, element))
             
-            if not lat or not lon:
-                continue
+            relevance = TextIndex(
+                (i, resource_text({
+                    'name': element.get('tags', {}).get('name'),
+                    'services': element.get('tags', {}).get('description'),
+                    'category': self._get_category_from_tags(element.get('tags', {}))
+                }))
+                for i, (_, element) in enumerate(nearby)
+            ).relevance_points(query) if query else {}
+            order = sorted(range(len(nearby)), key=lambda i: (round(nearby[i][0], 1), -relevance.get(i, 0.0)))
+            nearby = [nearby[i] for i in order]
             
-            # Build address
-            street = tags.get('addr:housenumber', '')
-            street_name = tags.get('addr:street', '')
-            city = tags.get('addr:city', '')
-            postcode = tags.get('addr:postcode', '')
-            
-            address_parts = [part for part in [street, street_name] if part]
-            address = ' '.join(address_parts) if address_parts else 'Address available'
-            if city:
-                address += f", {city}"
-            if postcode:
-                address += f" {postcode}"
-            
-            # Get contact info
-            phone = tags.get('phone', 'Contact for phone number')
-            website = tags.get('website', tags.get('url', ''))
-            
-            resource = {
-                'id': f"osm_{element.get('id', '')}",
-                'name': name,
-                'description': f"Community resource from OpenStreetMap",
-                'category': self._get_category_from_tags(tags),
-                'address': address,
-                'phone': phone,
-                'email': self._generate_email_from_name(name),
-                'website': website,
-                'hours': tags.get('opening_hours', 'Contact for hours'),
-                'services': tags.get('description', name),
-                'eligibility': 'Contact for eligibility requirements',
-                'latitude': float(lat),
-                'longitude': float(lon),
-                'distance': 0,
-                'rating': 4.5,
-                'reviews': 50,
-                'verified': True,
-                'source': 'openstreetmap',
-                'last_updated': '2024-01-01'
-            }
-            
-            resources.append(resource)
+            resources = []
+            for distance, element in nearby:
+                resource = self._element_to_resource(element)
+                if resource:
+                    resource['distance'] = round(distance, 1)
+                    resources.append(resource)
+                    if len(resources) >= max_results:
+                        break
+            return resources
+        
+        resources = []
+        for element in elements[:max_results]:
+            resource = self._element_to_resource(element)
+            if resource:
+                resources.append(resource)
         
         return resources
     
+    def _element_to_resource(self, element: Dict) -> Dict[str, Any]:
+        """Format one Overpass element into AidLink resource format (None if unusable)"""
+        if element.get('type') == 'relation':
+            return None  # Skip relations for now
+        
+        tags = element.get('tags', {})
+        name = tags.get('name', f"Community Resource")
+        
+        # Get coordinates
+        if element.get('type') == 'node':
+            lat = element.get('lat')
+            lon = element.get('lon')
+        elif element.get('center'):
+            lat = element['center'].get('lat')
+            lon = element['center'].get('lon')
+        else:
+            return None
+        
+        if not lat or not lon:
+            return None
+        
+        # Build address
+        street = tags.get('addr:housenumber', '')
+        street_name = tags.get('addr:street', '')
+        city = tags.get('addr:city', '')
+        postcode = tags.get('addr:postcode', '')
+        
+        address_parts = [part for part in [street, street_name] if part]
+        address = ' '.join(address_parts) if address_parts else 'Address available'
+        if city:
+            address += f", {city}"
+        if postcode:
+            address += f" {postcode}"
+        
+        # Get contact info
+        phone = tags.get('phone', 'Contact for phone number')
+        website = tags.get('website', tags.get('url', ''))
+        
+        return {
+            'id': f"osm_{element.get('id', '')}",
+            'name': name,
+            'description': f"Community resource from OpenStreetMap",
+            'category': self._get_category_from_tags(tags),
+            'address': address,
+            'phone': phone,
+            'email': self._generate_email_from_name(name),
+            'website': website,
+            'hours': tags.get('opening_hours', 'Contact for hours'),
+            'services': tags.get('description', name),
+            'eligibility': 'Contact for eligibility requirements',
+            'latitude': float(lat),
+            'longitude': float(lon),
+            'distance': 0,
+            'rating': 4.5,
+            'reviews': 50,
+            'verified': True,
+            'source': 'openstreetmap',
+            'last_updated': '2024-01-01'
+        }
+    
     def _get_category_from_tags(self, tags: Dict) -> str:
         """Extract category from OSM tags"""
         if 'food_bank' in str(tags.get('amenity', '')):
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Overpass results cached per map tile
+
+Searches are snapped to slippy-map tiles and the Overpass elements for each
+tile and tag set are cached in memory and in the overpass_tile_cache table in
+aidlink.db. A search is answered by combining the cached tiles that cover its
+bounding box, so nearby users share results and only uncovered tiles are
+fetched.
+
+The zoom follows the size of the search: the finest zoom up to
+OVERPASS_TILE_MAX_ZOOM (default 14: ~2 km tiles) at which the search's largest
+box spans no more than TILES_PER_SIDE tiles, but never coarser than
+OVERPASS_TILE_ZOOM (default 12: ~7-10 km tiles). It is picked once per search,
+so the tiles fetched for a small first box are reused when the box widens,
+and only the missing tiles (as a union of tile-aligned boxes, not their
+enclosing box) are queried.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from math import radians, degrees, cos, tan, pi, log, atan, sinh
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    from .database import get_connection
+    from .ttl_cache import TTLCache
+except ImportError:
+    from database import get_connection
+    from ttl_cache import TTLCache
+
+Tile = Tuple[int, int, int]  # (zoom, x, y)
+
+# Overpass element fields worth keeping (drops the node lists of ways)
+ELEMENT_FIELDS = ('type', 'id', 'lat', 'lon', 'center', 'tags')
+TILES_PER_SIDE = 5
+
+
+def tile_for(lat: float, lng: float, zoom: int) -> Tile:
+    """Slippy-map tile (zoom, x, y) containing a point"""
+    n = 2 ** zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - log(tan(radians(lat)) + 1 / cos(radians(lat))) / pi) / 2.0 * n)
+    return zoom, min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(tile: Tile) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of a tile"""
+    zoom, x, y = tile
+    n = 2 ** zoom
+
+    def tile_lat(row):
+        return degrees(atan(sinh(pi * (1 - 2 * row / n))))
+
+    return tile_lat(y + 1), x / n * 360.0 - 180.0, tile_lat(y), (x + 1) / n * 360.0 - 180.0
+
+
+def element_coords(element: Dict) -> Optional[Tuple[float, float]]:
+    """(lat, lon) of a node, or the center of a way/relation"""
+    if element.get('lat') is not None and element.get('lon') is not None:
+        return element['lat'], element['lon']
+    center = element.get('center') or {}
+    if center.get('lat') is not None and center.get('lon') is not None:
+        return center['lat'], center['lon']
+    return None
+
+
+class OverpassTileCache:
+    """Memory + SQLite cache of Overpass elements per (tile, tag set)"""
+
+    def __init__(self):
+        self.zoom = int(os.getenv('OVERPASS_TILE_ZOOM', 12))
+        self.max_zoom = max(self.zoom, int(os.getenv('OVERPASS_TILE_MAX_ZOOM', 14)))
+        self.ttl_seconds = float(os.getenv('OVERPASS_TILE_CACHE_TTL_HOURS', 24)) * 3600
+        self.max_db_rows = int(os.getenv('OVERPASS_TILE_CACHE_DB_MAX_ROWS', 5000))
+        self.memory = TTLCache(maxsize=int(os.getenv('OVERPASS_TILE_CACHE_SIZE', 512)), ttl_seconds=self.ttl_seconds)
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._db_ready = False
+        self._lock = threading.Lock()
+
+    def zoom_for(self, south: float, west: float, north: float, east: float) -> int:
+        """Finest zoom (within [zoom, max_zoom]) at which the box spans at most TILES_PER_SIDE tiles"""
+        for zoom in range(self.max_zoom, self.zoom, -1):
+            _, x_min, y_min = tile_for(north, west, zoom)
+            _, x_max, y_max = tile_for(south, east, zoom)
+            if x_max - x_min < TILES_PER_SIDE and y_max - y_min < TILES_PER_SIDE:
+                return zoom
+        return self.zoom
+
+    def tiles_covering(self, south: float, west: float, north: float, east: float, zoom: int = None) -> List[Tile]:
+        """Tiles covering a bounding box (at zoom, default zoom_for it), nearest to its center first"""
+        if zoom is None:
+            zoom = self.zoom_for(south, west, north, east)
+        _, x_min, y_min = tile_for(north, west, zoom)
+        _, x_max, y_max = tile_for(south, east, zoom)
+        _, center_x, center_y = tile_for((south + north) / 2, (west + east) / 2, zoom)
+        tiles = [(zoom, x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+        tiles.sort(key=lambda tile: (tile[1] - center_x) ** 2 + (tile[2] - center_y) ** 2)
+        return tiles
+
+    def tiles_bboxes(self, tiles: List[Tile]) -> List[Tuple[float, float, float, float]]:
+        """
+        Bounding boxes covering exactly these tiles (all of one zoom), and nothing else
+
+        Runs of adjacent tiles in a row are merged, then runs spanning the same
+        columns in consecutive rows, so a ring of missing tiles becomes four boxes.
+        """
+        runs = {}  # (x_min, x_max) -> [[y_min, y_max], ...]
+        by_row = {}
+        for _, x, y in sorted(set(tiles), key=lambda tile: (tile[2], tile[1])):
+            row = by_row.setdefault(y, [])
+            if row and row[-1][1] == x - 1:
+                row[-1][1] = x
+            else:
+                row.append([x, x])
+        for y in sorted(by_row):
+            for x_min, x_max in by_row[y]:
+                spans = runs.setdefault((x_min, x_max), [])
+                if spans and spans[-1][1] == y - 1:
+                    spans[-1][1] = y
+                else:
+                    spans.append([y, y])
+
+        zoom = tiles[0][0] if tiles else 0
+        boxes = []
+        for (x_min, x_max), spans in runs.items():
+            for y_min, y_max in spans:
+                south, west, _, _ = tile_bounds((zoom, x_min, y_max))
+                _, _, north, east = tile_bounds((zoom, x_max, y_min))
+                boxes.append((south, west, north, east))
+        return boxes
+
+    def bucket(self, elements: List[Dict], tiles: List[Tile]) -> Dict[Tile, List[Dict]]:
+        """Split fetched elements by tile (all of one zoom); every requested tile gets an entry, even if empty"""
+        buckets = {tile: [] for tile in tiles}
+        if not tiles:
+            return buckets
+        zoom = tiles[0][0]
+        for element in elements:
+            coords = element_coords(element)
+            if coords is None:
+                continue
+            tile = tile_for(coords[0], coords[1], zoom)
+            if tile in buckets:
+                buckets[tile].append({field: element[field] for field in ELEMENT_FIELDS if field in element})
+        return buckets
+
+    def get_many(self, tiles: List[Tile], osm_tags: List[str]) -> Dict[Tile, List[Dict]]:
+        """Return {tile: elements} for every tile cached for this tag set"""
+        tag_key = self._tag_key(osm_tags)
+        found = {}
+        need_db = []
+        for tile in tiles:
+            elements = self.memory.get(self._key(tile, tag_key))
+            if elements is not None:
+                found[tile] = elements
+            else:
+                need_db.append(tile)
+
+        memory_hits = len(found)
+        if need_db:
+            found.update(self._db_get_many(need_db, tag_key))
+
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.db_hits += len(found) - memory_hits
+            self.misses += len(need_db) - (len(found) - memory_hits)
+        return found
+
+    def set_many(self, tile_elements: Dict[Tile, List[Dict]], osm_tags: List[str]):
+        """Cache the complete element list of each tile for this tag set"""
+        if not tile_elements:
+            return
+        tag_key = self._tag_key(osm_tags)
+        now = datetime.now()
+        expires_at = (now + timedelta(seconds=self.ttl_seconds)).isoformat()
+        rows = []
+        for tile, elements in tile_elements.items():
+            key = self._key(tile, tag_key)
+            self.memory.set(key, elements)
+            rows.append((key, json.dumps(elements, separators=(',', ':')), now.isoformat(), expires_at))
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                conn.executemany(
+                    'INSERT OR REPLACE INTO overpass_tile_cache (tile_key, elements, created_at, expires_at) VALUES (?, ?, ?, ?)',
+                    rows
+                )
+                with self._lock:
+                    self._writes += 1
+                    check_size = self._writes % 100 == 1
+                if check_size:
+                    self._evict(conn)
+        except Exception as e:
+            print(f"Overpass tile cache write error: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                'zoom': self.zoom,
+                'max_zoom': self.max_zoom,
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.memory_hits + self.db_hits) / lookups, 3) if lookups else 0.0,
+                'cached_tiles': len(self.memory)
+            }
+
+    def _tag_key(self, osm_tags: List[str]) -> str:
+        return ','.join(sorted(set(osm_tags)))
+
+    def _key(self, tile: Tile, tag_key: str) -> str:
+        return f"{tile[0]}/{tile[1]}/{tile[2]}|{tag_key}"
+
+    def _db_get_many(self, tiles: List[Tile], tag_key: str) -> Dict[Tile, List[Dict]]:
+        found = {}
+        keys = {self._key(tile, tag_key): tile for tile in tiles}
+        placeholders = ','.join('?' for _ in keys)
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                rows = conn.execute(
+                    f'SELECT tile_key, elements FROM overpass_tile_cache WHERE tile_key IN ({placeholders}) AND expires_at > ?',
+                    (*keys, datetime.now().isoformat())
+                ).fetchall()
+            for row in rows:
+                elements = json.loads(row['elements'])
+                found[keys[row['tile_key']]] = elements
+                self.memory.set(row['tile_key'], elements)
+        except Exception as e:
+            print(f"Overpass tile cache read error: {e}")
+        return found
+
+    def _evict(self, conn):
+        """Drop expired tiles, then the oldest tiles above the size cap"""
+        conn.execute('DELETE FROM overpass_tile_cache WHERE expires_at <= ?', (datetime.now().isoformat(),))
+        count = conn.execute('SELECT COUNT(*) FROM overpass_tile_cache').fetchone()[0]
+        if count > self.max_db_rows:
+            conn.execute(
+                'DELETE FROM overpass_tile_cache WHERE tile_key IN (SELECT tile_key FROM overpass_tile_cache ORDER BY expires_at LIMIT ?)',
+                (count - self.max_db_rows,)
+            )
+
+    def _ensure_table(self, conn):
+        if self._db_ready:
+            return
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS overpass_tile_cache (
+                tile_key TEXT PRIMARY KEY,  -- zoom/x/y|tags
+                elements TEXT NOT NULL,  -- JSON array of Overpass elements
+                created_at TIMESTAMP,
+                expires_at TIMESTAMP
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_overpass_tile_expires ON overpass_tile_cache(expires_at)')
+        self._db_ready = True
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_overpass_tile_cache() -> OverpassTileCache:
+    """Process-wide Overpass tile cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OverpassTileCache()
+    return _cache
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Place Details cache keyed by Google place_id
+
+Two tiers: an in-process LRU and the place_details_cache table in
+aidlink.db. Both expire entries after PLACE_DETAILS_CACHE_TTL_HOURS and
+evict the least recently used entries once their size cap is reached.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+try:
+    from .database import get_connection
+    from .ttl_cache import TTLCache
+except ImportError:
+    from database import get_connection
+    from ttl_cache import TTLCache
+
+
+class PlaceDetailsCache:
+    """Memory + SQLite cache for Places Details results"""
+
+    def __init__(self):
+        self.ttl_seconds = float(os.getenv('PLACE_DETAILS_CACHE_TTL_HOURS', 72)) * 3600
+        self.max_db_rows = int(os.getenv('PLACE_DETAILS_CACHE_DB_MAX_ROWS', 20000))
+        self.memory = TTLCache(maxsize=int(os.getenv('PLACE_DETAILS_CACHE_SIZE', 2000)), ttl_seconds=self.ttl_seconds)
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._db_ready = False
+        self._lock = threading.Lock()
+
+    def get_many(self, place_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Return {place_id: details} for every id found in either tier"""
+        found = {}
+        need_db = []
+        for place_id in place_ids:
+            if not place_id or place_id in found:
+                continue
+            details = self.memory.get(place_id)
+            if details is not None:
+                found[place_id] = details
+            else:
+                need_db.append(place_id)
+
+        memory_hits = len(found)
+        if need_db:
+            found.update(self._db_get_many(need_db))
+
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.db_hits += len(found) - memory_hits
+            self.misses += len(need_db) - (len(found) - memory_hits)
+        return found
+
+    def set(self, place_id: str, details: Dict[str, Any]):
+        """Cache details for a place in both tiers"""
+        if not place_id or not details:
+            return
+        self.memory.set(place_id, details)
+        now = datetime.now()
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                conn.execute(
+                    'INSERT OR REPLACE INTO place_details_cache (place_id, details, last_accessed, expires_at) VALUES (?, ?, ?, ?)',
+                    (place_id, json.dumps(details), now.isoformat(), (now + timedelta(seconds=self.ttl_seconds)).isoformat())
+                )
+                with self._lock:
+                    self._writes += 1
+                    check_size = self._writes % 100 == 1
+                if check_size:
+                    self._evict(conn)
+        except Exception as e:
+            print(f"Place details cache write error: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.memory_hits + self.db_hits) / lookups, 3) if lookups else 0.0,
+                'cached_places': len(self.memory)
+            }
+
+    def _db_get_many(self, place_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        now = datetime.now().isoformat()
+        placeholders = ','.join('?' for _ in place_ids)
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                rows = conn.execute(
+                    f'SELECT place_id, details FROM place_details_cache WHERE place_id IN ({placeholders}) AND expires_at > ?',
+                    (*place_ids, now)
+                ).fetchall()
+                if rows:
+                    hit_ids = [row['place_id'] for row in rows]
+                    conn.execute(
+                        f"UPDATE place_details_cache SET last_accessed = ? WHERE place_id IN ({','.join('?' for _ in hit_ids)})",
+                        (now, *hit_ids)
+                    )
+            for row in rows:
+                details = json.loads(row['details'])
+                found[row['place_id']] = details
+                self.memory.set(row['place_id'], details)
+        except Exception as e:
+            print(f"Place details cache read error: {e}")
+        return found
+
+    def _evict(self, conn):
+        """Drop expired rows, then the least recently used rows above the size cap"""
+        conn.execute('DELETE FROM place_details_cache WHERE expires_at <= ?', (datetime.now().isoformat(),))
+        count = conn.execute('SELECT COUNT(*) FROM place_details_cache').fetchone()[0]
+        if count > self.max_db_rows:
+            conn.execute(
+                'DELETE FROM place_details_cache WHERE place_id IN (SELECT place_id FROM place_details_cache ORDER BY last_accessed LIMIT ?)',
+                (count - self.max_db_rows,)
+            )
+
+    def _ensure_table(self, conn):
+        if self._db_ready:
+            return
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS place_details_cache (
+                place_id TEXT PRIMARY KEY,
+                details TEXT NOT NULL,  -- JSON string
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_accessed TIMESTAMP,
+                expires_at TIMESTAMP
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_place_details_accessed ON place_details_cache(last_accessed)')
+        self._db_ready = True
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_place_details_cache() -> PlaceDetailsCache:
+    """Process-wide Place Details cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PlaceDetailsCache()
+    return _cache
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Compact prompt sections for Gemini
+
+Resources carry much more than the model needs: generated emails,
+coordinates, ratings, transportation text derived from the distance and
+placeholders like "Contact for hours". The helpers here project resources
+(and analyses) down to the fields a prompt uses, drop empty and placeholder
+values, and serialize them as compact JSON.
+"""
+
+import json
+from typing import Any, Dict, Iterable, List
+
+# Fields a resource-grounded prompt needs, in prompt order
+RESOURCE_FIELDS = ('name', 'category', 'address', 'phone', 'hours', 'eligibility', 'distance', 'transport_help')
+BARRIER_RESOURCE_FIELDS = ('name', 'eligibility', 'distance', 'transport_help')
+ANALYSIS_FIELDS = ('situation_summary', 'key_factors', 'likely_eligible_programs', 'urgency_score',
+                   'priority_order', 'barriers_identified')
+
+PLACEHOLDER_PREFIXES = ('contact for', 'address not available', 'call for')
+TRANSPORT_HELP_PREFIX = 'provides transportation assistance'
+
+
+def compact_json(value: Any) -> str:
+    """JSON without indentation or spaces after separators"""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def project_resource(resource: Dict[str, Any], fields: Iterable[str] = RESOURCE_FIELDS) -> Dict[str, Any]:
+    """The given fields of a resource, without empty or placeholder values"""
+    projected = {}
+    for field in fields:
+        if field == 'transport_help':
+            value = str(resource.get('transportation') or '').lower().startswith(TRANSPORT_HELP_PREFIX) or None
+        else:
+            value = resource.get(field)
+        if _is_placeholder(value):
+            continue
+        projected[field] = round(value, 1) if isinstance(value, float) else value
+    return projected
+
+
+def compact_resources(resources: List[Dict[str, Any]], fields: Iterable[str] = RESOURCE_FIELDS) -> str:
+    """Resources as compact JSON for a prompt"""
+    fields = tuple(fields)
+    return compact_json([project_resource(r, fields) for r in resources])
+
+
+def compact_analysis(analysis: Dict[str, Any], fields: Iterable[str] = ANALYSIS_FIELDS) -> str:
+    """The parts of an analysis a follow-up prompt needs, as compact JSON"""
+    return compact_json({field: analysis[field] for field in fields if not _is_placeholder(analysis.get(field))})
+
+
+def _is_placeholder(value: Any) -> bool:
+    if value is None or value == '' or value == [] or value == {}:
+        return True
+    return isinstance(value, str) and value.strip().lower().startswith(PLACEHOLDER_PREFIXES)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Provider registry - one long-lived client of each kind per worker process
+
+Clients are created once (at app startup via warm_providers(), or lazily on
+first use) and then shared by every request, so their pooled HTTP sessions
+are reused and their init-time logging stays out of the request path.
+"""
+
+import threading
+
+try:
+    from .google_places_client import GooglePlacesClient
+    from .openstreetmap_community_client import OSMCommunityClient
+    from .ai_eligibility_assistant import AIEligibilityAssistant
+except ImportError:
+    from google_places_client import GooglePlacesClient
+    from openstreetmap_community_client import OSMCommunityClient
+    from ai_eligibility_assistant import AIEligibilityAssistant
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _get_or_create(name: str, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                _clients[name] = client
+    return client
+
+
+def get_google_places_client() -> GooglePlacesClient:
+    return _get_or_create('google_places', GooglePlacesClient)
+
+
+def get_osm_client() -> OSMCommunityClient:
+    return _get_or_create('openstreetmap', OSMCommunityClient)
+
+
+def get_eligibility_assistant() -> AIEligibilityAssistant:
+    return _get_or_create('gemini', AIEligibilityAssistant)
+
+
+def warm_providers():
+    """Create every client up front (called once when the app starts)"""
+    get_google_places_client()
+    get_osm_client()
+    get_eligibility_assistant()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Rate limits and spend budgets for paid Google APIs
+
+Every billable call (Geocoding, Places Text Search, Place Details, Gemini
+generate_content) first takes a token from a per-SKU token bucket and is
+charged its configured unit cost. Spend is kept per day and SKU in the
+api_usage table of aidlink.db, so the daily and monthly ceilings hold
+across workers and restarts.
+
+As spend approaches the budget the Google Places client degrades step by
+step instead of failing outright:
+
+    normal               - no limits beyond the rate limits
+    reduced_details      - at most QUOTA_REDUCED_DETAILS_MAX details calls per search
+    cached_details_only  - text search still runs, only cached details are used
+    exhausted            - Google is skipped (OSM, local catalog or demo data answer)
+                           and Gemini calls raise QuotaExceeded (callers fall back)
+"""
+
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Any, Optional
+
+try:
+    from .database import get_connection
+    from .deadline import Deadline
+except ImportError:
+    from database import get_connection
+    from deadline import Deadline
+
+NORMAL = 'normal'
+REDUCED_DETAILS = 'reduced_details'
+CACHED_DETAILS_ONLY = 'cached_details_only'
+EXHAUSTED = 'exhausted'
+
+# sku: (requests per second, burst, USD per call)
+DEFAULT_SKUS = {
+    'geocode': (10.0, 20, 0.005),
+    'text_search': (5.0, 10, 0.032),
+    'place_details': (20.0, 40, 0.017),
+    'gemini': (2.0, 5, 0.0005),
+}
+
+
+class QuotaExceeded(Exception):
+    """Raised when a paid call is refused by the rate limit or the spend budget"""
+
+
+class TokenBucket:
+    """Classic token bucket: rate tokens per second, up to burst saved up"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, max_wait: float = 0.0) -> bool:
+        """Take a token, waiting up to max_wait seconds for one to become available"""
+        give_up_at = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate if self.rate > 0 else max_wait
+            if now + wait > give_up_at:
+                return False
+            time.sleep(wait)
+
+    def available(self) -> float:
+        with self._lock:
+            return round(min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate), 2)
+
+
+class QuotaManager:
+    """Per-SKU rate limits plus daily and monthly spend ceilings"""
+
+    def __init__(self):
+        self.enabled = os.getenv('QUOTA_ENABLED', 'True').lower() == 'true'
+        self.daily_budget = float(os.getenv('QUOTA_DAILY_BUDGET_USD', 20))
+        self.monthly_budget = float(os.getenv('QUOTA_MONTHLY_BUDGET_USD', 200))
+        self.reduce_at = float(os.getenv('QUOTA_REDUCE_AT', 0.7))
+        self.cache_only_at = float(os.getenv('QUOTA_CACHE_ONLY_AT', 0.85))
+        self.reduced_details_max = int(os.getenv('QUOTA_REDUCED_DETAILS_MAX', 5))
+        self.max_wait_seconds = float(os.getenv('QUOTA_MAX_WAIT_SECONDS', 0.25))
+        self.flush_seconds = float(os.getenv('QUOTA_FLUSH_SECONDS', 5))
+
+        self.costs = {}
+        self.buckets = {}
+        for sku, (rate, burst, cost) in DEFAULT_SKUS.items():
+            prefix = f"QUOTA_{sku.upper()}"
+            self.costs[sku] = float(os.getenv(f"{prefix}_COST_USD", cost))
+            self.buckets[sku] = TokenBucket(float(os.getenv(f"{prefix}_RATE", rate)), int(os.getenv(f"{prefix}_BURST", burst)))
+
+        self.allowed = {sku: 0 for sku in DEFAULT_SKUS}
+        self.throttled = {sku: 0 for sku in DEFAULT_SKUS}
+        self.denied = {sku: 0 for sku in DEFAULT_SKUS}
+        self._pending = {}  # sku -> calls not yet written to api_usage
+        self._day = None
+        self._day_spend = 0.0  # stored spend, all workers
+        self._month_spend = 0.0
+        self._day_calls = {}
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._db_ready = False
+
+    def acquire(self, sku: str, deadline: Deadline = None) -> bool:
+        """
+        Reserve one call of a SKU and charge its cost
+
+        Waits briefly (QUOTA_MAX_WAIT_SECONDS, never past the deadline) for a
+        rate-limit token. Returns False when the call should not be made.
+        """
+        if not self.enabled:
+            return True
+        self._refresh()
+        if self.level() == EXHAUSTED:
+            with self._lock:
+                self.denied[sku] += 1
+            return False
+
+        max_wait = min(self.max_wait_seconds, deadline.remaining()) if deadline else self.max_wait_seconds
+        if not self.buckets[sku].take(max_wait):
+            with self._lock:
+                self.throttled[sku] += 1
+            return False
+
+        with self._lock:
+            self.allowed[sku] += 1
+            self._pending[sku] = self._pending.get(sku, 0) + 1
+        return True
+
+    def check(self, sku: str, deadline: Deadline = None):
+        """acquire(), raising QuotaExceeded instead of returning False"""
+        if not self.acquire(sku, deadline):
+            raise QuotaExceeded(f"{sku} quota exceeded ({self.level()})")
+
+    def level(self) -> str:
+        """Degradation level for the current daily/monthly spend"""
+        if not self.enabled:
+            return NORMAL
+        day_spend, month_spend = self.spend()
+        used = max(day_spend / self.daily_budget if self.daily_budget > 0 else 0.0,
+                   month_spend / self.monthly_budget if self.monthly_budget > 0 else 0.0)
+        if used >= 1.0:
+            return EXHAUSTED
+        if used >= self.cache_only_at:
+            return CACHED_DETAILS_ONLY
+        if used >= self.reduce_at:
+            return REDUCED_DETAILS
+        return NORMAL
+
+    def details_allowance(self, max_results: int) -> Optional[int]:
+        """How many Place Details calls a search may make (None = no limit)"""
+        level = self.level()
+        if level == NORMAL:
+            return None
+        if level == REDUCED_DETAILS:
+            return min(max_results, self.reduced_details_max)
+        return 0
+
+    def spend(self) -> tuple:
+        """(today's spend, this month's spend) in USD, including calls not yet flushed"""
+        with self._lock:
+            pending = sum(self.costs[sku] * calls for sku, calls in self._pending.items())
+            return self._day_spend + pending, self._month_spend + pending
+
+    def flush(self):
+        """Write pending calls to api_usage and reload the totals of every worker"""
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        today = date.today()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                conn.executemany(
+                    '''INSERT INTO api_usage (day, sku, calls, cost_usd) VALUES (?, ?, ?, ?)
+                       ON CONFLICT(day, sku) DO UPDATE SET calls = calls + excluded.calls, cost_usd = cost_usd + excluded.cost_usd''',
+                    [(today.isoformat(), sku, calls, calls * self.costs[sku]) for sku, calls in pending.items()]
+                )
+                rows = conn.execute(
+                    'SELECT day, sku, calls, cost_usd FROM api_usage WHERE day >= ?',
+                    (today.replace(day=1).isoformat(),)
+                ).fetchall()
+        except Exception as e:
+            print(f"Quota usage write error: {e}")
+            with self._lock:
+                for sku, calls in pending.items():
+                    self._pending[sku] = self._pending.get(sku, 0) + calls
+                self._last_flush = time.monotonic()
+            return
+
+        with self._lock:
+            self._day = today
+            self._day_spend = sum(row['cost_usd'] for row in rows if row['day'] == today.isoformat())
+            self._month_spend = sum(row['cost_usd'] for row in rows)
+            self._day_calls = {row['sku']: row['calls'] for row in rows if row['day'] == today.isoformat()}
+            self._last_flush = time.monotonic()
+
+    def usage_history(self, days: int = 30) -> List[Dict[str, Any]]:
+        """Stored calls and spend per day and SKU, newest first"""
+        self.flush()
+        since = (date.today() - timedelta(days=days - 1)).isoformat()
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                rows = conn.execute(
+                    'SELECT day, sku, calls, cost_usd FROM api_usage WHERE day >= ? ORDER BY day DESC, sku',
+                    (since,)
+                ).fetchall()
+            return [{'day': row['day'], 'sku': row['sku'], 'calls': row['calls'], 'cost_usd': round(row['cost_usd'], 4)} for row in rows]
+        except Exception as e:
+            print(f"Quota usage read error: {e}")
+            return []
+
+    def get_stats(self) -> Dict[str, Any]:
+        if self.enabled:
+            self._refresh()
+        day_spend, month_spend = self.spend()
+        with self._lock:
+            skus = {
+                sku: {
+                    'calls_today': self._day_calls.get(sku, 0) + self._pending.get(sku, 0),
+                    'allowed': self.allowed[sku],
+                    'throttled': self.throttled[sku],
+                    'denied': self.denied[sku],
+                    'tokens': self.buckets[sku].available(),
+                    'cost_usd': self.costs[sku]
+                }
+                for sku in DEFAULT_SKUS
+            }
+        return {
+            'enabled': self.enabled,
+            'level': self.level(),
+            'daily_spend_usd': round(day_spend, 4),
+            'daily_budget_usd': self.daily_budget,
+            'monthly_spend_usd': round(month_spend, 4),
+            'monthly_budget_usd': self.monthly_budget,
+            'skus': skus
+        }
+
+    def _refresh(self):
+        """Flush every QUOTA_FLUSH_SECONDS, and at once when the day changes"""
+        with self._lock:
+            due = self._day != date.today() or time.monotonic() - self._last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def _ensure_table(self, conn):
+        if self._db_ready:
+            return
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS api_usage (
+                day TEXT NOT NULL,  -- YYYY-MM-DD
+                sku TEXT NOT NULL,
+                calls INTEGER NOT NULL DEFAULT 0,
+                cost_usd REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, sku)
+            )
+        ''')
+        self._db_ready = True
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_quota_manager() -> QuotaManager:
+    """Process-wide quota manager"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = QuotaManager()
+    return _manager
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Batched resource ranking
+
+Scores every candidate at once over NumPy arrays:
+- Rating score (0-60 points): rating * 12, or 20 if unrated
+- Distance score (3-25 points): closer is better
+- Relevance score (0-15 points): BM25 over name, services, description and category (text_index.py)
+
+Ordering matches the original ranking: rating first, then total score, then
+distance. Top-k is selected with a partial sort. The local catalog keeps a
+CandidateSet per catalog version and ranks each query's rows as a subset of
+it, so no per-query column arrays are built. Falls back to plain Python when
+NumPy isn't installed.
+"""
+
+from math import radians, sin, cos, sqrt, atan2
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is in requirements.txt
+    np = None
+
+try:
+    from .text_index import TextIndex, resource_text
+except ImportError:
+    from text_index import TextIndex, resource_text
+
+EARTH_RADIUS_MILES = 3959
+
+
+def haversine_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Distance in miles between two points (Haversine formula)"""
+    lat1, lng1, lat2, lng2 = map(radians, [lat1, lng1, lat2, lng2])
+    dlat = lat2 - lat1
+    dlng = lng2 - lng1
+    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlng / 2) ** 2
+    return EARTH_RADIUS_MILES * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def haversine_miles_array(lat: float, lng: float, lats, lngs):
+    """Distances in miles from one point to arrays of points"""
+    lat_r, lng_r = np.radians(lat), np.radians(lng)
+    lats_r, lngs_r = np.radians(lats), np.radians(lngs)
+    a = np.sin((lats_r - lat_r) / 2) ** 2 + np.cos(lat_r) * np.cos(lats_r) * np.sin((lngs_r - lng_r) / 2) ** 2
+    return EARTH_RADIUS_MILES * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def rank_resources(resources: List[Dict], query: str, max_results: int,
+                   user_lat: Optional[float] = None, user_lng: Optional[float] = None,
+                   text_index: Optional[TextIndex] = None) -> List[Dict]:
+    """
+    Rank resources by rating, relevance and distance and return the top max_results
+
+    If user coordinates are given, distances are computed from each resource's
+    latitude/longitude and the returned resources are copies carrying that distance.
+
+    Args:
+        text_index: Prebuilt index keyed by resource id (e.g. the local catalog's);
+                    by default one is built over these resources
+    """
+    if not resources or max_results <= 0:
+        return []
+    if np is None:
+        return _rank_resources_python(resources, query, max_results, user_lat, user_lng, text_index)
+    return CandidateSet(resources, text_index).rank(query, max_results, user_lat, user_lng)
+
+
+class CandidateSet:
+    """
+    Column arrays for a pool of resources
+
+    Build once per candidate pool (or keep one for a catalog that rarely
+    changes) and rank it for many queries/locations.
+    """
+
+    def __init__(self, resources: List[Dict], text_index: Optional[TextIndex] = None):
+        self.resources = list(resources)
+        count = len(self.resources)
+        self.lats = np.fromiter((_as_float(r.get('latitude'), np.nan) for r in self.resources), dtype=float, count=count)
+        self.lngs = np.fromiter((_as_float(r.get('longitude'), np.nan) for r in self.resources), dtype=float, count=count)
+        self.has_coords = ~(np.isnan(self.lats) | np.isnan(self.lngs)) & ~((self.lats == 0) & (self.lngs == 0))
+        self.distances = np.fromiter((_as_float(r.get('distance'), 999) for r in self.resources), dtype=float, count=count)
+        self.ratings = np.fromiter((_as_float(r.get('rating'), 0) for r in self.resources), dtype=float, count=count)
+        self.rating_scores = np.where(self.ratings > 0, self.ratings * 12, 20.0)
+        # External indexes are keyed by resource id, our own (built on first use) by position
+        self.text_index = text_index
+        self._positions = {r.get('id'): i for i, r in enumerate(self.resources)} if text_index is not None else None
+        self._relevance = {}
+
+    def __len__(self) -> int:
+        return len(self.resources)
+
+    def positions(self, ids: List) -> Optional[List[int]]:
+        """Positions of the resources with these ids (needs an external text index), None if any is missing"""
+        if self._positions is None:
+            return None
+        positions = [self._positions.get(resource_id) for resource_id in ids]
+        return None if None in positions else positions
+
+    def relevance_scores(self, query: str, pool=None):
+        """0-15 BM25 points per resource for the query (cached per query)"""
+        points = self._relevance.get(query)
+        if points is None:
+            if self.text_index is None:
+                self.text_index = TextIndex((i, resource_text(r)) for i, r in enumerate(self.resources))
+            points = np.zeros(len(self.resources))
+            keys = None if self._positions is None else self._positions.keys()
+            for key, value in self.text_index.relevance_points(query, keys).items():
+                position = key if self._positions is None else self._positions.get(key)
+                if position is not None:
+                    points[position] = value
+            if len(self._relevance) >= 256:
+                self._relevance.clear()
+            self._relevance[query] = points
+        return points if pool is None else points[pool]
+
+    def rank(self, query: str, max_results: int, user_lat: Optional[float] = None, user_lng: Optional[float] = None,
+             indices=None, max_distance: Optional[float] = None) -> List[Dict]:
+        """
+        Top max_results resources, best first
+
+        Args:
+            indices: Optional subset of positions to rank (e.g. a spatial pre-filter)
+            max_distance: Leave out resources farther than this many miles
+        """
+        pool = np.arange(len(self.resources)) if indices is None else np.asarray(indices, dtype=int)
+        if not len(pool) or max_results <= 0:
+            return []
+
+        with_distance = user_lat is not None and user_lng is not None
+        if with_distance:
+            distances = np.round(haversine_miles_array(user_lat, user_lng, self.lats[pool], self.lngs[pool]), 1)
+            distances = np.where(self.has_coords[pool], distances, self.distances[pool])
+        else:
+            distances = self.distances[pool]
+        if max_distance is not None:
+            inside = distances <= max_distance
+            pool, distances = pool[inside], distances[inside]
+            if not len(pool):
+                return []
+        ratings = self.ratings[pool]
+
+        scores = self.rating_scores[pool] + np.select([distances <= 1, distances <= 3, distances <= 5], [25, 15, 8], default=3)
+        scores = scores + self.relevance_scores(query, pool)
+
+        # Sort keys (ascending): rating first, then score, then distance
+        k = min(max_results, len(pool))
+        candidates = np.arange(len(pool))
+        if k < len(pool):
+            # Partial sort: only candidates that can reach the top k get fully ordered
+            kth = np.partition(-ratings, k - 1)[k - 1]
+            candidates = candidates[-ratings <= kth]
+        order = candidates[np.lexsort((distances[candidates], -scores[candidates], -ratings[candidates]))][:k]
+
+        if not with_distance:
+            return [self.resources[pool[i]] for i in order]
+        return [dict(self.resources[pool[i]], distance=float(distances[i])) for i in order]
+
+
+def _as_float(value, default: float) -> float:
+    try:
+        return float(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _rank_resources_python(resources, query, max_results, user_lat, user_lng, text_index=None):
+    """Original scalar ranking, used when NumPy is unavailable"""
+    if text_index is None:
+        relevance = TextIndex((i, resource_text(r)) for i, r in enumerate(resources)).relevance_points(query)
+        relevance_of = lambda i, resource: relevance.get(i, 0.0)
+    else:
+        relevance = text_index.relevance_points(query, [r.get('id') for r in resources])
+        relevance_of = lambda i, resource: relevance.get(resource.get('id'), 0.0)
+
+    scored = []
+    for i, resource in enumerate(resources):
+        if user_lat is not None and user_lng is not None and resource.get('latitude') and resource.get('longitude'):
+            resource = dict(resource, distance=round(haversine_miles(user_lat, user_lng, resource['latitude'], resource['longitude']), 1))
+
+        rating = _as_float(resource.get('rating'), 0)
+        score = rating * 12 if rating > 0 else 20
+
+        distance = _as_float(resource.get('distance'), 999)
+        if distance <= 1:
+            score += 25
+        elif distance <= 3:
+            score += 15
+        elif distance <= 5:
+            score += 8
+        else:
+            score += 3
+
+        score += relevance_of(i, resource)
+
+        scored.append((-rating, -score, distance, resource))
+
+    scored.sort(key=lambda item: item[:3])
+    return [item[3] for item in scored[:max_results]]
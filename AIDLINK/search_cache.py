@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+/api/search response cache backed by the search_cache table in aidlink.db
+
+Entries are keyed on the normalized search parameters and expire after a
+per-source TTL, so live Google results, OSM results and demo data can each
+be kept for a different amount of time.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+try:
+    from .database import get_connection
+except ImportError:
+    from database import get_connection
+
+
+class SearchCache:
+    """Read-through cache for full /api/search responses"""
+
+    def __init__(self):
+        self.enabled = os.getenv('SEARCH_CACHE_ENABLED', 'True').lower() == 'true'
+        default_hours = float(os.getenv('CACHE_DURATION_HOURS', 6))
+        # TTL (hours) by response 'source'
+        self.source_ttl_hours = {
+            'google_places': float(os.getenv('SEARCH_CACHE_TTL_GOOGLE_HOURS', default_hours)),
+            'openstreetmap': float(os.getenv('SEARCH_CACHE_TTL_OSM_HOURS', 24)),
+            'verified_fallback': float(os.getenv('SEARCH_CACHE_TTL_DEMO_HOURS', 1)),
+            'verified_sacramento_resources': float(os.getenv('SEARCH_CACHE_TTL_DEMO_HOURS', 1)),
+            # Thin local answers that no provider could improve on
+            'local_catalog': float(os.getenv('SEARCH_CACHE_TTL_DEMO_HOURS', 1)),
+        }
+        self.default_ttl_hours = default_hours
+        self.purge_interval_seconds = float(os.getenv('SEARCH_CACHE_PURGE_SECONDS', 600))
+
+        self.hits = 0
+        self.misses = 0
+        self._purge_thread = None
+        self._db_ready = False
+        self._lock = threading.Lock()
+
+    def make_key(self, query: str, location: str, category: str, radius: int, max_results: int) -> str:
+        """Cache key over the normalized search parameters"""
+        normalized = [
+            ' '.join((query or '').lower().split()),
+            ' '.join((location or '').lower().split()),
+            (category or 'general').lower().strip(),
+            int(radius),
+            int(max_results)
+        ]
+        return hashlib.md5(json.dumps(normalized).encode('utf-8')).hexdigest()
+
+    def get(self, query: str, location: str, category: str, radius: int, max_results: int, allow_expired: bool = False,
+            count_stats: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Return a cached response, or None on a miss
+
+        allow_expired also returns entries past their TTL that haven't been purged
+        yet - used when a request runs out of time and stale results beat none.
+        count_stats=False leaves hit/miss counters alone (e.g. polling for another worker's result).
+        """
+        if not self.enabled:
+            return None
+        self.start_background_purge()
+
+        key = self.make_key(query, location, category, radius, max_results)
+        not_before = '' if allow_expired else datetime.now().isoformat()
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                row = conn.execute(
+                    'SELECT results FROM search_cache WHERE cache_key = ? AND expires_at > ?',
+                    (key, not_before)
+                ).fetchone()
+            response = json.loads(row['results']) if row else None
+        except Exception as e:
+            print(f"Search cache read error: {e}")
+            response = None
+
+        # Ignore rows written in any older format
+        count_stats = count_stats and not allow_expired
+        if not isinstance(response, dict) or 'recommendations' not in response:
+            if count_stats:
+                self._count(hit=False)
+            return None
+
+        if count_stats:
+            self._count(hit=True)
+        response['cached'] = True
+        return response
+
+    def set(self, query: str, location: str, category: str, radius: int, max_results: int, response: Dict[str, Any]):
+        """Store a successful response using the TTL for its source"""
+        if not self.enabled or not response.get('success') or not response.get('recommendations'):
+            return
+
+        ttl_hours = self.source_ttl_hours.get(response.get('source'), self.default_ttl_hours)
+        if ttl_hours <= 0:
+            return
+
+        key = self.make_key(query, location, category, radius, max_results)
+        expires_at = datetime.now() + timedelta(hours=ttl_hours)
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                conn.execute(
+                    'INSERT OR REPLACE INTO search_cache (cache_key, query, location, category, results, expires_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, query, location, category, json.dumps(response), expires_at.isoformat())
+                )
+        except Exception as e:
+            print(f"Search cache write error: {e}")
+
+    def purge_expired(self) -> int:
+        """Delete expired rows (uses idx_cache_expires)"""
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                cursor = conn.execute('DELETE FROM search_cache WHERE expires_at <= ?', (datetime.now().isoformat(),))
+                return cursor.rowcount
+        except Exception as e:
+            print(f"Search cache purge error: {e}")
+            return 0
+
+    def start_background_purge(self):
+        """Start the expired-row purge thread once per process"""
+        if self._purge_thread is not None or self.purge_interval_seconds <= 0:
+            return
+        with self._lock:
+            if self._purge_thread is not None:
+                return
+            self._purge_thread = threading.Thread(target=self._purge_loop, name='search-cache-purge', daemon=True)
+            self._purge_thread.start()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+    def _ensure_table(self, conn):
+        """Create search_cache if this database doesn't have it yet"""
+        if self._db_ready:
+            return
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS search_cache (
+                cache_key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                location TEXT,
+                category TEXT,
+                results TEXT,  -- JSON string
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_expires ON search_cache(expires_at)')
+        self._db_ready = True
+
+    def _purge_loop(self):
+        while True:
+            self.purge_expired()
+            time.sleep(self.purge_interval_seconds)
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """Process-wide search response cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SearchCache()
+    return _cache
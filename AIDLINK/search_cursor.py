@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Server-side state behind /api/search pagination cursors
+
+A paginated provider (Google Places Text Search) hands back the state it
+needs to continue: place ids not shown yet, its next_page_token and the ids
+already returned. That state is kept in the search_cursors table of
+aidlink.db and the client only sees an opaque random cursor, so page tokens
+and place ids never leave the server and any worker can serve the next page.
+"""
+
+import json
+import os
+import secrets
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+try:
+    from .database import get_connection
+except ImportError:
+    from database import get_connection
+
+
+class InvalidCursor(ValueError):
+    """The cursor is unknown or has expired"""
+
+
+class SearchCursorStore:
+    """Opaque cursor -> pagination state, with expiry"""
+
+    def __init__(self):
+        self.ttl_seconds = float(os.getenv('SEARCH_CURSOR_TTL_MINUTES', 60)) * 60
+        self._writes = 0
+        self._db_ready = False
+        self._lock = threading.Lock()
+
+    def save(self, state: Dict[str, Any]) -> str:
+        """Store state and return a new cursor for it"""
+        cursor = secrets.token_urlsafe(16)
+        now = datetime.now()
+        with get_connection() as conn:
+            self._ensure_table(conn)
+            conn.execute(
+                'INSERT INTO search_cursors (cursor, state, expires_at) VALUES (?, ?, ?)',
+                (cursor, json.dumps(state, separators=(',', ':')), (now + timedelta(seconds=self.ttl_seconds)).isoformat())
+            )
+            with self._lock:
+                self._writes += 1
+                purge = self._writes % 100 == 1
+            if purge:
+                conn.execute('DELETE FROM search_cursors WHERE expires_at <= ?', (now.isoformat(),))
+        return cursor
+
+    def load(self, cursor: str) -> Dict[str, Any]:
+        """State behind a cursor; raises InvalidCursor if it is unknown or expired"""
+        row = self._get(cursor, 'state')
+        if row is None:
+            raise InvalidCursor('Cursor is unknown or has expired - start a new search')
+        return json.loads(row['state'])
+
+    def exists(self, cursor: str) -> bool:
+        return self._get(cursor, '1') is not None
+
+    def _get(self, cursor: str, column: str):
+        if not cursor:
+            return None
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                return conn.execute(
+                    f'SELECT {column} FROM search_cursors WHERE cursor = ? AND expires_at > ?',
+                    (cursor, datetime.now().isoformat())
+                ).fetchone()
+        except Exception as e:
+            print(f"Search cursor read error: {e}")
+            return None
+
+    def _ensure_table(self, conn):
+        if self._db_ready:
+            return
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS search_cursors (
+                cursor TEXT PRIMARY KEY,
+                state TEXT NOT NULL,  -- JSON pagination state
+                expires_at TIMESTAMP NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_search_cursors_expires ON search_cursors(expires_at)')
+        self._db_ready = True
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_search_cursor_store() -> SearchCursorStore:
+    """Process-wide cursor store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SearchCursorStore()
+    return _store
@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+"""
+Search orchestrator for /api/search
+
+Answers from the local resources catalog when it has enough results within
+the requested radius. Otherwise runs the provider chain (Google Places ->
+OpenStreetMap -> demo data) in one of several modes:
+
+- serial: try each provider in turn (the original behaviour)
+- race:   start every provider at once, return the first acceptable result
+- hedge:  start the first provider, start the next one only if it hasn't
+          answered within SEARCH_HEDGE_DELAY_SECONDS
+- merge:  start every provider at once and merge whatever has arrived by
+          SEARCH_MERGE_DEADLINE_SECONDS
+
+search_batch() runs many searches on a shared, size-limited pool, geocoding
+each location and running each distinct search only once.
+
+search_stream() runs the merge strategy but yields cached/local results at
+once and provider results as they arrive, ending with the ranked response.
+
+Responses report the winning provider and how long each one took. Every
+search runs under a request Deadline; when it runs out the response degrades
+to stale cached results or demo data instead of waiting on providers.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterator, List, Any, Callable, Optional, Tuple
+
+try:
+    from .providers import get_google_places_client, get_osm_client
+    from .geocoding_service import get_geocoding_service
+    from .search_cache import get_search_cache
+    from .demo_211_data import get_demo_211_data
+    from .deadline import Deadline, DeadlineExceeded
+    from .ranking import rank_resources
+    from .local_search import get_local_index
+    from .single_flight import get_single_flight
+    from .search_cursor import get_search_cursor_store
+except ImportError:
+    from providers import get_google_places_client, get_osm_client
+    from geocoding_service import get_geocoding_service
+    from search_cache import get_search_cache
+    from demo_211_data import get_demo_211_data
+    from deadline import Deadline, DeadlineExceeded
+    from ranking import rank_resources
+    from local_search import get_local_index
+    from single_flight import get_single_flight
+    from search_cursor import get_search_cursor_store
+
+SEARCH_MODES = ('serial', 'race', 'hedge', 'merge')
+# search_mode reported by search_stream (merge semantics, results streamed as they arrive)
+STREAM_MODE = 'stream'
+
+# Provider responses with these sources are the providers' own demo-data fallbacks (or declined calls);
+# they never win a search and are never cached
+FALLBACK_SOURCES = {'verified_fallback', 'no_data', 'error', 'skipped'}
+
+
+class SearchOrchestrator:
+    """Runs the configured provider strategy for a search request"""
+
+    def __init__(self):
+        mode = os.getenv('SEARCH_MODE', 'serial').lower()
+        self.mode = mode if mode in SEARCH_MODES else 'serial'
+        self.hedge_delay_seconds = float(os.getenv('SEARCH_HEDGE_DELAY_SECONDS', 1.5))
+        self.merge_deadline_seconds = float(os.getenv('SEARCH_MERGE_DEADLINE_SECONDS', 6))
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('SEARCH_PROVIDER_WORKERS', 16)),
+            thread_name_prefix='search-provider'
+        )
+        # Shared by every /api/search/batch request, so bulk jobs can't crowd out interactive searches
+        self.batch_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('SEARCH_BATCH_CONCURRENCY', 4)),
+            thread_name_prefix='search-batch'
+        )
+
+    def search(self, query: str, location: str, category: str, max_results: int, radius: int, mode: str = None,
+               deadline: Deadline = None, cursor: str = None) -> Dict[str, Any]:
+        """
+        Search for resources using the configured (or requested) mode
+
+        Args:
+            mode: One of SEARCH_MODES (defaults to SEARCH_MODE)
+            deadline: Request latency budget (defaults to REQUEST_DEADLINE_MS)
+            cursor: next_cursor of a previous response - return the following page instead
+                    (the other search parameters are taken from the cursor)
+
+        Returns:
+            The /api/search response, plus 'provider', 'provider_timings' and 'search_mode',
+            and 'next_cursor' when more results can be fetched
+
+        Raises:
+            InvalidCursor: the cursor is unknown or has expired
+        """
+        deadline = deadline or Deadline.from_request()
+        if cursor:
+            return self._next_page(cursor, deadline)
+        mode = mode if mode in SEARCH_MODES else self.mode
+        started = time.perf_counter()
+
+        # Serve repeated searches without any provider calls
+        search_cache = get_search_cache()
+        cached = search_cache.get(query, location, category, radius, max_results)
+        if cached:
+            return self._cached_response(cached, mode, started)
+
+        # Identical searches already in flight share one execution (and its provider calls);
+        # a result degraded by the leader's deadline isn't shared - followers may have more time
+        res = get_single_flight('search').do(
+            f"{search_cache.make_key(query, location, category, radius, max_results)}:{mode}",
+            lambda: self._search_uncached(query, location, category, max_results, radius, mode, deadline, started),
+            timeout=deadline.remaining(),
+            lookup=lambda: self._cached_response(
+                search_cache.get(query, location, category, radius, max_results, count_stats=False), mode, started
+            ),
+            shareable=lambda res: not res.get('degraded')
+        )
+        return dict(res)
+
+    def search_stream(self, query: str, location: str, category: str, max_results: int, radius: int,
+                      deadline: Deadline = None) -> Iterator[Dict[str, Any]]:
+        """
+        Search, yielding events as results become known
+
+        Events (each a dict with a 'type'):
+            results  - resources from one provider ('cache', 'local', 'google_places' one
+                       at a time as details arrive, 'openstreetmap' when it finishes);
+                       a place already sent by another provider is not sent again
+            provider - a provider finished: its status and time taken
+            final    - the complete ranked response, the same as /api/search in merge
+                       mode; clients should replace what they have shown with it
+        """
+        deadline = deadline or Deadline.from_request()
+        started = time.perf_counter()
+        search_cache = get_search_cache()
+
+        cached = search_cache.get(query, location, category, radius, max_results)
+        if cached:
+            res = self._cached_response(cached, STREAM_MODE, started)
+            yield {'type': 'results', 'provider': 'cache', 'recommendations': res.get('recommendations', [])}
+            yield dict(res, type='final')
+            return
+
+        location_coords = get_geocoding_service().geocode(location, deadline)
+        sent = set()
+        timings = {}
+
+        local_results = []
+        if location_coords:
+            local_started = time.perf_counter()
+            local_index = get_local_index()
+            local_results = local_index.search(query, location_coords['lat'], location_coords['lng'], radius, category, max_results)
+            timings['local'] = {'status': 'ok' if local_results else 'empty', 'ms': self._elapsed_ms(local_started)}
+            if local_results:
+                sent.update(self._resource_key(r) for r in local_results)
+                yield {'type': 'results', 'provider': 'local', 'recommendations': local_results}
+            if local_index.has_enough(local_results, max_results):
+                timings['local']['status'] = 'won'
+                res = self._local_response(query, local_results)
+                res.update(provider='local', provider_timings=timings, search_mode=STREAM_MODE)
+                yield dict(res, type='final')
+                return
+
+        # Providers run concurrently and report through one queue: ('result', name, resource) or ('done', name, res, timing)
+        events = queue.Queue()
+        providers = self._build_providers(query, location, category, max_results, radius, location_coords, deadline,
+                                          on_result=lambda name, resource: events.put(('result', name, resource)))
+
+        def run(name, call):
+            events.put(('done', name) + self._timed_call(call))
+
+        pending = set()
+        for name, call in providers:
+            self.executor.submit(run, name, call)
+            pending.add(name)
+            timings[name] = {'status': 'pending', 'started': time.perf_counter()}
+
+        results = {}
+        give_up_at = time.monotonic() + min(self.merge_deadline_seconds, deadline.remaining())
+        while pending:
+            try:
+                event = events.get(timeout=max(0.0, give_up_at - time.monotonic()))
+            except queue.Empty:
+                break
+            if event[0] == 'result':
+                _, name, resource = event
+                new = [resource]
+            else:
+                _, name, res, timing = event
+                pending.discard(name)
+                timings[name] = timing
+                yield {'type': 'provider', 'provider': name, 'status': timing['status'], 'ms': timing.get('ms')}
+                if not self._is_acceptable(res):
+                    continue
+                results[name] = res
+                new = res['recommendations']
+            new = [r for r in new if self._resource_key(r) not in sent]
+            if new:
+                sent.update(self._resource_key(r) for r in new)
+                yield {'type': 'results', 'provider': name, 'recommendations': new}
+        self._finish_timings(timings)
+
+        res, winner = None, None
+        if results:
+            for name in results:
+                timings[name]['status'] = 'won'
+            res = self._merge_results(providers, results, query, max_results, location_coords)
+            winner = res['source']
+        res = self._complete(query, location, category, max_results, radius, STREAM_MODE, deadline, res, winner, timings, local_results)
+        yield dict(res, type='final')
+
+    def _search_uncached(self, query: str, location: str, category: str, max_results: int, radius: int, mode: str,
+                         deadline: Deadline, started: float) -> Dict[str, Any]:
+        # Geocode once and share the coordinates with whichever provider runs
+        location_coords = get_geocoding_service().geocode(location, deadline)
+
+        # Local catalog first; external providers only when coverage is too thin
+        local_results = []
+        if location_coords:
+            local_started = time.perf_counter()
+            local_index = get_local_index()
+            local_results = local_index.search(query, location_coords['lat'], location_coords['lng'], radius, category, max_results)
+            local_timing = {'status': 'ok' if local_results else 'empty', 'ms': self._elapsed_ms(local_started)}
+            if local_index.has_enough(local_results, max_results):
+                local_timing['status'] = 'won'
+                res = self._local_response(query, local_results)
+                res['provider'] = 'local'
+                res['provider_timings'] = {'local': local_timing}
+                res['search_mode'] = mode
+                return res
+
+        providers = self._build_providers(query, location, category, max_results, radius, location_coords, deadline)
+
+        if mode == 'serial':
+            res, winner, timings = self._run_serial(providers, deadline)
+        elif mode == 'merge':
+            res, winner, timings = self._run_merge(providers, query, max_results, location_coords, deadline)
+        else:
+            res, winner, timings = self._run_race(providers, deadline, hedge=(mode == 'hedge'))
+        if location_coords:
+            timings = dict({'local': local_timing}, **timings)
+        return self._complete(query, location, category, max_results, radius, mode, deadline, res, winner, timings, local_results)
+
+    def search_batch(self, items: List[Dict[str, Any]], deadline: Deadline = None) -> Dict[str, Any]:
+        """
+        Run many searches in one request
+
+        Identical searches run once. Each distinct location is geocoded once up
+        front, and searches run on the shared batch pool (SEARCH_BATCH_CONCURRENCY)
+        where concurrent Overpass fetches of the same tiles are coalesced. Every
+        search gets at most REQUEST_DEADLINE_MS, and none starts after the batch
+        deadline has run out.
+
+        Args:
+            items: Dicts with the /api/search parameters (query, location, category, max_results, radius, search_mode)
+            deadline: Budget for the whole batch (defaults to BATCH_DEADLINE_MS)
+
+        Returns:
+            'results' in item order, each {'index', 'success', 'result'} or {'index', 'success': False, 'error'}
+        """
+        deadline = deadline or Deadline.from_request(env_var='BATCH_DEADLINE_MS', default_ms=30000)
+        started = time.perf_counter()
+        search_cache = get_search_cache()
+        results: List[Optional[Dict]] = [None] * len(items)
+
+        searches = {}  # search key -> (params, item indexes)
+        for i, item in enumerate(items):
+            try:
+                params = self._batch_params(item)
+            except (TypeError, ValueError) as e:
+                results[i] = {'index': i, 'success': False, 'error': str(e)}
+                continue
+            key = f"{search_cache.make_key(params['query'], params['location'], params['category'], params['radius'], params['max_results'])}:{params['mode'] or self.mode}"
+            searches.setdefault(key, (params, []))[1].append(i)
+
+        # Warm the geocode cache once per location; the searches below then hit it
+        locations = {params['location'] for params, _ in searches.values()}
+        list(self.batch_executor.map(lambda location: get_geocoding_service().geocode(location, deadline), locations))
+
+        item_budget = Deadline.from_request().budget_seconds
+
+        def run(params):
+            if deadline.expired():
+                raise DeadlineExceeded('batch deadline exceeded before this search started')
+            return self.search(params['query'], params['location'], params['category'], params['max_results'], params['radius'],
+                               mode=params['mode'], deadline=Deadline(min(item_budget, deadline.remaining())))
+
+        futures = {self.batch_executor.submit(run, params): indexes for params, indexes in searches.values()}
+        # Searches stop at their own deadlines; the extra second covers the last ones wrapping up
+        done, not_done = wait(futures, timeout=deadline.remaining() + 1)
+        for future in not_done:
+            future.cancel()
+
+        for future, indexes in futures.items():
+            for i in indexes:
+                if future not in done:
+                    results[i] = {'index': i, 'success': False, 'error': 'batch deadline exceeded'}
+                elif future.exception() is not None:
+                    results[i] = {'index': i, 'success': False, 'error': str(future.exception())}
+                else:
+                    results[i] = {'index': i, 'success': True, 'result': dict(future.result())}
+
+        return {
+            'success': True,
+            'results': results,
+            'total': len(items),
+            'failed': sum(1 for r in results if not r['success']),
+            'unique_searches': len(searches),
+            'unique_locations': len(locations),
+            'ms': self._elapsed_ms(started)
+        }
+
+    def _batch_params(self, item: Any) -> Dict[str, Any]:
+        """Validated search parameters of one batch item, with the /api/search defaults"""
+        if not isinstance(item, dict):
+            raise ValueError('each search must be an object')
+        mode = str(item.get('search_mode') or '').strip().lower() or None
+        if mode and mode not in SEARCH_MODES:
+            raise ValueError(f"unknown search_mode '{mode}'")
+        return {
+            'query': str(item.get('query') or '').strip(),
+            'location': str(item.get('location') or 'Sacramento, CA').strip(),
+            'category': str(item.get('category') or 'general').strip(),
+            'max_results': int(item.get('max_results') or 10),
+            'radius': int(item.get('radius') or 10),
+            'mode': mode
+        }
+
+    def _next_page(self, cursor: str, deadline: Deadline) -> Dict[str, Any]:
+        """The page after the one that returned cursor (only Google Places paginates)"""
+        started = time.perf_counter()
+        state = get_search_cursor_store().load(cursor)
+        google_places = get_google_places_client()
+        if google_places is None:
+            res = {'success': True, 'recommendations': [], 'total_results': 0, 'source': 'google_places'}
+        else:
+            res = google_places.search_more(state, deadline)
+        res['page'] = state.get('page', 1) + 1
+        self._store_page_state(res, res['page'])
+        res['provider'] = 'google_places'
+        res['provider_timings'] = {'google_places': {'status': 'ok' if res.get('recommendations') else 'empty',
+                                                     'ms': self._elapsed_ms(started)}}
+        res['search_mode'] = 'page'
+        return res
+
+    def _store_page_state(self, res: Dict[str, Any], page: int = 1):
+        """Swap a provider's page_state for an opaque next_cursor"""
+        state = res.pop('page_state', None)
+        if not state:
+            return
+        try:
+            res['next_cursor'] = get_search_cursor_store().save(dict(state, page=page))
+        except Exception as e:
+            print(f"Search cursor write error: {e}")
+
+    def _complete(self, query: str, location: str, category: str, max_results: int, radius: int, mode: str,
+                  deadline: Deadline, res: Optional[Dict], winner: Optional[str], timings: Dict[str, Dict],
+                  local_results: List[Dict]) -> Dict[str, Any]:
+        """Fall back from a missing provider result (stale cache, thin local answer, demo data), cache and annotate"""
+        search_cache = get_search_cache()
+
+        # Out of time without a live result: stale cached results beat demo data
+        degraded = deadline.expired() and not self._is_acceptable(res)
+        if degraded:
+            stale = search_cache.get(query, location, category, radius, max_results, allow_expired=True)
+            if stale:
+                res, winner = stale, 'stale_cache'
+                timings['stale_cache'] = {'status': 'won', 'ms': 0}
+
+        # A thin local answer still beats demo data
+        if res is None and local_results:
+            res, winner = self._local_response(query, local_results), 'local'
+            timings['local']['status'] = 'won'
+
+        if res is None:
+            demo_started = time.perf_counter()
+            res = self._demo_response(query, location, category, max_results)
+            winner = 'demo'
+            timings['demo'] = {'status': 'won', 'ms': self._elapsed_ms(demo_started)}
+
+        self._store_page_state(res)
+        if degraded:
+            res['degraded'] = 'deadline_exceeded'
+        elif res.get('source') not in FALLBACK_SOURCES:
+            search_cache.set(query, location, category, radius, max_results, res)
+
+        res['provider'] = winner
+        res['provider_timings'] = timings
+        res['search_mode'] = mode
+        return res
+
+    def _cached_response(self, cached: Optional[Dict], mode: str, started: float) -> Optional[Dict[str, Any]]:
+        if not cached:
+            return None
+        # Cursors expire sooner than cached responses
+        if cached.get('next_cursor') and not get_search_cursor_store().exists(cached['next_cursor']):
+            cached.pop('next_cursor')
+        cached['provider'] = 'cache'
+        cached['provider_timings'] = {'cache': {'status': 'won', 'ms': self._elapsed_ms(started)}}
+        cached['search_mode'] = mode
+        return cached
+
+    def _build_providers(self, query, location, category, max_results, radius, location_coords, deadline,
+                         on_result: Callable[[str, Dict], None] = None) -> List[Tuple[str, Callable[[], Dict]]]:
+        """
+        Ordered (name, call) pairs for the providers that are available
+
+        Args:
+            on_result: Called with (provider, resource) by providers that can report results one at a time
+        """
+        providers = []
+
+        google_places = get_google_places_client()
+        if google_places and getattr(google_places, 'available', False):
+            google_result = (lambda resource: on_result('google_places', resource)) if on_result else None
+            providers.append(('google_places', lambda: google_places.search_places(
+                query, location, category, max_results, radius_miles=radius, location_coords=location_coords, deadline=deadline,
+                on_result=google_result
+            )))
+
+        osm = get_osm_client()
+        if osm and getattr(osm, 'available', True):
+            providers.append(('openstreetmap', lambda: osm.search_places(
+                query, location, category, max_results, location_coords=location_coords, deadline=deadline, radius_miles=radius
+            )))
+
+        return providers
+
+    def _run_serial(self, providers, deadline: Deadline):
+        """Try each provider in order; the first acceptable result wins"""
+        timings = {}
+        for name, call in providers:
+            if deadline.expired():
+                timings[name] = {'status': 'skipped'}
+                continue
+            res, timing = self._timed_call(call)
+            timings[name] = timing
+            if self._is_acceptable(res):
+                timing['status'] = 'won'
+                return res, name, timings
+        return None, None, timings
+
+    def _run_race(self, providers, deadline: Deadline, hedge: bool = False):
+        """Start providers concurrently (hedged: one at a time after a delay) and take the first acceptable result"""
+        timings = {name: {'status': 'skipped'} for name, _ in providers}
+        pending = {}
+        waiting = list(providers)
+
+        def launch(name, call):
+            pending[self.executor.submit(self._timed_call, call)] = name
+            timings[name] = {'status': 'pending', 'started': time.perf_counter()}
+
+        if hedge:
+            if waiting:
+                launch(*waiting.pop(0))
+        else:
+            while waiting:
+                launch(*waiting.pop(0))
+
+        while pending:
+            timeout = deadline.remaining()
+            if hedge and waiting:
+                timeout = min(timeout, self.hedge_delay_seconds)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if deadline.expired() or not waiting:
+                    break
+                # Hedge: the current provider is slow, start the next one alongside it
+                launch(*waiting.pop(0))
+                continue
+
+            for future in done:
+                name = pending.pop(future)
+                res, timing = future.result()
+                timings[name] = timing
+                if self._is_acceptable(res):
+                    timing['status'] = 'won'
+                    self._finish_timings(timings)
+                    return res, name, timings
+
+            # Everything launched so far failed - start the next hedge immediately
+            if hedge and waiting and not pending and not deadline.expired():
+                launch(*waiting.pop(0))
+
+        self._finish_timings(timings)
+        return None, None, timings
+
+    def _run_merge(self, providers, query: str, max_results: int, location_coords: Optional[Dict], deadline: Deadline):
+        """Start every provider and merge the acceptable results that arrive before the deadline"""
+        timings = {}
+        pending = {}
+        for name, call in providers:
+            pending[self.executor.submit(self._timed_call, call)] = name
+            timings[name] = {'status': 'pending', 'started': time.perf_counter()}
+
+        done, _ = wait(pending, timeout=min(self.merge_deadline_seconds, deadline.remaining()))
+
+        results = {}
+        for future in done:
+            name = pending[future]
+            res, timing = future.result()
+            timings[name] = timing
+            if self._is_acceptable(res):
+                results[name] = res
+        self._finish_timings(timings)
+
+        if not results:
+            return None, None, timings
+
+        for name in results:
+            timings[name]['status'] = 'won'
+        res = self._merge_results(providers, results, query, max_results, location_coords)
+        return res, res['source'], timings
+
+    def _merge_results(self, providers, results: Dict[str, Dict], query: str, max_results: int,
+                       location_coords: Optional[Dict]) -> Dict[str, Any]:
+        """One ranked response from several providers' acceptable results"""
+        # Drop duplicates of the same place (higher-priority provider wins), then rank together
+        merged = []
+        seen = set()
+        for name, _ in providers:
+            for resource in results.get(name, {}).get('recommendations', []):
+                key = self._resource_key(resource)
+                if key in seen:
+                    continue
+                seen.add(key)
+                merged.append(resource)
+
+        first = results[next(name for name, _ in providers if name in results)]
+        res = dict(first)
+        if location_coords:
+            res['recommendations'] = rank_resources(merged, query, max_results, location_coords['lat'], location_coords['lng'])
+        else:
+            res['recommendations'] = rank_resources(merged, query, max_results)
+        res['total_results'] = len(res['recommendations'])
+        res['source'] = '+'.join(name for name, _ in providers if name in results)
+        return res
+
+    def _resource_key(self, resource: Dict) -> Tuple[str, str]:
+        """Identity of a place across providers: (name, address)"""
+        return str(resource.get('name', '')).lower().strip(), str(resource.get('address', '')).lower().strip()
+
+    def _timed_call(self, call: Callable[[], Dict]) -> Tuple[Optional[Dict], Dict[str, Any]]:
+        started = time.perf_counter()
+        try:
+            res = call()
+            status = 'ok' if res and res.get('success') and res.get('recommendations') else 'empty'
+        except Exception as e:
+            print(f"⚠️ Search provider failed: {e}")
+            res, status = None, 'error'
+        timing = {'status': status, 'ms': self._elapsed_ms(started)}
+        if status == 'ok' and res.get('source') in FALLBACK_SOURCES:
+            timing['status'] = 'fallback'
+        elif res and res.get('skipped'):
+            timing['status'] = 'skipped'
+            timing['reason'] = res['skipped']
+        return res, timing
+
+    def _finish_timings(self, timings: Dict[str, Dict]):
+        """Providers still running when we return are reported as ignored"""
+        for timing in timings.values():
+            started = timing.pop('started', None)
+            if started is not None:
+                timing['status'] = 'ignored'
+                timing['ms'] = self._elapsed_ms(started)
+
+    def _is_acceptable(self, res: Optional[Dict]) -> bool:
+        return bool(res and res.get('success') and res.get('recommendations') and res.get('source') not in FALLBACK_SOURCES)
+
+    def _elapsed_ms(self, started: float) -> int:
+        return int((time.perf_counter() - started) * 1000)
+
+    def _local_response(self, query: str, resources: List[Dict]) -> Dict[str, Any]:
+        """Local catalog results in /api/search format"""
+        return {
+            'success': True,
+            'query': query,
+            'recommendations': resources,
+            'total_results': len(resources),
+            'confidence': 0.9,
+            'source': 'local_catalog'
+        }
+
+    def _demo_response(self, query: str, location: str, category: str, max_results: int) -> Dict[str, Any]:
+        """Fallback demo data in /api/search format"""
+        demo = get_demo_211_data(query, location, category, max_results)
+        resources = []
+        for i, r in enumerate(demo or []):
+            resources.append({
+                'id': f'verified_{i+1:03d}',
+                'name': r.get('name'),
+                'description': r.get('description'),
+                'category': category,
+                'address': r.get('address'),
+                'phone': r.get('phone'),
+                'website': r.get('website'),
+                'hours': r.get('hours'),
+                'services': r.get('services'),
+                'verified': True,
+                'source': 'verified_sacramento'
+            })
+        return {
+            'success': True,
+            'query': query,
+            'recommendations': resources,
+            'total_results': len(resources),
+            'confidence': 0.95,
+            'source': 'verified_sacramento_resources'
+        }
+
+
+_orchestrator = None
+_orchestrator_lock = threading.Lock()
+
+
+def get_search_orchestrator() -> SearchOrchestrator:
+    """Process-wide search orchestrator"""
+    global _orchestrator
+    if _orchestrator is None:
+        with _orchestrator_lock:
+            if _orchestrator is None:
+                _orchestrator = SearchOrchestrator()
+    return _orchestrator
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing of identical in-flight work
+
+When several requests need the same thing at once (a burst of identical
+searches, or the same location geocoded by each of them), one caller - the
+leader - runs it and every concurrent caller waits for and shares its
+result.
+
+Within a worker this uses an in-process table of pending calls. With
+SINGLE_FLIGHT_CROSS_WORKER enabled, leaders also take a lease in the
+single_flight_leases table of aidlink.db. Callers in other workers that find
+the lease held poll the shared SQLite cache (search_cache, geocode_cache)
+for the leader's result instead of making their own upstream calls.
+"""
+
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+try:
+    from .database import get_connection
+except ImportError:
+    from database import get_connection
+
+_NOTHING = object()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.cross_worker = os.getenv('SINGLE_FLIGHT_CROSS_WORKER', 'False').lower() == 'true'
+        self.lease_seconds = float(os.getenv('SINGLE_FLIGHT_LEASE_SECONDS', 30))
+        self.poll_seconds = float(os.getenv('SINGLE_FLIGHT_POLL_SECONDS', 0.1))
+        self._owner = uuid.uuid4().hex
+
+        self.executions = 0
+        self.coalesced = 0
+        self.cross_worker_coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._db_ready = False
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: float = None,
+           lookup: Callable[[], Any] = None, shareable: Callable[[Any], bool] = None) -> Any:
+        """
+        Run fn once for all concurrent callers with this key
+
+        Args:
+            key: Identity of the work (e.g. a search cache key)
+            fn: The work; called by the leader only
+            timeout: How long a follower waits for the leader before running fn itself
+            lookup: Reads a result another worker stored (cross-worker mode only); None if absent
+            shareable: Whether the leader's result may be handed to followers; if not, each
+                follower runs fn itself (e.g. a result degraded by the leader's own deadline)
+
+        Returns:
+            fn's result (followers get the leader's result; exceptions are shared too)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                # Leader is taking too long for our budget; don't wait any more
+                return fn()
+            if call.error is not None:
+                raise call.error
+            if shareable is not None and not shareable(call.result):
+                return fn()
+            return call.result
+
+        try:
+            call.result = self._run_leader(key, fn, timeout, lookup)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'cross_worker_coalesced': self.cross_worker_coalesced,
+                'in_flight': len(self._calls),
+                'cross_worker': self.cross_worker
+            }
+
+    def _run_leader(self, key: str, fn: Callable[[], Any], timeout: Optional[float], lookup) -> Any:
+        if self.cross_worker and lookup is not None and not self._acquire_lease(key):
+            result = self._wait_for_other_worker(key, timeout, lookup)
+            if result is not _NOTHING:
+                with self._lock:
+                    self.cross_worker_coalesced += 1
+                return result
+
+        with self._lock:
+            self.executions += 1
+        try:
+            return fn()
+        finally:
+            if self.cross_worker and lookup is not None:
+                self._release_lease(key)
+
+    def _wait_for_other_worker(self, key: str, timeout: Optional[float], lookup):
+        """Poll for another worker's result until its lease ends or we run out of time"""
+        give_up_at = time.monotonic() + (timeout if timeout is not None else self.lease_seconds)
+        while time.monotonic() < give_up_at:
+            time.sleep(self.poll_seconds)
+            result = lookup()
+            if result is not None:
+                return result
+            if not self._lease_held(key):
+                # Finished without a stored result (or crashed) - check once more, then run it ourselves
+                result = lookup()
+                return result if result is not None else _NOTHING
+        return _NOTHING
+
+    def _lease_key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    def _acquire_lease(self, key: str) -> bool:
+        now = datetime.now()
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                before = conn.total_changes
+                conn.execute(
+                    '''INSERT INTO single_flight_leases (lease_key, owner, expires_at) VALUES (?, ?, ?)
+                       ON CONFLICT(lease_key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                       WHERE single_flight_leases.expires_at <= ?''',
+                    (self._lease_key(key), self._owner, (now + timedelta(seconds=self.lease_seconds)).isoformat(), now.isoformat())
+                )
+                return conn.total_changes > before
+        except Exception as e:
+            print(f"Single-flight lease error: {e}")
+            return True  # Can't coordinate - behave like a plain leader
+
+    def _lease_held(self, key: str) -> bool:
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                row = conn.execute(
+                    'SELECT 1 FROM single_flight_leases WHERE lease_key = ? AND expires_at > ?',
+                    (self._lease_key(key), datetime.now().isoformat())
+                ).fetchone()
+            return row is not None
+        except Exception as e:
+            print(f"Single-flight lease error: {e}")
+            return False
+
+    def _release_lease(self, key: str):
+        try:
+            with get_connection() as conn:
+                self._ensure_table(conn)
+                conn.execute('DELETE FROM single_flight_leases WHERE lease_key = ? AND owner = ?', (self._lease_key(key), self._owner))
+        except Exception as e:
+            print(f"Single-flight lease error: {e}")
+
+    def _ensure_table(self, conn):
+        if self._db_ready:
+            return
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS single_flight_leases (
+                lease_key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at TIMESTAMP NOT NULL
+            )
+        ''')
+        self._db_ready = True
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """Process-wide single-flight group (e.g. 'search', 'geocode')"""
+    group = _groups.get(name)
+    if group is None:
+        with _groups_lock:
+            group = _groups.get(name)
+            if group is None:
+                group = _groups[name] = SingleFlight(name)
+    return group
+
+
+def get_single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters for every single-flight group"""
+    with _groups_lock:
+        groups = dict(_groups)
+    return {name: group.get_stats() for name, group in groups.items()}
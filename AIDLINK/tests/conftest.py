@@ -0,0 +1,57 @@
+"""Shared fixtures: AIDLINK modules on sys.path, a throwaway database and a slow local HTTP server"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Never touch the tracked data/aidlink.db from tests
+os.environ['SQLITE_DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='aidlink-tests-'), 'aidlink.db')
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    delay = 1.0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        body = b'{"status": "OK", "results": []}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_server():
+    """URL of a local server that answers every request after 1 s"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def catalog_db(tmp_path, monkeypatch):
+    """Empty resources catalog in a fresh database of its own"""
+    from database import ensure_catalog_schema, get_connection
+
+    db_path = tmp_path / 'catalog.db'
+    monkeypatch.setenv('SQLITE_DB_PATH', str(db_path))
+    with get_connection() as conn:
+        ensure_catalog_schema(conn)
+    return db_path
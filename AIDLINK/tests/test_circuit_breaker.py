@@ -0,0 +1,47 @@
+import json
+
+import pytest
+import requests
+import urllib3
+
+from circuit_breaker import CLOSED, OPEN, CircuitBreaker, is_timeout
+from deadline import Deadline, DeadlineExceeded, stage_timeout
+from http_session import build_session
+
+
+def _failing(error):
+    def fn():
+        raise error
+    return fn
+
+
+def test_deadline_capped_timeouts_do_not_open_the_breaker(slow_server):
+    breaker = CircuitBreaker('test_capped')
+    session = build_session()
+    for _ in range(breaker.min_calls + 1):
+        timeout = stage_timeout(Deadline(0.2), 15)
+        with pytest.raises(DeadlineExceeded):
+            breaker.call(lambda: session.get(slow_server, timeout=timeout), capped_by_deadline=timeout < 15)
+    assert breaker.state == CLOSED
+    assert breaker.get_stats()['window_calls'] == 0
+
+
+def test_wrapped_read_timeout_is_a_timeout():
+    pool_error = urllib3.exceptions.MaxRetryError(None, '/', urllib3.exceptions.ReadTimeoutError(None, '/', 'read timed out'))
+    assert is_timeout(requests.ConnectionError(pool_error))
+    assert not is_timeout(requests.ConnectionError(urllib3.exceptions.MaxRetryError(None, '/', OSError('refused'))))
+
+
+def test_only_outages_are_counted():
+    breaker = CircuitBreaker('test_outages')
+    bad_json = requests.JSONDecodeError('Expecting value', '<html>proxy error</html>', 0)
+    for error in (bad_json, json.JSONDecodeError('Expecting value', '', 0), ValueError('blocked prompt'), KeyError('results')):
+        with pytest.raises(type(error)):
+            breaker.call(_failing(error))
+    assert breaker.state == CLOSED
+    assert breaker.get_stats()['window_calls'] == 0
+
+    for _ in range(breaker.min_calls):
+        with pytest.raises(requests.ConnectionError):
+            breaker.call(_failing(requests.ConnectionError('refused')))
+    assert breaker.state == OPEN
@@ -0,0 +1,24 @@
+import time
+
+import pytest
+import requests
+
+from deadline import Deadline, stage_timeout
+from http_session import build_session
+
+
+def test_read_timeout_is_not_retried(slow_server):
+    session = build_session()
+    start = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        session.get(slow_server, timeout=0.3)
+    assert time.monotonic() - start < 0.6
+
+
+def test_deadline_capped_call_returns_within_budget(slow_server):
+    session = build_session()
+    deadline = Deadline(0.2)
+    start = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        session.get(slow_server, timeout=stage_timeout(deadline, 5))
+    assert time.monotonic() - start < 0.4
@@ -0,0 +1,50 @@
+import itertools
+import json
+
+import pytest
+
+import ingest_osm
+from ingest_osm import iter_overpass_elements
+
+
+def _chunks(text, size=1000):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+def _garbage(chars):
+    """Endless-looking stream of undecodable text, counting what was read"""
+    read = {'chars': 0}
+
+    def chunks():
+        while read['chars'] < chars:
+            read['chars'] += 1000
+            yield 'x' * 1000
+    return chunks(), read
+
+
+def test_elements_are_streamed():
+    elements = [{'type': 'node', 'id': i, 'lat': 38.5, 'lon': -121.4, 'tags': {'name': f"Pantry {i}"}} for i in range(50)]
+    text = json.dumps({'version': 0.6, 'osm3s': {}, 'elements': elements})
+    assert list(iter_overpass_elements(_chunks(text, 97))) == elements
+
+
+def test_truncated_stream_raises():
+    text = json.dumps({'elements': [{'type': 'node', 'id': 1}, {'type': 'node', 'id': 2}]})[:-12]
+    with pytest.raises(ValueError):
+        list(iter_overpass_elements(_chunks(text)))
+
+
+def test_garbage_element_raises_without_reading_everything(monkeypatch):
+    monkeypatch.setattr(ingest_osm, 'MAX_ELEMENT_CHARS', 50_000)
+    chunks, read = _garbage(10_000_000)
+    with pytest.raises(ValueError):
+        list(iter_overpass_elements(itertools.chain(['{"elements": ['], chunks)))
+    assert read['chars'] <= 60_000
+
+
+def test_missing_elements_array_raises_without_reading_everything(monkeypatch):
+    monkeypatch.setattr(ingest_osm, 'MAX_ELEMENT_CHARS', 50_000)
+    chunks, read = _garbage(10_000_000)
+    with pytest.raises(ValueError):
+        list(iter_overpass_elements(chunks))
+    assert read['chars'] <= 60_000
@@ -0,0 +1,37 @@
+import pytest
+
+from llm_cache import LLMCache
+
+SITUATION = "Homeless with 2 kids, lost my job last month and need food and a place to stay"
+
+
+@pytest.fixture
+def near_cache(monkeypatch):
+    monkeypatch.setenv('LLM_CACHE_NEAR_DUPLICATES', 'True')
+    return LLMCache()
+
+
+def test_near_duplicates_are_opt_in(monkeypatch):
+    monkeypatch.delenv('LLM_CACHE_NEAR_DUPLICATES', raising=False)
+    cache = LLMCache()
+    cache.set('opt_in', SITUATION, {'plan': 'a'})
+    assert cache.get('opt_in', SITUATION) == {'plan': 'a'}
+    assert cache.get('opt_in', "homeless, with 2 kids: lost my job last month, need food and a place to stay!") is None
+
+
+def test_rewording_matches(near_cache):
+    near_cache.set('reworded', SITUATION, {'plan': 'a'})
+    assert near_cache.get('reworded', "homeless, with 2 kids - lost my job last month, need food and a place to stay") == {'plan': 'a'}
+
+
+@pytest.mark.parametrize('extra', [', I am undocumented', ', I am a veteran', ' and I am diabetic'])
+def test_added_fact_never_matches(near_cache, extra):
+    method = f"added_{extra.split()[-1]}"
+    near_cache.set(method, SITUATION, {'plan': 'a'})
+    assert near_cache.get(method, SITUATION + extra) is None
+
+
+def test_negation_and_numbers_never_match(near_cache):
+    near_cache.set('negation', "I am a US citizen with 2 kids and need food", {'plan': 'a'})
+    assert near_cache.get('negation', "I am not a US citizen with 2 kids and need food") is None
+    assert near_cache.get('negation', "I am a US citizen with 5 kids and need food") is None
@@ -0,0 +1,65 @@
+import random
+import sqlite3
+
+import local_search
+import ranking
+from local_search import LocalResourceIndex
+from ranking import rank_resources
+
+CATEGORIES = ['food', 'housing', 'healthcare', 'employment']
+WORDS = ['pantry', 'shelter', 'clinic', 'meals', 'rent', 'jobs', 'dental', 'family', 'youth', 'senior']
+
+
+def _fill_catalog(db_path, count=3000, lat=38.58, lng=-121.49):
+    rng = random.Random(7)
+    rows = []
+    for i in range(count):
+        words = ' '.join(rng.sample(WORDS, 3))
+        rows.append((f"res_{i}", f"{words.title()} {i}", f"Offers {words}", rng.choice(CATEGORIES), f"{i} Main St",
+                     f"Provides {words}", lat + rng.uniform(-0.3, 0.3), lng + rng.uniform(-0.3, 0.3),
+                     round(rng.uniform(3, 5), 1), '2024-01-01'))
+    conn = sqlite3.connect(str(db_path))
+    conn.executemany('INSERT INTO resources (id, name, description, category, address, services, latitude, longitude, rating, last_updated) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+
+
+def _expected(index, rows, query, lat, lng, radius, max_results, text_index):
+    resources = [index._row_to_resource(row) for row in rows]
+    ranked = rank_resources(resources, query, len(resources), lat, lng, text_index)
+    return [r['id'] for r in ranked if r['distance'] <= radius][:max_results]
+
+
+def test_catalog_candidate_set_is_kept_and_ranks_like_before(catalog_db, monkeypatch):
+    _fill_catalog(catalog_db)
+    index = LocalResourceIndex()
+    index.search('warm up', 38.58, -121.49, 10)
+    assert index._candidates is not None and len(index._candidates) == 3000
+
+    built = []
+    original = ranking.CandidateSet.__init__
+
+    def counting_init(self, *args, **kwargs):
+        built.append(len(args[0]))
+        original(self, *args, **kwargs)
+
+    monkeypatch.setattr(ranking.CandidateSet, '__init__', counting_init)
+    for query, category in (('family meals', 'food'), ('shelter', 'housing'), ('clinic', None)):
+        results = index.search(query, 38.6, -121.5, 10, category, 10)
+        assert len(results) == 10 and all(r['distance'] <= 10 for r in results)
+    assert built == []  # No per-query candidate sets
+
+    with local_search.get_connection() as conn:
+        rows = index._query_bbox(conn, 38.6, -121.5, 10, 'food')
+    for query in ('family meals', 'dental', ''):
+        ranked = index._rank_rows(rows, query, 38.6, -121.5, 10, 10, index._text_index)
+        assert [r['id'] for r in ranked] == _expected(index, rows, query, 38.6, -121.5, 10, 10, index._text_index)
+
+
+def test_fresh_database_gets_the_catalog_schema(tmp_path, monkeypatch):
+    monkeypatch.setenv('SQLITE_DB_PATH', str(tmp_path / 'fresh.db'))
+    assert LocalResourceIndex().search('food', 38.58, -121.49, 10) == []
+    with local_search.get_connection() as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert 'resources' in tables
@@ -0,0 +1,41 @@
+import pytest
+
+from model_output import ModelOutputError, NonEmpty, parse_model_json, repair_json
+
+SCHEMA = {'summary': str, 'steps?': [str]}
+
+
+def test_fenced_json_with_trailing_comma():
+    text = '```json\n{"summary": "ok", "steps": ["a", "b",],}\n```'
+    assert parse_model_json(text, SCHEMA) == {'summary': 'ok', 'steps': ['a', 'b']}
+
+
+def test_truncated_array_is_closed():
+    assert parse_model_json('{"summary": "ok", "steps": ["a", "b", "c', SCHEMA) == {'summary': 'ok', 'steps': ['a', 'b']}
+
+
+def test_prose_with_braces_before_the_json():
+    text = 'Here is the JSON {note: see below} for you: {"summary": "ok", "steps": ["a"]}'
+    assert parse_model_json(text, SCHEMA) == {'summary': 'ok', 'steps': ['a']}
+    assert parse_model_json(text) == {'summary': 'ok', 'steps': ['a']}
+
+
+def test_prose_with_brackets_before_an_array():
+    assert parse_model_json('Documents [see list]: ["ID", "Lease"]', NonEmpty([str])) == ['ID', 'Lease']
+
+
+@pytest.mark.parametrize('control', ['\r', '\r\n', '\x0b', '\x0c', '\x00', '\x1f'])
+def test_raw_control_characters_in_strings(control):
+    text = '{"summary": "line one' + control + 'line two", "steps": ["a\tb"]}'
+    assert parse_model_json(text, SCHEMA) == {'summary': 'line one' + control + 'line two', 'steps': ['a\tb']}
+
+
+def test_repair_keeps_escapes():
+    assert repair_json('{"a": "x\\"y\r"}') == '{"a": "x\\"y\\r"}'
+
+
+def test_nothing_usable_raises():
+    with pytest.raises(ModelOutputError):
+        parse_model_json('Sorry {I cannot} help with that {either}', SCHEMA)
+    with pytest.raises(ModelOutputError):
+        parse_model_json('no json here')
@@ -0,0 +1,84 @@
+from openstreetmap_community_client import OSMCommunityClient
+from overpass_tile_cache import get_overpass_tile_cache, tile_bounds
+
+
+def _inside(point, box):
+    south, west, north, east = box
+    return south <= point[0] <= north and west <= point[1] <= east
+
+
+def _center(tile):
+    south, west, north, east = tile_bounds(tile)
+    return (south + north) / 2, (west + east) / 2
+
+
+def _recording_client(monkeypatch):
+    """OSM client whose Overpass fetches return nothing and are recorded as (bboxes, tiles)"""
+    client = OSMCommunityClient()
+    calls = []
+    tile_cache = get_overpass_tile_cache()
+    bucket = tile_cache.bucket
+
+    def fetch(osm_tags, bboxes, deadline=None):
+        calls.append({'bboxes': bboxes})
+        return []
+
+    def record_bucket(elements, tiles):
+        calls[-1]['tiles'] = list(tiles)
+        return bucket(elements, tiles)
+
+    monkeypatch.setattr(client, '_fetch_overpass', fetch)
+    monkeypatch.setattr(tile_cache, 'bucket', record_bucket)
+    return client, calls
+
+
+def test_widening_fetches_each_tile_once(monkeypatch):
+    client, calls = _recording_client(monkeypatch)
+    coords = {'lat': 40.1, 'lng': -110.3}  # Sparse: every step comes back empty
+
+    res = client.search_places('food', 'Nowhere', 'food', 5, location_coords=coords, radius_miles=10)
+
+    assert res.get('source') != 'openstreetmap'
+    assert len(calls) == 4  # 2 -> 4 -> 8 -> 10 miles
+    assert len({tile[0] for call in calls for tile in call['tiles']}) == 1  # One zoom for the whole search
+    fetched = []
+    for call in calls:
+        assert not set(call['tiles']) & set(fetched)
+        # Query boxes cover the missing tiles only, not tiles fetched by an earlier step
+        assert all(any(_inside(_center(tile), box) for box in call['bboxes']) for tile in call['tiles'])
+        assert not any(_inside(_center(tile), box) for tile in fetched for box in call['bboxes'])
+        fetched += call['tiles']
+
+    calls.clear()
+    client.search_places('food', 'Nowhere', 'food', 5, location_coords=coords, radius_miles=10)
+    assert calls == []
+
+
+def test_ring_of_missing_tiles_is_four_boxes():
+    tile_cache = get_overpass_tile_cache()
+    ring = [(12, x, y) for x in range(10, 14) for y in range(20, 24) if x in (10, 13) or y in (20, 23)]
+    boxes = tile_cache.tiles_bboxes(ring)
+    assert len(boxes) == 4
+    inner = [(12, x, y) for x in (11, 12) for y in (21, 22)]
+    assert not any(_inside(_center(tile), box) for tile in inner for box in boxes)
+    assert all(any(_inside(_center(tile), box) for box in boxes) for tile in ring)
+
+
+def test_cached_tiles_are_not_refetched_or_overwritten(monkeypatch):
+    client, calls = _recording_client(monkeypatch)
+    tile_cache = get_overpass_tile_cache()
+    lat, lng = 41.7, -108.2
+    bbox = client._radius_bbox(lat, lng, 4)
+    zoom = tile_cache.zoom_for(*bbox)
+    tiles = tile_cache.tiles_covering(*bbox, zoom=zoom)
+    # Every other tile cached: the missing ones are far from a rectangle
+    cached = {tile: [{'type': 'node', 'id': i, 'lat': _center(tile)[0], 'lon': _center(tile)[1], 'tags': {}}]
+              for i, tile in enumerate(tiles) if (tile[1] + tile[2]) % 2}
+    tile_cache.set_many(cached, ['amenity=food_bank'])
+
+    client._get_elements(['amenity=food_bank'], bbox, zoom=zoom)
+
+    assert len(calls) == 1
+    assert set(calls[0]['tiles']) == set(tiles) - set(cached)
+    assert not any(_inside(_center(tile), box) for tile in cached for box in calls[0]['bboxes'])
+    assert tile_cache.get_many(list(cached), ['amenity=food_bank']) == cached
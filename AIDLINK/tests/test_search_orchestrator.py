@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+import google_places_client
+import search_orchestrator
+from deadline import Deadline
+from quota_manager import EXHAUSTED
+from search_cache import get_search_cache
+from search_orchestrator import SearchOrchestrator
+
+
+class _Geocoder:
+    def geocode(self, location, deadline=None):
+        return {'lat': 38.58, 'lng': -121.49}
+
+
+class _EmptyLocalIndex:
+    def search(self, *args, **kwargs):
+        return []
+
+    def has_enough(self, results, max_results):
+        return False
+
+
+class _OSM:
+    available = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def search_places(self, query, *args, **kwargs):
+        self.calls += 1
+        return {
+            'success': True,
+            'recommendations': [{'id': 'osm_1', 'name': f"{query} pantry", 'address': '1 Main St', 'distance': 1.0}],
+            'total_results': 1,
+            'source': 'openstreetmap'
+        }
+
+
+class _ExhaustedQuota:
+    def level(self):
+        return EXHAUSTED
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    monkeypatch.setattr(search_orchestrator, 'get_geocoding_service', lambda: _Geocoder())
+    monkeypatch.setattr(search_orchestrator, 'get_local_index', lambda: _EmptyLocalIndex())
+    osm = _OSM()
+    monkeypatch.setattr(search_orchestrator, 'get_osm_client', lambda: osm)
+    return osm
+
+
+def test_serial_search_skips_google_demo_fallback(providers, monkeypatch):
+    google = google_places_client.GooglePlacesClient(api_key='test-key')
+    monkeypatch.setattr(google_places_client, 'get_quota_manager', lambda: _ExhaustedQuota())
+    monkeypatch.setattr(search_orchestrator, 'get_google_places_client', lambda: google)
+
+    res = SearchOrchestrator().search('food exhausted', 'Sacramento, CA', 'food', 5, 10, mode='serial', deadline=Deadline(5))
+
+    assert res['provider'] == 'openstreetmap'
+    assert res['provider_timings']['google_places']['status'] == 'skipped'
+    assert providers.calls == 1
+
+
+def test_provider_demo_fallbacks_never_win_or_get_cached(providers, monkeypatch):
+    class _DemoOnlyGoogle:
+        available = True
+
+        def search_places(self, *args, **kwargs):
+            return {'success': True, 'recommendations': [{'id': 'fallback_001', 'name': 'Demo'}], 'source': 'verified_fallback'}
+
+    monkeypatch.setattr(search_orchestrator, 'get_google_places_client', lambda: _DemoOnlyGoogle())
+    monkeypatch.setattr(search_orchestrator, 'get_osm_client', lambda: _DemoOnlyGoogle())
+
+    res = SearchOrchestrator().search('food fallback', 'Sacramento, CA', 'food', 5, 10, mode='serial', deadline=Deadline(5))
+
+    assert res['provider'] == 'demo'
+    cached = get_search_cache().get('food fallback', 'Sacramento, CA', 'food', 10, 5)
+    assert cached is None or cached['source'] not in search_orchestrator.FALLBACK_SOURCES
+
+
+def test_degraded_leader_result_is_not_shared_with_followers(providers, monkeypatch):
+    class _SlowOSM(_OSM):
+        def search_places(self, query, *args, **kwargs):
+            time.sleep(0.5)
+            return super().search_places(query, *args, **kwargs)
+
+    osm = _SlowOSM()
+    monkeypatch.setattr(search_orchestrator, 'get_osm_client', lambda: osm)
+    monkeypatch.setattr(search_orchestrator, 'get_google_places_client', lambda: None)
+    orchestrator = SearchOrchestrator()
+    results = {}
+
+    def search(name, budget):
+        results[name] = orchestrator.search('food coalesced', 'Sacramento, CA', 'food', 5, 10, mode='race', deadline=Deadline(budget))
+
+    leader = threading.Thread(target=search, args=('leader', 0.2))
+    follower = threading.Thread(target=search, args=('follower', 5))
+    leader.start()
+    time.sleep(0.05)
+    follower.start()
+    leader.join()
+    follower.join()
+
+    assert results['leader'].get('degraded') == 'deadline_exceeded'
+    assert not results['follower'].get('degraded')
+    assert results['follower']['provider'] == 'openstreetmap'
+
+
+def test_race_wait_timing_out_before_the_deadline_expires(monkeypatch):
+    # wait() times out while a sliver of budget is left (not yet expired) and nothing is waiting to launch
+    monkeypatch.setattr(search_orchestrator, 'wait', lambda pending, timeout=None, return_when=None: (set(), set(pending)))
+    deadline = Deadline(5)
+    calls = iter([False, True])
+    monkeypatch.setattr(deadline, 'expired', lambda: next(calls, True))
+
+    res, winner, timings = SearchOrchestrator()._run_race([('slow', lambda: time.sleep(0.01))], deadline)
+
+    assert res is None and winner is None
+    assert timings['slow']['status'] == 'ignored'
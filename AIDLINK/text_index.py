@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tokenized inverted index with BM25 scoring
+
+Used for the relevance part of resource ranking. Text is split into
+whole-word tokens (so "car" no longer matches "care"), lightly stemmed
+("clinics" -> "clinic") and indexed once per candidate pool, or once for
+the whole local catalog. Scores are converted to 0-MAX_RELEVANCE_POINTS
+ranking points relative to the best score the query could reach.
+"""
+
+import re
+from collections import Counter
+from math import log
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+MAX_RELEVANCE_POINTS = 15.0
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset('a an and are as at by for from i in is it me my near of on or the to with'.split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, stemmed word tokens without stopwords"""
+    return [_stem(token) for token in TOKEN_RE.findall(str(text or '').lower()) if token not in STOPWORDS]
+
+
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def resource_text(resource: Dict) -> str:
+    """Indexed text of a resource (the name counts twice)"""
+    name = str(resource.get('name') or '')
+    return ' '.join((name, name, str(resource.get('services') or ''), str(resource.get('description') or ''),
+                     str(resource.get('category') or '')))
+
+
+class TextIndex:
+    """BM25 inverted index over (key, text) documents"""
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, docs: Iterable[Tuple[Hashable, str]]):
+        self.postings = {}
+        self.doc_lengths = {}
+        for key, text in docs:
+            tokens = tokenize(text)
+            self.doc_lengths[key] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                self.postings.setdefault(term, {})[key] = tf
+        self.doc_count = len(self.doc_lengths)
+        self.avg_length = (sum(self.doc_lengths.values()) / self.doc_count) if self.doc_count else 1.0
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def idf(self, term: str) -> float:
+        matching = len(self.postings.get(term, ()))
+        return log((self.doc_count - matching + 0.5) / (matching + 0.5) + 1)
+
+    def match_count(self, query: str) -> int:
+        """Upper bound on the number of documents matching any query term"""
+        return sum(len(self.postings.get(term, ())) for term in set(tokenize(query)))
+
+    def scores(self, query: str, keys: Iterable[Hashable] = None) -> Dict[Hashable, float]:
+        """
+        BM25 score of every document matching at least one query term
+
+        Args:
+            keys: Only score these documents (e.g. a spatial pre-filter of a large catalog)
+        """
+        scores = {}
+        avg_length = self.avg_length or 1.0
+        keys = None if keys is None else list(keys)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            if keys is None or len(keys) > len(postings):
+                matches = postings.items()
+            else:
+                matches = ((key, postings[key]) for key in keys if key in postings)
+            for key, tf in matches:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[key] / avg_length)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def relevance_points(self, query: str, keys: Iterable[Hashable] = None,
+                         max_points: float = MAX_RELEVANCE_POINTS) -> Dict[Hashable, float]:
+        """
+        Scores scaled to 0-max_points
+
+        The scale is the highest score the query could reach (every term
+        matching), so a document matching one of three rare words gets about
+        a third of the points whatever else is in the pool.
+        """
+        terms = set(tokenize(query))
+        ceiling = sum(self.idf(term) for term in terms) * (self.k1 + 1)
+        if not ceiling:
+            return {}
+        return {key: max_points * score / ceiling for key, score in self.scores(query, keys).items()}
+
+
+def rank_by_relevance(resources: List[Dict], query: str) -> List[Dict]:
+    """Resources ordered by BM25 relevance to query (original order among ties)"""
+    if not resources or not tokenize(query):
+        return list(resources)
+    points = TextIndex((i, resource_text(r)) for i, r in enumerate(resources)).relevance_points(query)
+    order = sorted(range(len(resources)), key=lambda i: -points.get(i, 0.0))
+    return [resources[i] for i in order]
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Gemini token accounting
+
+Every Gemini call records its input and output tokens under the assistant
+method that made it. Counts come from the response's usage_metadata when
+the SDK provides it; older google-generativeai releases don't, and then
+they are estimated at 4 characters per token (counted as 'estimated_calls').
+Totals are shown in /api/status.
+"""
+
+import threading
+from typing import Any, Dict
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text or '') + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class TokenUsage:
+    """Per-method Gemini call and token counters"""
+
+    def __init__(self):
+        self._methods = {}
+        self._lock = threading.Lock()
+
+    def record(self, method: str, prompt: str, output_text: str = '', usage_metadata: Any = None):
+        """Count one call; usage_metadata is the response's (if any)"""
+        input_tokens = getattr(usage_metadata, 'prompt_token_count', None)
+        output_tokens = getattr(usage_metadata, 'candidates_token_count', None)
+        estimated = input_tokens is None or output_tokens is None
+        if input_tokens is None:
+            input_tokens = estimate_tokens(prompt)
+        if output_tokens is None:
+            output_tokens = estimate_tokens(output_text)
+
+        with self._lock:
+            counters = self._methods.setdefault(method, {'calls': 0, 'input_tokens': 0, 'output_tokens': 0, 'estimated_calls': 0})
+            counters['calls'] += 1
+            counters['input_tokens'] += input_tokens
+            counters['output_tokens'] += output_tokens
+            counters['estimated_calls'] += int(estimated)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            methods = {
+                method: dict(counters,
+                             avg_input_tokens=round(counters['input_tokens'] / counters['calls']),
+                             avg_output_tokens=round(counters['output_tokens'] / counters['calls']))
+                for method, counters in sorted(self._methods.items())
+            }
+        return {
+            'calls': sum(m['calls'] for m in methods.values()),
+            'input_tokens': sum(m['input_tokens'] for m in methods.values()),
+            'output_tokens': sum(m['output_tokens'] for m in methods.values()),
+            'methods': methods
+        }
+
+
+_usage = None
+_usage_lock = threading.Lock()
+
+
+def get_token_usage() -> TokenUsage:
+    """Process-wide token counters"""
+    global _usage
+    if _usage is None:
+        with _usage_lock:
+            if _usage is None:
+                _usage = TokenUsage()
+    return _usage
@@ -11,9 +11,10 @@ Usage
 - Open http://localhost:8000
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
+import json
 import os
 import sys
 from datetime import datetime
@@ -36,15 +37,27 @@ if app_module_dir.exists():
     sys.path.insert(0, str(app_module_dir))
 
 # Import local modules used by Netlify Functions
-from google_places_client import GooglePlacesClient
-from openstreetmap_community_client import OSMCommunityClient
-from ai_eligibility_assistant import AIEligibilityAssistant
-from demo_211_data import get_demo_211_data
+from providers import get_eligibility_assistant, warm_providers
+from geocoding_service import get_geocoding_service
+from search_cache import get_search_cache
+from search_orchestrator import get_search_orchestrator
+from place_details_cache import get_place_details_cache
+from overpass_tile_cache import get_overpass_tile_cache
+from single_flight import get_single_flight_stats
+from quota_manager import get_quota_manager
+from circuit_breaker import get_circuit_breaker_stats
+from llm_cache import get_llm_cache
+from token_usage import get_token_usage
+from search_cursor import InvalidCursor
+from deadline import Deadline
 
 
 app = Flask(__name__, static_folder=None)
 CORS(app)
 
+# Build provider clients once per worker, outside the request path
+warm_providers()
+
 
 @app.route('/')
 def index():
@@ -80,6 +93,27 @@ def status():
         'data_source': 'local_flask',
         'google_places_available': google_places_available,
         'gemini_available': gemini_available,
+        'geocoding_cache': get_geocoding_service().get_stats(),
+        'search_cache': get_search_cache().get_stats(),
+        'place_details_cache': get_place_details_cache().get_stats(),
+        'overpass_tile_cache': get_overpass_tile_cache().get_stats(),
+        'single_flight': get_single_flight_stats(),
+        'quota': get_quota_manager().get_stats(),
+        'circuit_breakers': get_circuit_breaker_stats(),
+        'llm_cache': get_llm_cache().get_stats(),
+        'gemini_tokens': get_token_usage().get_stats(),
+        'search_mode': get_search_orchestrator().mode,
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+@app.route('/api/quota')
+def quota():
+    days = min(max(request.args.get('days', 30, type=int), 1), 366)
+    manager = get_quota_manager()
+    return jsonify({
+        'quota': manager.get_stats(),
+        'usage': manager.usage_history(days),
         'timestamp': datetime.now().isoformat()
     })
 
@@ -94,48 +128,68 @@ def search():
         max_results = int(data.get('max_results') or 10)
         radius = int(data.get('radius') or 10)
 
-        google_places = GooglePlacesClient()
-        if google_places and getattr(google_places, 'available', False):
-            res = google_places.search_places(query, location, category, max_results, radius_miles=radius)
-            if res.get('success') and res.get('recommendations'):
-                return jsonify(res)
-
-        osm = OSMCommunityClient()
-        if osm and getattr(osm, 'available', True):
-            res = osm.search_places(query, location, category, max_results)
-            if res.get('success') and res.get('recommendations'):
-                return jsonify(res)
-
-        # Fallback demo
-        demo = get_demo_211_data(query, location, category, max_results)
-        resources = []
-        for i, r in enumerate(demo or []):
-            resources.append({
-                'id': f'verified_{i+1:03d}',
-                'name': r.get('name'),
-                'description': r.get('description'),
-                'category': category,
-                'address': r.get('address'),
-                'phone': r.get('phone'),
-                'website': r.get('website'),
-                'hours': r.get('hours'),
-                'services': r.get('services'),
-                'verified': True,
-                'source': 'verified_sacramento'
-            })
-        return jsonify({
-            'success': True,
-            'query': query,
-            'recommendations': resources,
-            'total_results': len(resources),
-            'confidence': 0.95,
-            'source': 'verified_sacramento_resources'
-        })
+        # Optional per-request override of SEARCH_MODE (serial, race, hedge, merge)
+        mode = (data.get('search_mode') or '').strip().lower() or None
+        # Latency budget: the client may ask for less than REQUEST_DEADLINE_MS, never more
+        deadline = Deadline.from_request(data.get('deadline_ms'))
+        # next_cursor of a previous response fetches the following page
+        cursor = (data.get('cursor') or '').strip() or None
+
+        res = get_search_orchestrator().search(query, location, category, max_results, radius, mode=mode, deadline=deadline, cursor=cursor)
+        return jsonify(res)
+
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 410
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/search/batch', methods=['POST'])
+def search_batch():
+    """Many searches in one request: {"searches": [{query, location, category, max_results, radius}, ...]}"""
+    try:
+        data = request.get_json() or {}
+        searches = data.get('searches')
+        if not isinstance(searches, list) or not searches:
+            return jsonify({'error': 'searches must be a non-empty list'}), 400
+        max_items = int(os.getenv('SEARCH_BATCH_MAX_ITEMS', 100))
+        if len(searches) > max_items:
+            return jsonify({'error': f'At most {max_items} searches per batch'}), 400
+
+        # Budget for the whole batch: the client may ask for less than BATCH_DEADLINE_MS, never more
+        deadline = Deadline.from_request(data.get('deadline_ms'), env_var='BATCH_DEADLINE_MS', default_ms=30000)
+        return jsonify(get_search_orchestrator().search_batch(searches, deadline=deadline))
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/search/stream', methods=['POST'])
+def search_stream():
+    """/api/search as NDJSON: cached/local results first, provider results as they arrive, then the final ranked response"""
+    data = request.get_json() or {}
+    try:
+        query = (data.get('query') or '').strip()
+        location = (data.get('location') or 'Sacramento, CA').strip()
+        category = (data.get('category') or 'general').strip()
+        max_results = int(data.get('max_results') or 10)
+        radius = int(data.get('radius') or 10)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    deadline = Deadline.from_request(data.get('deadline_ms'))
+
+    def generate():
+        try:
+            for event in get_search_orchestrator().search_stream(query, location, category, max_results, radius, deadline=deadline):
+                yield json.dumps(event) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+
+    # X-Accel-Buffering stops proxies (nginx) from holding events back
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route('/api/analyze-eligibility', methods=['POST'])
 def analyze_eligibility():
     try:
@@ -147,7 +201,7 @@ def analyze_eligibility():
         if not situation:
             return jsonify({'error': 'Situation description is required'}), 400
 
-        assistant = AIEligibilityAssistant()
+        assistant = get_eligibility_assistant()
         if not getattr(assistant, 'available', False):
             # Graceful fallback if Gemini not configured
             analysis = assistant._fallback_analysis(situation)
@@ -161,23 +215,38 @@ def analyze_eligibility():
                 'ai_model': 'simple_fallback'
             })
 
-        analysis = assistant.analyze_user_situation(situation, location=location)
-        if resources_found:
-            plan = assistant.create_action_plan_from_resources(analysis, resources_found, location)
-        else:
-            plan = assistant.create_action_plan(analysis, location)
-        checklist = assistant.generate_document_checklist(analysis, plan)
-        return jsonify({
-            'success': True,
-            'analysis': analysis.get('analysis', {}),
-            'action_plan': plan.get('action_plan', {}),
-            'document_checklist': checklist,
-            'ai_model': 'gemini-pro'
-        })
+        # Each Gemini call gets only what is left of the request budget and
+        # falls back to the rule-based answer once it runs out
+        deadline = Deadline.from_request(data.get('deadline_ms'), env_var='ANALYZE_DEADLINE_MS', default_ms=20000)
+        result = assistant.analyze_and_plan(situation, resources_found, location, deadline=deadline)
+        return jsonify(dict(result, success=True))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/analyze-eligibility/stream', methods=['POST'])
+def analyze_eligibility_stream():
+    """/api/analyze-eligibility as NDJSON: the rule-based answer first, model sections as they are parsed, then the final answer"""
+    data = request.get_json() or {}
+    situation = (data.get('situation') or '').strip()
+    resources_found = data.get('resources') or []
+    location = data.get('location')
+
+    if not situation:
+        return jsonify({'error': 'Situation description is required'}), 400
+    deadline = Deadline.from_request(data.get('deadline_ms'), env_var='ANALYZE_DEADLINE_MS', default_ms=20000)
+
+    def generate():
+        try:
+            for event in get_eligibility_assistant().analyze_stream(situation, resources_found, location, deadline=deadline):
+                yield json.dumps(dict(event, success=True) if event['type'] == 'final' else event) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 def main():
     port = int(os.getenv('PORT', 8000))
     app.run(host='0.0.0.0', port=port, debug=True)